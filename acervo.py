@@ -0,0 +1,252 @@
+"""Acervo dos PDFs de troca: segmentos comprimidos com índice por troca
+
+Um arquivo solto por relatório não escala: depois de anos a pasta tem
+centenas de milhares de PDFs, listar e copiar fica lento e duas trocas no
+mesmo segundo sobrescrevem o mesmo nome. O acervo guarda os PDFs assim:
+
+    acervo_relatorios/
+        segmentos/000001.seg   conteúdos comprimidos, um depois do outro
+        indice.jsonl           onde está cada conteúdo e de qual troca é cada relatório
+
+Cada conteúdo é identificado pelo SHA-256 dos bytes do PDF: bytes iguais
+são gravados uma vez só, por mais trocas que apontem para eles. Ele vai
+para o segmento atual comprimido com zlib, com um cabeçalho (marca,
+tamanhos e hash) que permite conferir a leitura. Um segmento que passa de
+``TAMANHO_SEGMENTO`` é fechado e não muda mais: o backup só precisa
+copiar o segmento aberto e o índice.
+
+O índice é um diário de linhas JSON, lido inteiro na abertura para dois
+dicts: chave da troca -> conteúdo e conteúdo -> (segmento, posição).
+Achar o relatório de uma troca é uma consulta ao dict e uma leitura a
+partir da posição; ``abrir`` devolve o PDF em pedaços, sem carregá-lo
+inteiro.
+
+A chave de um relatório é o ``id_troca`` do registro. Trocas antigas, sem
+id, usam instante, máquina e ferramenta (``chave_do_registro``).
+"""
+import hashlib
+import json
+import os
+import re
+import struct
+import threading
+import zlib
+from datetime import datetime, timedelta
+
+import dominio
+
+
+TAMANHO_SEGMENTO = 64 * 1024 * 1024
+TAMANHO_PEDACO = 64 * 1024
+
+# Cabeçalho de cada conteúdo no segmento: marca, tamanho comprimido,
+# tamanho original e SHA-256 dos bytes originais
+MARCA = b"TLR1"
+CABECALHO = struct.Struct(">4sII32s")
+
+NOME_ANTIGO = re.compile(r"Relatorio_Troca_(\d{8}_\d{6})\.pdf$")
+
+
+def chave_do_registro(registro):
+    """Chave do relatório da troca no acervo"""
+    return registro.get("id_troca") or \
+        f"{registro['instante']}:{registro['maquina']}:{registro['ferramenta']}"
+
+
+class AcervoRelatorios:
+    """PDFs de troca guardados em segmentos, achados pela chave da troca"""
+
+    def __init__(self, pasta):
+        self.pasta = pasta
+        self.pasta_segmentos = os.path.join(pasta, "segmentos")
+        self.arquivo_indice = os.path.join(pasta, "indice.jsonl")
+        os.makedirs(self.pasta_segmentos, exist_ok=True)
+
+        self.relatorios = {}  # chave -> (hash, nome do arquivo)
+        self.conteudos = {}  # hash -> (segmento, posição, comprimido, original)
+        self._lock = threading.Lock()
+        self._carregar_indice()
+        self._indice = open(self.arquivo_indice, "a", encoding="utf-8")
+        self._segmento = max((s for s, *_ in self.conteudos.values()), default=1)
+        self._arquivo_segmento = open(self._caminho_segmento(self._segmento), "ab")
+
+    def __len__(self):
+        return len(self.relatorios)
+
+    def __contains__(self, chave):
+        return chave in self.relatorios
+
+    def _carregar_indice(self):
+        if not os.path.exists(self.arquivo_indice):
+            return
+        with open(self.arquivo_indice, "rb+") as f:
+            valido = 0
+            for linha in f:
+                if not linha.endswith(b"\n"):
+                    break  # última linha truncada por queda durante a gravação
+                try:
+                    entrada = json.loads(linha)
+                except ValueError:
+                    break
+                if "chave" in entrada:
+                    self.relatorios[entrada["chave"]] = (bytes.fromhex(entrada["hash"]),
+                                                         entrada["nome"])
+                else:
+                    self.conteudos[bytes.fromhex(entrada["hash"])] = (
+                        entrada["segmento"], entrada["posicao"],
+                        entrada["comprimido"], entrada["original"])
+                valido += len(linha)
+            f.truncate(valido)
+
+    def _caminho_segmento(self, numero):
+        return os.path.join(self.pasta_segmentos, f"{numero:06d}.seg")
+
+    def guardar(self, chave, conteudo, nome):
+        """Guarda o PDF ``conteudo`` (bytes) como relatório da troca ``chave``
+
+        Se os mesmos bytes já estão no acervo, só a ligação é gravada. Uma
+        chave já guardada passa a apontar para o conteúdo novo.
+        """
+        resumo = hashlib.sha256(conteudo).digest()
+        with self._lock:
+            linhas = []
+            if resumo not in self.conteudos:
+                linhas.append(self._gravar_conteudo(resumo, conteudo))
+            if self.relatorios.get(chave) != (resumo, nome):
+                self.relatorios[chave] = (resumo, nome)
+                linhas.append({"chave": chave, "hash": resumo.hex(), "nome": nome})
+            if linhas:
+                self._indice.writelines(json.dumps(l, ensure_ascii=False) + "\n"
+                                        for l in linhas)
+                self._indice.flush()
+                os.fsync(self._indice.fileno())
+        return chave
+
+    def guardar_registro(self, registro, conteudo, nome):
+        """``guardar`` com a chave do registro; retorna a chave"""
+        return self.guardar(chave_do_registro(registro), conteudo, nome)
+
+    def _gravar_conteudo(self, resumo, conteudo):
+        """Anexa o conteúdo comprimido ao segmento (chamar com o lock)"""
+        comprimido = zlib.compress(conteudo, 6)
+        posicao = self._arquivo_segmento.tell()
+        if posicao and posicao + CABECALHO.size + len(comprimido) > TAMANHO_SEGMENTO:
+            self._arquivo_segmento.close()
+            self._segmento += 1
+            self._arquivo_segmento = open(self._caminho_segmento(self._segmento), "ab")
+            posicao = 0
+        self._arquivo_segmento.write(
+            CABECALHO.pack(MARCA, len(comprimido), len(conteudo), resumo) + comprimido)
+        self._arquivo_segmento.flush()
+        # O conteúdo vai para o disco antes da linha do índice que aponta para ele
+        os.fsync(self._arquivo_segmento.fileno())
+        self.conteudos[resumo] = (self._segmento, posicao, len(comprimido), len(conteudo))
+        return {"hash": resumo.hex(), "segmento": self._segmento, "posicao": posicao,
+                "comprimido": len(comprimido), "original": len(conteudo)}
+
+    def nome(self, chave):
+        """Nome do arquivo do relatório; ``KeyError`` se a troca não tem relatório"""
+        return self.relatorios[chave][1]
+
+    def abrir(self, chave):
+        """Iterador dos bytes do PDF em pedaços; ``KeyError`` se a troca não tem relatório"""
+        resumo, _ = self.relatorios[chave]
+        return self._ler_conteudo(chave, resumo, *self.conteudos[resumo][:3])
+
+    def _ler_conteudo(self, chave, resumo, segmento, posicao, comprimido):
+        descompressor = zlib.decompressobj()
+        conferencia = hashlib.sha256()
+        with open(self._caminho_segmento(segmento), "rb") as f:
+            f.seek(posicao)
+            marca, tamanho, _, resumo_gravado = CABECALHO.unpack(f.read(CABECALHO.size))
+            if marca != MARCA or tamanho != comprimido or resumo_gravado != resumo:
+                raise ValueError(f"Acervo corrompido no relatório {chave}")
+            restante = comprimido
+            while restante:
+                dados = f.read(min(TAMANHO_PEDACO, restante))
+                if not dados:
+                    raise ValueError(f"Acervo truncado no relatório {chave}")
+                restante -= len(dados)
+                pedaco = descompressor.decompress(dados)
+                conferencia.update(pedaco)
+                yield pedaco
+        final = descompressor.flush()
+        conferencia.update(final)
+        if conferencia.digest() != resumo:
+            raise ValueError(f"Acervo corrompido no relatório {chave}")
+        yield final
+
+    def ler(self, chave):
+        return b"".join(self.abrir(chave))
+
+    def extrair(self, chave, destino):
+        """Grava o PDF em ``destino`` (arquivo ou pasta, onde usa o nome guardado)"""
+        if os.path.isdir(destino):
+            destino = os.path.join(destino, self.nome(chave))
+        temporario = destino + ".tmp"
+        with open(temporario, "wb") as f:
+            for pedaco in self.abrir(chave):
+                f.write(pedaco)
+        os.replace(temporario, destino)
+        return destino
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                "relatorios": len(self.relatorios),
+                "conteudos": len(self.conteudos),
+                "segmentos": self._segmento,
+                "bytes_originais": sum(c[3] for c in self.conteudos.values()),
+                "bytes_comprimidos": sum(c[2] for c in self.conteudos.values()),
+            }
+
+    def fechar(self):
+        with self._lock:
+            self._indice.close()
+            self._arquivo_segmento.close()
+
+
+def migrar_pasta(acervo, armazenamento, pasta, remover=False):
+    """Leva os PDFs soltos (``Relatorio_Troca_<data>.pdf``) de ``pasta`` para o acervo
+
+    Cada arquivo é ligado à troca do mesmo instante; trocas antigas, gravadas
+    só com o minuto, valem pelo minuto. Arquivos sem troca correspondente,
+    ou com mais de uma candidata, ficam onde estão. Com ``remover``, os
+    migrados são apagados. Retorna (migrados, deixados).
+    """
+    migrados = deixados = 0
+    for nome in sorted(os.listdir(pasta)):
+        encontrado = NOME_ANTIGO.match(nome)
+        if not encontrado:
+            continue
+        momento = datetime.strptime(encontrado.group(1), "%Y%m%d_%H%M%S")
+        minuto = momento.replace(second=0)
+        instantes = (int(momento.timestamp()), int(minuto.timestamp()))
+        candidatos = [
+            r for r in armazenamento.consultar_historico(
+                inicio=minuto, fim=minuto + timedelta(minutes=1))
+            if r["instante"] in instantes and chave_do_registro(r) not in acervo]
+        if len(candidatos) != 1:
+            deixados += 1
+            continue
+        caminho = os.path.join(pasta, nome)
+        with open(caminho, "rb") as f:
+            acervo.guardar_registro(candidatos[0], f.read(), nome)
+        if remover:
+            os.remove(caminho)
+        migrados += 1
+    return migrados, deixados
+
+
+_acervos = {}
+_lock_acervos = threading.Lock()
+
+
+def obter_acervo(pasta=dominio.PASTA_ACERVO):
+    """Acervo do processo para a pasta (aberto na primeira chamada)"""
+    chave = os.path.abspath(pasta)
+    with _lock_acervos:
+        acervo = _acervos.get(chave)
+        if acervo is None:
+            acervo = _acervos[chave] = AcervoRelatorios(pasta)
+        return acervo
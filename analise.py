@@ -0,0 +1,224 @@
+"""Análise de vida útil das ferramentas sobre o histórico de trocas
+
+Os registros ficam em arrays NumPy colunares (números) e em códigos
+inteiros (campos de texto), e as estatísticas de cada agrupamento são
+calculadas em passadas vetorizadas. Depois do primeiro cálculo, ``anexar``
+atualiza contagens, somas e motivos em O(1); só os quantis dos grupos que
+receberam trocas novas são recalculados na próxima consulta.
+"""
+import numpy as np
+
+
+DIMENSOES = ("ferramenta", "maquina", "operador")
+CATEGORICOS = DIMENSOES + ("motivo",)
+QUANTIS = (0.1, 0.5, 0.9)
+
+
+def quantis_agrupados(codigos, valores, quantidade_grupos, quantis=QUANTIS):
+    """Quantis (interpolação linear, como np.percentile) de cada grupo numa passada só
+
+    Retorna uma matriz (grupos x quantis); grupos vazios ficam com NaN.
+    """
+    ordem = np.lexsort((valores, codigos))
+    ordenados = valores[ordem].astype(np.float64)
+    contagem = np.bincount(codigos, minlength=quantidade_grupos)
+    inicios = np.concatenate(([0], np.cumsum(contagem)[:-1]))
+
+    resultado = np.full((quantidade_grupos, len(quantis)), np.nan)
+    tem = contagem > 0
+    for j, q in enumerate(quantis):
+        posicao = inicios[tem] + q * (contagem[tem] - 1)
+        baixo = np.floor(posicao).astype(np.int64)
+        alto = np.ceil(posicao).astype(np.int64)
+        fracao = posicao - baixo
+        resultado[tem, j] = ordenados[baixo] * (1 - fracao) + ordenados[alto] * fracao
+    return resultado
+
+
+class AnaliseVida:
+    """Estatísticas de vida por ferramenta, máquina e operador"""
+
+    def __init__(self, registros=()):
+        self.n = 0
+        self.pecas = np.empty(0, np.int64)
+        self.vida_esperada = np.empty(0, np.int64)
+        self.percentual = np.empty(0, np.float64)
+        self.codigos = {campo: np.empty(0, np.int32) for campo in CATEGORICOS}
+        self.valores = {campo: [] for campo in CATEGORICOS}
+        self._indice = {campo: {} for campo in CATEGORICOS}
+
+        # Agregados calculados por dimensão e grupos com quantis desatualizados
+        self._agregados = {}
+        self._sujos = {dimensao: set() for dimensao in DIMENSOES}
+
+        self.carregar(registros)
+
+    def carregar(self, registros):
+        """Substitui o conteúdo pelos registros dados (carga em lote)"""
+        pecas, vida, percentual = [], [], []
+        codigos = {campo: [] for campo in CATEGORICOS}
+        self.valores = {campo: [] for campo in CATEGORICOS}
+        self._indice = {campo: {} for campo in CATEGORICOS}
+
+        for registro in registros:
+            pecas.append(registro["pecas_feitas"])
+            vida.append(registro["vida_esperada"])
+            percentual.append(registro["percentual"])
+            for campo in CATEGORICOS:
+                codigos[campo].append(self._codificar(campo, registro[campo]))
+
+        self.n = len(pecas)
+        self.pecas = np.array(pecas, np.int64)
+        self.vida_esperada = np.array(vida, np.int64)
+        self.percentual = np.array(percentual, np.float64)
+        self.codigos = {campo: np.array(codigos[campo], np.int32) for campo in CATEGORICOS}
+        self._agregados = {}
+        self._sujos = {dimensao: set() for dimensao in DIMENSOES}
+
+    def anexar(self, registro):
+        """Inclui uma troca nova e atualiza os agregados já calculados"""
+        if self.n == len(self.pecas):
+            self._crescer(max(1024, self.n * 2))
+
+        i = self.n
+        self.pecas[i] = registro["pecas_feitas"]
+        self.vida_esperada[i] = registro["vida_esperada"]
+        self.percentual[i] = registro["percentual"]
+        for campo in CATEGORICOS:
+            self.codigos[campo][i] = self._codificar(campo, registro[campo])
+        self.n += 1
+
+        motivo = self.codigos["motivo"][i]
+        for dimensao, agregado in self._agregados.items():
+            grupo = self.codigos[dimensao][i]
+            self._ajustar_tamanho(dimensao, agregado)
+            agregado["trocas"][grupo] += 1
+            agregado["soma_pecas"][grupo] += self.pecas[i]
+            agregado["soma_percentual"][grupo] += self.percentual[i]
+            agregado["motivos"][grupo, motivo] += 1
+            self._sujos[dimensao].add(grupo)
+
+    def resumo(self, dimensao):
+        """Estatísticas por grupo da dimensão ('ferramenta', 'maquina' ou 'operador')
+
+        Retorna {nome: {"trocas", "media", "mediana", "p10", "p90",
+        "media_percentual", "taxa_quebra", "motivos": {motivo: trocas}}}.
+        """
+        agregado = self._agregado(dimensao)
+        trocas = agregado["trocas"]
+        com_trocas = np.maximum(trocas, 1)
+        media = agregado["soma_pecas"] / com_trocas
+        media_percentual = agregado["soma_percentual"] / com_trocas
+        quebras = agregado["motivos"] @ self._mascara_quebra()
+        taxa_quebra = quebras / com_trocas
+        quantis = agregado["quantis"]
+        motivos = self.valores["motivo"]
+
+        resultado = {}
+        for grupo, nome in enumerate(self.valores[dimensao]):
+            if not trocas[grupo]:
+                continue
+            linha_motivos = agregado["motivos"][grupo]
+            resultado[nome] = {
+                "trocas": int(trocas[grupo]),
+                "media": float(media[grupo]),
+                "p10": float(quantis[grupo, 0]),
+                "mediana": float(quantis[grupo, 1]),
+                "p90": float(quantis[grupo, 2]),
+                "media_percentual": float(media_percentual[grupo]),
+                "taxa_quebra": float(taxa_quebra[grupo]),
+                "motivos": {motivos[m]: int(linha_motivos[m])
+                            for m in np.flatnonzero(linha_motivos)},
+            }
+        return resultado
+
+    def comparar_operadores(self):
+        """Resumo por operador com a diferença para a média geral da fábrica
+
+        ``desvio_percentual`` é a média de % de vida do operador menos a média
+        geral; ``desvio_quebra`` faz o mesmo com a taxa de quebra.
+        """
+        resumo = self.resumo("operador")
+        if not self.n:
+            return resumo
+        media_geral = float(self.percentual[:self.n].mean())
+        motivos = self.codigos["motivo"][:self.n]
+        taxa_geral = float(self._mascara_quebra()[motivos].mean())
+        for estatisticas in resumo.values():
+            estatisticas["desvio_percentual"] = estatisticas["media_percentual"] - media_geral
+            estatisticas["desvio_quebra"] = estatisticas["taxa_quebra"] - taxa_geral
+        return resumo
+
+    def _agregado(self, dimensao):
+        if dimensao not in self._agregados:
+            self._agregados[dimensao] = self._calcular(dimensao)
+            self._sujos[dimensao] = set()
+        agregado = self._agregados[dimensao]
+
+        sujos = self._sujos[dimensao]
+        if sujos:
+            # Recalcular quantis só das linhas dos grupos que mudaram
+            grupos = np.fromiter(sujos, np.int32)
+            codigos = self.codigos[dimensao][:self.n]
+            mascara = np.isin(codigos, grupos)
+            quantis = quantis_agrupados(codigos[mascara], self.pecas[:self.n][mascara],
+                                        len(self.valores[dimensao]))
+            agregado["quantis"][grupos] = quantis[grupos]
+            sujos.clear()
+        return agregado
+
+    def _calcular(self, dimensao):
+        """Passada vetorizada completa sobre todas as trocas"""
+        n = self.n
+        grupos = len(self.valores[dimensao])
+        motivos = len(self.valores["motivo"])
+        codigos = self.codigos[dimensao][:n]
+        pecas = self.pecas[:n]
+
+        combinados = codigos.astype(np.int64) * motivos + self.codigos["motivo"][:n]
+        return {
+            "trocas": np.bincount(codigos, minlength=grupos).astype(np.int64),
+            "soma_pecas": np.bincount(codigos, weights=pecas, minlength=grupos),
+            "soma_percentual": np.bincount(codigos, weights=self.percentual[:n],
+                                           minlength=grupos),
+            "motivos": np.bincount(combinados, minlength=grupos * motivos)
+                         .reshape(grupos, motivos).astype(np.int64),
+            "quantis": quantis_agrupados(codigos, pecas, grupos),
+        }
+
+    def _ajustar_tamanho(self, dimensao, agregado):
+        """Acompanha grupos e motivos que apareceram depois do cálculo"""
+        grupos = len(self.valores[dimensao])
+        motivos = len(self.valores["motivo"])
+        faltam = grupos - len(agregado["trocas"])
+        if faltam > 0:
+            for chave in ("trocas", "soma_pecas", "soma_percentual"):
+                agregado[chave] = np.pad(agregado[chave], (0, faltam))
+            agregado["quantis"] = np.pad(agregado["quantis"], ((0, faltam), (0, 0)),
+                                         constant_values=np.nan)
+        faltam_motivos = motivos - agregado["motivos"].shape[1]
+        if faltam > 0 or faltam_motivos > 0:
+            agregado["motivos"] = np.pad(agregado["motivos"],
+                                         ((0, max(faltam, 0)), (0, max(faltam_motivos, 0))))
+
+    def _mascara_quebra(self):
+        return np.array(["Quebrou" in m for m in self.valores["motivo"]], np.float64)
+
+    def _codificar(self, campo, valor):
+        indice = self._indice[campo]
+        codigo = indice.get(valor)
+        if codigo is None:
+            codigo = indice[valor] = len(self.valores[campo])
+            self.valores[campo].append(valor)
+        return codigo
+
+    def _crescer(self, capacidade):
+        def crescido(array):
+            novo = np.empty(capacidade, array.dtype)
+            novo[:self.n] = array[:self.n]
+            return novo
+
+        self.pecas = crescido(self.pecas)
+        self.vida_esperada = crescido(self.vida_esperada)
+        self.percentual = crescido(self.percentual)
+        self.codigos = {campo: crescido(a) for campo, a in self.codigos.items()}
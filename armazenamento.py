@@ -0,0 +1,964 @@
+"""Persistência de dados do ToolLife Pro
+
+O ``ToolLifePro`` fala apenas com a interface ``Armazenamento``. Há duas
+implementações: ``ArmazenamentoJSON`` (arquivos ``ferramental.json`` e
+``historico_trocas.json``, o formato original) e ``ArmazenamentoSQLite``
+(banco embutido com índices por máquina, ferramenta, operador, lote, motivo
+e instante).
+
+As trocas são gravadas com ``instante`` (segundos desde a época, com os
+segundos); o texto de exibição é montado só na tela e nos relatórios.
+Arquivos antigos, com a data em texto, são convertidos na primeira carga.
+
+``anexar_varios`` ignora trocas cujo ``id_troca`` já está gravado: um
+terminal que reenvia depois de uma falha de rede não duplica o histórico.
+"""
+import json
+import math
+import os
+import shutil
+import sqlite3
+import threading
+from json.encoder import encode_basestring as texto_json
+
+import historico
+from historico import HistoricoColunar, formatar_data
+
+
+CAMPOS_HISTORICO = list(historico.CAMPOS)
+
+# Linha do diário: o mesmo texto de json.dumps({"seq": ..., "registro": ...})
+codificar_json = json.JSONEncoder(ensure_ascii=False).encode
+INICIO_LINHA_DIARIO = '{"seq": '
+SEPARADOR_REGISTRO = ', "registro": '
+INICIO_REGISTRO_V4 = SEPARADOR_REGISTRO + '{"instante": '
+
+
+def codificar_registro(registro):
+    """Texto JSON do registro, o mesmo de ``codificar_json``
+
+    Um registro no formato de ``dominio.montar_registro`` (as chaves de
+    ``historico.CAMPOS`` nessa ordem, textos em str e contagens em int) é
+    montado direto numa f-string, umas quatro vezes mais rápido que o
+    encoder genérico, que fica para qualquer outro registro.
+    """
+    if tuple(registro) == historico.CAMPOS:
+        (instante, operador, maquina, ferramenta, lote, pecas_feitas, vida_esperada,
+         percentual, motivo, observacoes, id_troca) = registro.values()
+        if (type(instante) is type(pecas_feitas) is type(vida_esperada) is int
+                and type(operador) is type(maquina) is type(ferramenta) is str
+                and type(lote) is type(motivo) is type(observacoes) is str
+                and (type(percentual) is int
+                     or type(percentual) is float and math.isfinite(percentual))
+                and (id_troca is None or type(id_troca) is str)):
+            return (f'{{"instante": {instante}, "operador": {texto_json(operador)}, '
+                    f'"maquina": {texto_json(maquina)}, '
+                    f'"ferramenta": {texto_json(ferramenta)}, "lote": {texto_json(lote)}, '
+                    f'"pecas_feitas": {pecas_feitas}, "vida_esperada": {vida_esperada}, '
+                    f'"percentual": {percentual!r}, "motivo": {texto_json(motivo)}, '
+                    f'"observacoes": {texto_json(observacoes)}, "id_troca": '
+                    f'{"null" if id_troca is None else texto_json(id_troca)}}}')
+    return codificar_json(registro)
+
+
+def dados_padrao():
+    """Catálogo inicial usado quando não há dados salvos"""
+    return {
+        "maquinas": ["301", "302", "303", "304", "305", "306", "307"],
+        "ferramentas": ["Broca Ø6mm", "Broca Ø8mm", "Macho M6", "Macho M8", 
+                       "Inserto CNMG", "Inserto DNMG", "Bedame 12mm", "Fresa Ø16mm"],
+        "vida_padrao": {
+            "Broca Ø6mm": 1500,
+            "Broca Ø8mm": 1200,
+            "Macho M6": 800,
+            "Macho M8": 600,
+            "Inserto CNMG": 2000,
+            "Inserto DNMG": 1800,
+            "Bedame 12mm": 1000,
+            "Fresa Ø16mm": 900
+        }
+    }
+
+
+def instante_do_registro(registro):
+    """Segundos desde a época do registro (0 se a data for ilegível)"""
+    try:
+        return historico.instante_do_registro(registro)
+    except (KeyError, TypeError, ValueError):
+        return 0
+
+
+class Armazenamento:
+    """Interface de persistência do catálogo e do histórico de trocas"""
+
+    def carregar_dados(self):
+        """Retorna o catálogo: {"maquinas": [...], "ferramentas": [...], "vida_padrao": {...}}"""
+        raise NotImplementedError
+
+    def salvar_dados(self, dados):
+        """Persiste o catálogo completo"""
+        raise NotImplementedError
+
+    def carregar_historico(self):
+        """Retorna uma sequência do histórico, mais recentes primeiro"""
+        raise NotImplementedError
+
+    def anexar_historico(self, registro):
+        """Persiste uma nova troca (aparece no topo de carregar_historico)"""
+        raise NotImplementedError
+
+    def anexar_varios(self, registros):
+        """Persiste várias trocas (do mais antigo ao mais novo) de uma vez
+
+        Trocas com ``id_troca`` já gravado (no histórico ou antes, no mesmo
+        lote) são ignoradas. Retorna quantas foram gravadas.
+        """
+        raise NotImplementedError
+
+    def preparar_carga(self, quantidade):
+        """Avisa que virão cerca de ``quantidade`` trocas por ``anexar_varios``
+
+        Chamado antes de uma carga grande (importação), que termina sempre
+        com ``compactar``: o que for desfeito aqui é refeito lá.
+        """
+
+    def compactar(self):
+        """Arruma o armazenamento depois de uma carga grande (importação)"""
+
+    def buscar_troca(self, id_troca):
+        """A troca com esse ``id_troca``, ou None"""
+        raise NotImplementedError
+
+    def consultar_historico(self, maquina=None, ferramenta=None, operador=None, lote=None,
+                            inicio=None, fim=None, limite=None, deslocamento=0, motivo=None):
+        """Lista trocas filtradas, mais recentes (maior instante) primeiro
+
+        ``inicio`` e ``fim`` são ``datetime`` (intervalo fechado no início e
+        aberto no fim) e são resolvidos pelo índice de instantes, sem varrer
+        o histórico.
+        """
+        raise NotImplementedError
+
+    def iterar_historico(self, maquina=None, ferramenta=None, operador=None, lote=None,
+                         inicio=None, fim=None, tamanho_pagina=500, motivo=None):
+        """Percorre as trocas filtradas em ordem cronológica, página por página
+
+        Gerador: só uma página de registros fica na memória por vez.
+        """
+        raise NotImplementedError
+
+    def fechar(self):
+        """Libera arquivos e conexões"""
+
+
+class ArmazenamentoJSON(Armazenamento):
+    """Catálogo em JSON e histórico em diário append-only
+
+    O histórico é lido do disco uma vez, na primeira consulta (ou em
+    ``carregar_historico``); gravar trocas não exige a leitura.
+    """
+
+    def __init__(self, arquivo_dados, arquivo_historico):
+        self.arquivo_dados = arquivo_dados
+        self.diario = DiarioHistorico(arquivo_historico)
+        self.historico = None
+        self.lock = threading.Lock()
+
+    def carregar_dados(self):
+        if os.path.exists(self.arquivo_dados):
+            try:
+                with open(self.arquivo_dados, "r", encoding="utf-8") as f:
+                    return json.load(f)
+            except (OSError, ValueError) as e:
+                # Guarda o arquivo ilegível: a próxima gravação do catálogo
+                # padrão não pode apagá-lo
+                copia = self.arquivo_dados + ".ilegivel"
+                print(f"Erro ao ler {self.arquivo_dados} ({e}); guardado como {copia}")
+                try:
+                    os.replace(self.arquivo_dados, copia)
+                except OSError:
+                    pass
+        return dados_padrao()
+
+    def salvar_dados(self, dados):
+        # Arquivo novo, no disco, e só então no lugar do antigo: uma queda no
+        # meio deixa o catálogo anterior inteiro
+        temporario = self.arquivo_dados + ".tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump(dados, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporario, self.arquivo_dados)
+
+    def carregar_historico(self):
+        if self.historico is None:
+            with self.lock:
+                if self.historico is None:
+                    self.historico = self.diario.carregar()
+        return self.historico
+
+    def anexar_historico(self, registro):
+        self.diario.anexar(registro)
+
+    def anexar_varios(self, registros):
+        return self.diario.anexar_varios(registros)
+
+    def compactar(self):
+        self.diario.compactar()
+
+    def buscar_troca(self, id_troca):
+        return self.carregar_historico().buscar_id(id_troca)
+
+    def consultar_historico(self, maquina=None, ferramenta=None, operador=None, lote=None,
+                            inicio=None, fim=None, limite=None, deslocamento=0, motivo=None):
+        return list(self._consultar(True, maquina, ferramenta, operador, lote, motivo,
+                                    inicio, fim, deslocamento, limite))
+
+    def iterar_historico(self, maquina=None, ferramenta=None, operador=None, lote=None,
+                         inicio=None, fim=None, tamanho_pagina=500, motivo=None):
+        return self._consultar(False, maquina, ferramenta, operador, lote, motivo,
+                               inicio, fim)
+
+    def _consultar(self, decrescente, maquina, ferramenta, operador, lote, motivo,
+                   inicio, fim, deslocamento=0, limite=None):
+        return self.carregar_historico().consultar(
+            int(inicio.timestamp()) if inicio else None,
+            int(fim.timestamp()) if fim else None,
+            decrescente, deslocamento, limite,
+            maquina=maquina, ferramenta=ferramenta, operador=operador, lote=lote,
+            motivo=motivo)
+
+    def fechar(self):
+        self.diario.fechar()
+
+
+class DiarioHistorico:
+    """Histórico de trocas em diário append-only com compactação periódica
+
+    Cada troca é gravada como uma linha JSON no diário (``.jsonl``), então o
+    custo de salvar não depende do tamanho do histórico. Quando o diário
+    fica do tamanho do snapshot, ele é compactado em segundo plano no
+    arquivo de snapshot: numa carga grande o snapshot é regravado poucas
+    vezes e o custo total cresce com o histórico, não com o número de
+    lotes. Cada linha leva um número de sequência, o que torna a
+    reaplicação do diário segura mesmo se o programa cair no meio de uma
+    compactação.
+
+    Em memória o histórico fica num ``HistoricoColunar``. O snapshot é um
+    cabeçalho JSON seguido de um registro por linha, em ordem de chegada,
+    para ser lido e gravado em fluxo, sem montar a lista inteira de dicts.
+
+    Anexar não exige ``carregar``: basta saber o último número de
+    sequência, que sai do cabeçalho do snapshot e dos diários. Sem o
+    histórico em memória, ``anexar_varios`` confere as repetidas num
+    conjunto com os ids gravados, lido uma vez (só os ids), e a compactação
+    junta snapshot e diário em fluxo. ``anexar`` é para a troca nova, de
+    id recém-criado: não lê os ids, e uma repetida seria descartada ao
+    reaplicar o diário.
+
+    A versão 4 do snapshot grava ``instante`` no lugar do texto ``data``.
+    Ao carregar arquivos anteriores (ou diário com registros antigos), o
+    texto é convertido uma vez e uma compactação regrava tudo no formato
+    novo.
+    """
+
+    VERSAO_SNAPSHOT = 4
+
+    LIMITE_COMPACTACAO = 1000
+
+    def __init__(self, arquivo_snapshot, limite_compactacao=None):
+        self.arquivo_snapshot = arquivo_snapshot
+        base = os.path.splitext(arquivo_snapshot)[0]
+        self.arquivo_diario = base + ".jsonl"
+        self.arquivo_rotacionado = base + ".jsonl.compactando"
+        self.limite_compactacao = limite_compactacao or self.LIMITE_COMPACTACAO
+
+        self._lock = threading.Lock()
+        self._registros = HistoricoColunar()
+        self._seq = 0
+        self._pendentes = 0  # registros no diário que ainda não estão no snapshot
+        self._no_snapshot = 0  # registros no snapshot (depois da última compactação)
+        self._arquivo = None
+        self._thread_compactacao = None
+        self.carregado = False
+        # Sem o histórico carregado: ids gravados e seqs do diário repetidos
+        self._ids = None
+        self._seqs_repetidos = set()
+
+    def carregar(self):
+        """Carrega snapshot + diário e retorna o histórico (mais recentes primeiro)"""
+        thread = self._thread_compactacao
+        if thread:
+            thread.join()  # recarregando: a compactação lê o histórico antigo
+        with self._lock:
+            if self._arquivo:
+                self._arquivo.close()
+            self._registros = HistoricoColunar()
+            ultimo_seq, legado = self._carregar_snapshot(self._registros)
+            self._seq = ultimo_seq
+            self._no_snapshot = len(self._registros)
+
+            # Reaplicar diário rotacionado (compactação interrompida) e diário atual
+            self._pendentes = 0
+            for caminho in (self.arquivo_rotacionado, self.arquivo_diario):
+                for seq, registro in self._ler_diario(caminho):
+                    self._seq = max(self._seq, seq)
+                    if seq <= ultimo_seq:
+                        continue
+                    id_troca = registro.get("id_troca")
+                    if id_troca and self._registros.buscar_id(id_troca) is not None:
+                        continue  # gravada de novo sem o histórico carregado
+                    self._registros.anexar(registro)
+                    self._pendentes += 1
+                    legado = legado or "instante" not in registro
+
+            self._abrir_diario()
+            self.carregado = True
+            self._ids = None
+            self._seqs_repetidos = set()
+            if legado and self._registros and not self._compactando():
+                # Regravar no formato novo: a data em texto não é lida de novo
+                self._iniciar_compactacao()
+            return self._registros
+
+    def anexar(self, registro):
+        """Grava uma troca nova no diário (e no topo da lista em memória, se carregada)"""
+        self._anexar([registro], conferir=False)
+
+    def anexar_varios(self, registros):
+        """Grava várias trocas (do mais antigo ao mais novo) com um único fsync
+
+        Pula as que têm ``id_troca`` já gravado; retorna quantas gravou.
+        """
+        return self._anexar(registros, conferir=True)
+
+    def compactar(self, aguardar=True):
+        """Compacta agora o diário no snapshot (ex.: no fim de uma carga grande)"""
+        self._preparar()
+        thread = self._thread_compactacao
+        if thread:
+            thread.join()
+        with self._lock:
+            if not self._compactando() and self._pendentes:
+                if not self.carregado and self._ids is None:
+                    self._ler_ids()
+                self._iniciar_compactacao()
+            thread = self._thread_compactacao
+        if aguardar and thread:
+            thread.join()
+
+    def fechar(self):
+        """Aguarda compactação pendente e fecha o diário"""
+        thread = self._thread_compactacao
+        if thread:
+            thread.join()
+        with self._lock:
+            if self._arquivo:
+                self._arquivo.close()
+                self._arquivo = None
+
+    def _anexar(self, registros, conferir):
+        self._preparar()
+        with self._lock:
+            if conferir and not self.carregado and self._ids is None:
+                self._ler_ids()
+            novos = []
+            ids = set()
+            for registro in registros:
+                id_troca = registro.get("id_troca")
+                if id_troca:
+                    if id_troca in ids or self._gravada(id_troca):
+                        continue
+                    ids.add(id_troca)
+                novos.append(registro)
+
+            if not novos:
+                return 0
+            primeiro = self._seq + 1
+            self._seq += len(novos)
+            linhas = [f"{INICIO_LINHA_DIARIO}{seq}{SEPARADOR_REGISTRO}"
+                      f"{codificar_registro(registro)}}}\n"
+                      for seq, registro in zip(range(primeiro, self._seq + 1), novos)]
+            self._arquivo.writelines(linhas)
+            self._arquivo.flush()
+            os.fsync(self._arquivo.fileno())
+            self._pendentes += len(linhas)
+
+            if self.carregado:
+                for registro in novos:
+                    self._registros.anexar(registro)
+            elif self._ids is not None:
+                self._ids.update(ids)
+            else:
+                return len(novos)  # sem os ids não dá para juntar em fluxo: fica para a carga
+
+            # Pelo tamanho do diário, não por lote: o snapshot é regravado
+            # quando o diário já é do tamanho dele
+            limiar = max(self.limite_compactacao, self._no_snapshot)
+            if self._pendentes >= limiar and not self._compactando():
+                self._iniciar_compactacao()
+            return len(novos)
+
+    def _gravada(self, id_troca):
+        """Se o id já está gravado (chamar com lock)"""
+        if self.carregado:
+            return self._registros.buscar_id(id_troca) is not None
+        return self._ids is not None and id_troca in self._ids
+
+    def _preparar(self):
+        """Abre o diário para anexar, carregando tudo se o snapshot for de formato antigo"""
+        if self._arquivo is None and not self._preparar_anexo():
+            self.carregar()
+
+    def _preparar_anexo(self):
+        """Abre o diário para anexar sem carregar o histórico
+
+        Retorna False se o snapshot está num formato antigo, sem cabeçalho
+        com o último seq (aí é preciso carregar).
+        """
+        with self._lock:
+            if self._arquivo is not None:
+                return True
+            if self.carregado:
+                self._abrir_diario()  # reaberto depois de fechar
+                return True
+            cabecalho = self._cabecalho_snapshot()
+            if cabecalho is None:
+                return False
+            ultimo_seq = cabecalho["ultimo_seq"]
+            self._no_snapshot = cabecalho.get("quantidade", ultimo_seq)
+            self._pendentes = 0
+            for caminho in (self.arquivo_rotacionado, self.arquivo_diario):
+                for seq, _ in self._ler_diario(caminho):
+                    if seq > ultimo_seq:
+                        self._pendentes += 1
+                    self._seq = max(self._seq, seq)
+            self._seq = max(self._seq, ultimo_seq)
+            self._abrir_diario()
+            return True
+
+    def _cabecalho_snapshot(self):
+        """Cabeçalho do snapshot v4 (vazio sem snapshot); None em formato antigo"""
+        if not os.path.exists(self.arquivo_snapshot):
+            return {"versao": self.VERSAO_SNAPSHOT, "ultimo_seq": 0, "quantidade": 0}
+        with open(self.arquivo_snapshot, "r", encoding="utf-8") as f:
+            try:
+                cabecalho = json.loads(f.readline())
+            except ValueError:
+                return None
+        if isinstance(cabecalho, dict) and cabecalho.get("versao") == self.VERSAO_SNAPSHOT:
+            return cabecalho
+        return None
+
+    def _ler_ids(self):
+        """Lê só os ids gravados no snapshot e nos diários (chamar com lock)
+
+        Também conta o snapshot e guarda os seqs do diário que repetem um
+        id (gravados por ``anexar`` sem conferir), que a compactação pula.
+        """
+        self._ids = set()
+        self._seqs_repetidos = set()
+        ultimo_seq = 0
+        if os.path.exists(self.arquivo_snapshot):
+            with open(self.arquivo_snapshot, "r", encoding="utf-8") as f:
+                ultimo_seq = json.loads(f.readline())["ultimo_seq"]
+                quantidade = 0
+                for linha in f:
+                    quantidade += 1
+                    id_troca = json.loads(linha).get("id_troca")
+                    if id_troca:
+                        self._ids.add(id_troca)
+                self._no_snapshot = quantidade
+        for caminho in (self.arquivo_rotacionado, self.arquivo_diario):
+            for seq, registro in self._ler_diario(caminho):
+                id_troca = registro.get("id_troca")
+                if seq <= ultimo_seq or not id_troca:
+                    continue
+                if id_troca in self._ids:
+                    self._seqs_repetidos.add(seq)
+                    self._pendentes -= 1
+                else:
+                    self._ids.add(id_troca)
+
+    def _abrir_diario(self):
+        """Abre o diário para anexar, descartando uma última linha truncada"""
+        if os.path.exists(self.arquivo_diario):
+            with open(self.arquivo_diario, "rb+") as f:
+                conteudo = f.read()
+                if conteudo and not conteudo.endswith(b"\n"):
+                    f.truncate(conteudo.rfind(b"\n") + 1)
+        self._arquivo = open(self.arquivo_diario, "a", encoding="utf-8")
+
+    def _compactando(self):
+        return self._thread_compactacao is not None and self._thread_compactacao.is_alive()
+
+    def _iniciar_compactacao(self):
+        """Rotaciona o diário e grava o snapshot em segundo plano (chamar com lock)"""
+        self._arquivo.close()
+        if os.path.exists(self.arquivo_rotacionado):
+            # Sobra de compactação interrompida: juntar os dois diários
+            with open(self.arquivo_diario, "r", encoding="utf-8") as origem, \
+                    open(self.arquivo_rotacionado, "a", encoding="utf-8") as destino:
+                destino.write(origem.read())
+            os.remove(self.arquivo_diario)
+        else:
+            os.replace(self.arquivo_diario, self.arquivo_rotacionado)
+        self._abrir_diario()
+
+        ultimo_seq = self._seq
+        if self.carregado:
+            # O histórico colunar só cresce: os primeiros `quantidade` registros
+            # não mudam enquanto o snapshot é gravado, então não é preciso copiar
+            quantidade = len(self._registros)
+            alvo, argumentos = self._gravar_snapshot, (quantidade, ultimo_seq)
+        else:
+            quantidade = self._no_snapshot + self._pendentes
+            alvo = self._juntar_snapshot
+            argumentos = (quantidade, ultimo_seq, self._seqs_repetidos)
+            self._seqs_repetidos = set()
+        self._no_snapshot = quantidade
+        self._pendentes = 0
+
+        self._thread_compactacao = threading.Thread(target=alvo, args=argumentos, daemon=True)
+        self._thread_compactacao.start()
+
+    def _escrever_cabecalho(self, f, quantidade, ultimo_seq):
+        f.write(json.dumps({"versao": self.VERSAO_SNAPSHOT, "ultimo_seq": ultimo_seq,
+                            "quantidade": quantidade}) + "\n")
+
+    def _gravar_snapshot(self, quantidade, ultimo_seq):
+        try:
+            temporario = self.arquivo_snapshot + ".tmp"
+            with open(temporario, "w", encoding="utf-8") as f:
+                self._escrever_cabecalho(f, quantidade, ultimo_seq)
+                for registro in self._registros.cronologico(0, quantidade):
+                    f.write(json.dumps(dict(registro), ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporario, self.arquivo_snapshot)
+            os.remove(self.arquivo_rotacionado)
+        except Exception as e:
+            print(f"Erro ao compactar histórico: {e}")
+
+    def _juntar_snapshot(self, quantidade, ultimo_seq, seqs_repetidos):
+        """Snapshot novo = linhas do atual + diário rotacionado, sem montar o histórico"""
+        try:
+            temporario = self.arquivo_snapshot + ".tmp"
+            with open(temporario, "w", encoding="utf-8") as f:
+                self._escrever_cabecalho(f, quantidade, ultimo_seq)
+                anterior = 0
+                if os.path.exists(self.arquivo_snapshot):
+                    with open(self.arquivo_snapshot, "r", encoding="utf-8") as origem:
+                        anterior = json.loads(origem.readline())["ultimo_seq"]
+                        shutil.copyfileobj(origem, f)
+                for seq, registro in self._ler_diario(self.arquivo_rotacionado, em_texto=True):
+                    if seq <= anterior or seq in seqs_repetidos:
+                        continue
+                    if isinstance(registro, str):
+                        f.write(registro)
+                        continue
+                    if "instante" not in registro:
+                        registro = dict(registro, instante=instante_do_registro(registro))
+                        registro.pop("data", None)
+                    f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporario, self.arquivo_snapshot)
+            os.remove(self.arquivo_rotacionado)
+        except Exception as e:
+            print(f"Erro ao compactar histórico: {e}")
+
+    def _carregar_snapshot(self, historico):
+        """Preenche o histórico com o snapshot
+
+        Retorna (último seq incluído, se o arquivo está num formato antigo).
+        """
+        if not os.path.exists(self.arquivo_snapshot):
+            return 0, False
+        try:
+            with open(self.arquivo_snapshot, "r", encoding="utf-8") as f:
+                primeira = f.readline()
+                try:
+                    cabecalho = json.loads(primeira)
+                except ValueError:
+                    cabecalho = None
+
+                # v3: como a v4, mas com a data em texto
+                if isinstance(cabecalho, dict) and cabecalho.get("versao") in (3, 4):
+                    for linha in f:
+                        historico.anexar(json.loads(linha))
+                    return cabecalho["ultimo_seq"], cabecalho["versao"] != self.VERSAO_SNAPSHOT
+
+                # Formatos antigos: lista de registros (v1) ou {"registros": [...]} (v2),
+                # ambos do mais novo para o mais antigo
+                f.seek(0)
+                conteudo = json.load(f)
+        except Exception as e:
+            print(f"Erro ao ler histórico: {e}")
+            return 0, False
+
+        if isinstance(conteudo, list):
+            registros, ultimo_seq = conteudo, 0
+        else:
+            registros, ultimo_seq = conteudo.get("registros", []), conteudo.get("ultimo_seq", 0)
+        for registro in reversed(registros):
+            historico.anexar(registro)
+        return ultimo_seq, True
+
+    def _ler_diario(self, caminho, em_texto=False):
+        """Gera (seq, registro) das linhas do diário
+
+        Com ``em_texto``, o registro de uma linha gravada por ``_anexar`` no
+        formato v4 (começando pelo instante) vem como o texto JSON da linha,
+        já com o fim de linha, sem ser decodificado; as outras vêm em dict.
+        """
+        if not os.path.exists(caminho):
+            return
+        inicio = len(INICIO_LINHA_DIARIO)
+        with open(caminho, "r", encoding="utf-8") as f:
+            for linha in f:
+                if em_texto and linha.startswith(INICIO_LINHA_DIARIO) and linha.endswith("}\n"):
+                    fim_seq = linha.find(INICIO_REGISTRO_V4, inicio)
+                    if fim_seq > inicio and linha[inicio:fim_seq].isdigit():
+                        yield (int(linha[inicio:fim_seq]),
+                               linha[fim_seq + len(SEPARADOR_REGISTRO):-2] + "\n")
+                        continue
+                try:
+                    entrada = json.loads(linha)
+                except ValueError:
+                    # Última linha truncada por queda durante a gravação
+                    continue
+                yield entrada["seq"], entrada["registro"]
+
+
+class ArmazenamentoSQLite(Armazenamento):
+    """Catálogo e histórico num banco SQLite embutido e indexado"""
+
+    ESQUEMA = """
+        CREATE TABLE IF NOT EXISTS maquinas (
+            nome TEXT PRIMARY KEY
+        );
+        CREATE TABLE IF NOT EXISTS ferramentas (
+            nome TEXT PRIMARY KEY,
+            vida_padrao INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS historico (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            instante INTEGER NOT NULL,
+            data TEXT NOT NULL,
+            operador TEXT,
+            maquina TEXT,
+            ferramenta TEXT,
+            lote TEXT,
+            pecas_feitas INTEGER,
+            vida_esperada INTEGER,
+            percentual REAL,
+            motivo TEXT,
+            observacoes TEXT,
+            id_troca TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_historico_instante ON historico (instante);
+        CREATE INDEX IF NOT EXISTS idx_historico_maquina ON historico (maquina, instante);
+        CREATE INDEX IF NOT EXISTS idx_historico_ferramenta ON historico (ferramenta, instante);
+        CREATE INDEX IF NOT EXISTS idx_historico_operador ON historico (operador, instante);
+        CREATE INDEX IF NOT EXISTS idx_historico_lote ON historico (lote, instante);
+        CREATE INDEX IF NOT EXISTS idx_historico_motivo ON historico (motivo, instante);
+        CREATE TABLE IF NOT EXISTS meta (
+            chave TEXT PRIMARY KEY,
+            valor TEXT
+        );
+    """
+    # Índices só de consulta (o único de id_troca é o que descarta reenvios)
+    INDICES_CONSULTA = ("idx_historico_instante", "idx_historico_maquina",
+                        "idx_historico_ferramenta", "idx_historico_operador",
+                        "idx_historico_lote", "idx_historico_motivo")
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        # Handlers do Flet rodam em threads diferentes: uma conexão protegida por lock
+        self.conexao = sqlite3.connect(caminho, check_same_thread=False)
+        self.conexao.row_factory = sqlite3.Row
+        self.lock = threading.RLock()
+        with self.lock:
+            self.conexao.execute("PRAGMA journal_mode=WAL")
+            self.conexao.execute("PRAGMA synchronous=NORMAL")
+            self.conexao.executescript(self.ESQUEMA)
+            # Bancos criados antes do id_troca ganham a coluna (vazia nas trocas antigas)
+            colunas = {l["name"] for l in self.conexao.execute("PRAGMA table_info(historico)")}
+            if "id_troca" not in colunas:
+                self.conexao.execute("ALTER TABLE historico ADD COLUMN id_troca TEXT")
+            self.conexao.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_historico_id_troca "
+                                 "ON historico (id_troca)")
+
+    def vazio(self):
+        """Indica se o banco ainda não recebeu nenhum catálogo"""
+        with self.lock:
+            linha = self.conexao.execute(
+                "SELECT valor FROM meta WHERE chave = 'catalogo_salvo'").fetchone()
+        return linha is None
+
+    def carregar_dados(self):
+        if self.vazio():
+            return dados_padrao()
+        with self.lock:
+            maquinas = [l["nome"] for l in self.conexao.execute(
+                "SELECT nome FROM maquinas ORDER BY rowid")]
+            linhas = self.conexao.execute(
+                "SELECT nome, vida_padrao FROM ferramentas ORDER BY rowid").fetchall()
+        return {
+            "maquinas": maquinas,
+            "ferramentas": [l["nome"] for l in linhas],
+            "vida_padrao": {l["nome"]: l["vida_padrao"] for l in linhas}
+        }
+
+    def salvar_dados(self, dados):
+        with self.lock, self.conexao:
+            self._gravar_catalogo(dados)
+
+    def _gravar_catalogo(self, dados):
+        # A ordem de inserção (rowid) preserva a ordem das listas
+        self.conexao.execute("DELETE FROM maquinas")
+        self.conexao.execute("DELETE FROM ferramentas")
+        self.conexao.executemany(
+            "INSERT INTO maquinas (nome) VALUES (?)",
+            [(m,) for m in dados["maquinas"]])
+        self.conexao.executemany(
+            "INSERT INTO ferramentas (nome, vida_padrao) VALUES (?, ?)",
+            [(f, dados["vida_padrao"].get(f, 0)) for f in dados["ferramentas"]])
+        self.conexao.execute(
+            "INSERT OR REPLACE INTO meta (chave, valor) VALUES ('catalogo_salvo', '1')")
+
+    def carregar_historico(self):
+        return HistoricoSQLite(self)
+
+    def anexar_historico(self, registro):
+        with self.lock, self.conexao:
+            self._inserir_registros([registro])
+
+    def anexar_varios(self, registros):
+        """Insere vários registros (do mais antigo ao mais novo) numa transação"""
+        with self.lock, self.conexao:
+            return self._inserir_registros(registros)
+
+    def preparar_carga(self, quantidade):
+        # Carga maior que o histórico: sem os índices de consulta, cada linha
+        # atualiza só a tabela e o índice de id_troca, e o compactar refaz os
+        # outros de uma vez, ordenando (bem mais barato que atualizar cada um
+        # linha a linha). Se a carga cair no meio, o ESQUEMA os recria ao abrir
+        with self.lock:
+            existentes = self.conexao.execute("SELECT COUNT(*) FROM historico").fetchone()[0]
+            if quantidade > existentes:
+                for indice in self.INDICES_CONSULTA:
+                    self.conexao.execute(f"DROP INDEX IF EXISTS {indice}")
+
+    def compactar(self):
+        # Depois de uma carga grande: índices tirados por preparar_carga,
+        # estatísticas dos índices e o WAL de volta ao banco
+        with self.lock:
+            self.conexao.executescript(self.ESQUEMA)
+            self.conexao.execute("PRAGMA optimize")
+            self.conexao.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def _inserir_registros(self, registros):
+        # A coluna 'data' (texto) continua preenchida para versões antigas do
+        # app que abram o mesmo banco; as consultas usam só 'instante'
+        campos = CAMPOS_HISTORICO[1:]
+
+        def valores(registro):
+            instante = instante_do_registro(registro)
+            return (instante, formatar_data(instante), *map(registro.get, campos))
+
+        # O índice único em id_troca descarta reenvios (vários NULL são aceitos)
+        colunas = ["instante", "data"] + CAMPOS_HISTORICO[1:]
+        cursor = self.conexao.executemany(
+            "INSERT OR IGNORE INTO historico (" + ", ".join(colunas) + ") "
+            "VALUES (" + ", ".join("?" * len(colunas)) + ")",
+            (valores(r) for r in registros))
+        return cursor.rowcount
+
+    def buscar_troca(self, id_troca):
+        sql = "SELECT " + ", ".join(CAMPOS_HISTORICO) + " FROM historico WHERE id_troca = ?"
+        with self.lock:
+            linha = self.conexao.execute(sql, (id_troca,)).fetchone()
+        return None if linha is None else dict(linha)
+
+    def consultar_historico(self, maquina=None, ferramenta=None, operador=None, lote=None,
+                            inicio=None, fim=None, limite=None, deslocamento=0, motivo=None):
+        condicoes, parametros = self._filtros(
+            maquina, ferramenta, operador, lote, inicio, fim, motivo)
+        sql = "SELECT " + ", ".join(CAMPOS_HISTORICO) + " FROM historico"
+        if condicoes:
+            sql += " WHERE " + " AND ".join(condicoes)
+        sql += " ORDER BY instante DESC, id DESC LIMIT ? OFFSET ?"
+        parametros += [limite if limite is not None else -1, deslocamento]
+        with self.lock:
+            return [dict(l) for l in self.conexao.execute(sql, parametros)]
+
+    def iterar_historico(self, maquina=None, ferramenta=None, operador=None, lote=None,
+                         inicio=None, fim=None, tamanho_pagina=500, motivo=None):
+        condicoes, parametros = self._filtros(
+            maquina, ferramenta, operador, lote, inicio, fim, motivo)
+        sql_base = "SELECT id, " + ", ".join(CAMPOS_HISTORICO) + " FROM historico"
+
+        # Paginação por chave (instante, id): cada página continua de onde a anterior parou.
+        # A comparação de tuplas vira busca no índice; com OR o SQLite varria a tabela
+        # desde o início a cada página
+        ultimo = None
+        while True:
+            condicoes_pagina = list(condicoes)
+            parametros_pagina = list(parametros)
+            if ultimo is not None:
+                condicoes_pagina.append("(instante, id) > (?, ?)")
+                parametros_pagina += list(ultimo)
+            sql = sql_base
+            if condicoes_pagina:
+                sql += " WHERE " + " AND ".join(condicoes_pagina)
+            sql += " ORDER BY instante, id LIMIT ?"
+            parametros_pagina.append(tamanho_pagina)
+
+            with self.lock:
+                linhas = self.conexao.execute(sql, parametros_pagina).fetchall()
+            if not linhas:
+                return
+            for linha in linhas:
+                registro = dict(linha)
+                ultimo = (registro["instante"], registro.pop("id"))
+                yield registro
+
+    def contar_historico(self, maquina=None, ferramenta=None, operador=None, lote=None,
+                         inicio=None, fim=None, motivo=None):
+        """Conta trocas que atendem aos filtros"""
+        condicoes, parametros = self._filtros(
+            maquina, ferramenta, operador, lote, inicio, fim, motivo)
+        sql = "SELECT COUNT(*) FROM historico"
+        if condicoes:
+            sql += " WHERE " + " AND ".join(condicoes)
+        with self.lock:
+            return self.conexao.execute(sql, parametros).fetchone()[0]
+
+    def _filtros(self, maquina, ferramenta, operador, lote, inicio, fim, motivo=None):
+        condicoes = []
+        parametros = []
+        for coluna, valor in (("maquina", maquina), ("ferramenta", ferramenta),
+                              ("operador", operador), ("lote", lote), ("motivo", motivo)):
+            if valor is not None:
+                condicoes.append(f"{coluna} = ?")
+                parametros.append(valor)
+        if inicio is not None:
+            condicoes.append("instante >= ?")
+            parametros.append(int(inicio.timestamp()))
+        if fim is not None:
+            condicoes.append("instante < ?")
+            parametros.append(int(fim.timestamp()))
+        return condicoes, parametros
+
+    def fechar(self):
+        with self.lock:
+            self.conexao.close()
+
+
+class HistoricoSQLite:
+    """Sequência preguiçosa sobre a tabela de histórico (mais recentes primeiro)
+
+    Permite ``len()``, indexação, fatias e iteração sem carregar a tabela
+    inteira na memória. A ordem é a de ``consultar_historico`` (instante e,
+    no empate, ordem de gravação), pelo índice de instantes; a iteração
+    pagina por essa chave. Trocas importadas ou migradas, mais antigas que
+    as já gravadas, ficam no lugar do instante delas.
+    """
+
+    TAMANHO_PAGINA = 500
+
+    def __init__(self, armazenamento):
+        self.armazenamento = armazenamento
+
+    def __len__(self):
+        return self.armazenamento.contar_historico()
+
+    def __bool__(self):
+        with self.armazenamento.lock:
+            return self.armazenamento.conexao.execute(
+                "SELECT 1 FROM historico LIMIT 1").fetchone() is not None
+
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            # Fatia simples (caso da paginação): não precisa contar a tabela
+            if (indice.step in (None, 1) and (indice.start or 0) >= 0
+                    and indice.stop is not None and indice.stop >= 0):
+                inicio = indice.start or 0
+                return self._pagina(inicio, max(indice.stop - inicio, 0))
+            inicio, fim, passo = indice.indices(len(self))
+            if passo != 1:
+                return list(self)[indice]
+            return self._pagina(inicio, max(fim - inicio, 0))
+        if indice < 0:
+            indice += len(self)
+        linhas = self._pagina(indice, 1)
+        if not linhas:
+            raise IndexError("índice fora do histórico")
+        return linhas[0]
+
+    def __iter__(self):
+        ultimo = None
+        while True:
+            sql = "SELECT id, " + ", ".join(CAMPOS_HISTORICO) + " FROM historico"
+            parametros = []
+            if ultimo is not None:
+                sql += " WHERE (instante, id) < (?, ?)"
+                parametros += list(ultimo)
+            sql += " ORDER BY instante DESC, id DESC LIMIT ?"
+            parametros.append(self.TAMANHO_PAGINA)
+            with self.armazenamento.lock:
+                linhas = self.armazenamento.conexao.execute(sql, parametros).fetchall()
+            if not linhas:
+                return
+            for linha in linhas:
+                registro = dict(linha)
+                ultimo = (registro["instante"], registro.pop("id"))
+                yield registro
+
+    def _pagina(self, deslocamento, limite):
+        sql = ("SELECT " + ", ".join(CAMPOS_HISTORICO) +
+               " FROM historico ORDER BY instante DESC, id DESC LIMIT ? OFFSET ?")
+        with self.armazenamento.lock:
+            return [dict(l) for l in self.armazenamento.conexao.execute(
+                sql, (limite, deslocamento))]
+
+
+def migrar_json_para_sqlite(arquivo_dados, arquivo_historico, caminho_banco):
+    """Copia catálogo e histórico dos arquivos JSON para o banco SQLite
+
+    Roda uma única vez, numa transação só; retorna o número de trocas
+    gravadas no banco (as com ``id_troca`` repetido ficam de fora).
+    """
+    origem = ArmazenamentoJSON(arquivo_dados, arquivo_historico)
+    dados = origem.carregar_dados()
+    historico = origem.carregar_historico()
+    origem.fechar()
+
+    # Migrar para um arquivo temporário: um banco pela metade nunca fica no lugar
+    temporario = caminho_banco + ".migrando"
+    if os.path.exists(temporario):
+        os.remove(temporario)
+    destino = ArmazenamentoSQLite(temporario)
+    with destino.lock, destino.conexao:
+        destino._gravar_catalogo(dados)
+        # O histórico em JSON está do mais novo para o mais antigo
+        migradas = destino._inserir_registros(reversed(historico))
+    destino.fechar()
+    os.replace(temporario, caminho_banco)
+    return migradas
+
+
+def criar_armazenamento(arquivo_dados, arquivo_historico, tipo=None):
+    """Cria o armazenamento configurado em TOOLLIFE_ARMAZENAMENTO (json | sqlite)"""
+    tipo = tipo or os.environ.get("TOOLLIFE_ARMAZENAMENTO", "json")
+
+    if tipo == "sqlite":
+        caminho_banco = os.path.splitext(arquivo_dados)[0] + ".db"
+        if not os.path.exists(caminho_banco) and (
+                os.path.exists(arquivo_dados) or os.path.exists(arquivo_historico)):
+            migrar_json_para_sqlite(arquivo_dados, arquivo_historico, caminho_banco)
+        return ArmazenamentoSQLite(caminho_banco)
+
+    return ArmazenamentoJSON(arquivo_dados, arquivo_historico)
@@ -0,0 +1,242 @@
+"""Benchmark de escala: caminhos de dados e de tela com 10², 10⁴ e 10⁶ trocas
+
+Para cada tamanho, cria numa pasta temporária um catálogo e um histórico
+sintéticos e mede:
+
+- carregar_dados, carregar_historico e salvar_historico (armazenamento);
+- atualizar_historico e atualizar_listas_config (tela, numa página falsa);
+- gerar_pdf_troca (o PDF que gerar_relatorio envia para a fila).
+
+O catálogo é limitado a 10⁴ itens: catálogos reais têm no máximo
+milhares de máquinas e ferramentas. Medições que dependem do Flet ou do
+FPDF são marcadas como puladas se o pacote não estiver instalado.
+
+Os resultados vão para benchmarks/resultados/ em JSON e são comparados com
+a linha de base (benchmarks/linha_base_escala.json); o script falha
+(código de saída 1) se alguma medição ficar mais lenta que
+``tolerancia`` vezes a base.
+
+Uso:
+    python benchmarks/bench_escala.py [--tamanhos 100,10000,1000000]
+        [--armazenamento json|sqlite] [--tolerancia 1.5] [--salvar-base]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+PASTA_BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.dirname(PASTA_BENCHMARKS), PASTA_BENCHMARKS]
+
+import dominio
+from armazenamento import criar_armazenamento
+
+ARQUIVO_BASE = os.path.join(PASTA_BENCHMARKS, "linha_base_escala.json")
+PASTA_RESULTADOS = os.path.join(PASTA_BENCHMARKS, "resultados")
+
+TAMANHOS = (100, 10_000, 1_000_000)
+LIMITE_CATALOGO = 10_000
+MOTIVOS = ["✅ Completou a Vida Útil", "💥 Ferramenta Quebrou", "⚠️ Acabamento Ruim",
+           "🔧 Manutenção Preventiva", "🔄 Troca de Setup/Produto"]
+
+
+def catalogo_sintetico(tamanho):
+    quantidade = min(tamanho, LIMITE_CATALOGO)
+    ferramentas = [f"Ferramenta {i:05d}" for i in range(quantidade)]
+    return {
+        "maquinas": [f"{300 + i}" for i in range(quantidade)],
+        "ferramentas": ferramentas,
+        "vida_padrao": {f: 500 + (i % 20) * 100 for i, f in enumerate(ferramentas)}
+    }
+
+
+def historico_sintetico(tamanho, dados):
+    """Trocas em ordem cronológica, uma a cada 10 minutos"""
+    inicio = datetime(2020, 1, 1, 6, 0)
+    maquinas = dados["maquinas"][:50]
+    ferramentas = dados["ferramentas"][:200]
+    for i in range(tamanho):
+        ferramenta = ferramentas[i % len(ferramentas)]
+        vida = dados["vida_padrao"][ferramenta]
+        yield dominio.montar_registro(
+            inicio + timedelta(minutes=10 * i), f"Operador {i % 40}",
+            maquinas[i % len(maquinas)], ferramenta, f"OP-{i // 500:05d}",
+            (i * 7919) % (vida + vida // 4), vida, MOTIVOS[i % len(MOTIVOS)],
+            "Troca no fim do turno." if i % 10 == 0 else ""
+        )
+
+
+def preparar(pasta, tamanho, tipo):
+    """Grava catálogo e histórico sintéticos na pasta"""
+    arquivo_dados = os.path.join(pasta, dominio.ARQUIVO_DADOS)
+    arquivo_historico = os.path.join(pasta, dominio.ARQUIVO_HISTORICO)
+    armazenamento = criar_armazenamento(arquivo_dados, arquivo_historico, tipo)
+    dados = catalogo_sintetico(tamanho)
+    armazenamento.salvar_dados(dados)
+    armazenamento.carregar_historico()
+    lote = []
+    for registro in historico_sintetico(tamanho, dados):
+        lote.append(registro)
+        if len(lote) == 10_000:
+            armazenamento.anexar_varios(lote)
+            lote = []
+    armazenamento.anexar_varios(lote)
+    if hasattr(armazenamento, "diario"):
+        armazenamento.diario.compactar()
+    armazenamento.fechar()
+    return arquivo_dados, arquivo_historico
+
+
+def medir(funcao, preparo=None, tempo_minimo=0.5, repeticoes_max=20):
+    """Mediana em milissegundos; repete até ``tempo_minimo`` segundos"""
+    tempos = []
+    gasto = 0.0
+    while len(tempos) < repeticoes_max and (gasto < tempo_minimo or len(tempos) < 3):
+        if preparo:
+            preparo()
+        inicio = time.perf_counter()
+        funcao()
+        decorrido = time.perf_counter() - inicio
+        tempos.append(decorrido * 1000)
+        gasto += decorrido
+        if decorrido > tempo_minimo:
+            break
+    return statistics.median(tempos)
+
+
+def medir_tamanho(tamanho, tipo):
+    resultados = {}
+    with tempfile.TemporaryDirectory() as pasta:
+        arquivo_dados, arquivo_historico = preparar(pasta, tamanho, tipo)
+        dados = catalogo_sintetico(tamanho)
+        registro = next(historico_sintetico(1, dados))
+
+        # Armazenamento (mesmo caminho dos métodos do ToolLifePro)
+        armazenamento = criar_armazenamento(arquivo_dados, arquivo_historico, tipo)
+        resultados["carregar_dados"] = medir(armazenamento.carregar_dados)
+        # carregar_historico lê o disco uma vez só: cada medida usa um armazenamento novo
+        novo = [None]
+
+        def novo_armazenamento():
+            if novo[0] is not None:
+                novo[0].fechar()
+            novo[0] = criar_armazenamento(arquivo_dados, arquivo_historico, tipo)
+
+        resultados["carregar_historico"] = medir(lambda: novo[0].carregar_historico(),
+                                                 preparo=novo_armazenamento)
+        novo[0].fechar()
+        resultados["salvar_historico"] = medir(
+            lambda: armazenamento.anexar_historico(registro), tempo_minimo=0.2)
+        armazenamento.fechar()
+
+        # Tela, com a página falsa no lugar do Flet
+        try:
+            import main
+            from pagina_falsa import PaginaFalsa
+        except ImportError as e:
+            print(f"  tela pulada: {e}")
+            resultados["atualizar_historico"] = None
+            resultados["atualizar_listas_config"] = None
+        else:
+            diretorio = os.getcwd()
+            os.chdir(pasta)
+            try:
+                app = main.ToolLifePro(PaginaFalsa())
+                app.abrir_aba("HISTORICO")
+                app.historico
+                resultados["atualizar_historico"] = medir(lambda: app.atualizar_historico(None))
+                app.abrir_aba("CONFIG")
+                resultados["atualizar_listas_config"] = medir(app.atualizar_listas_config)
+                app.armazenamento.fechar()
+            finally:
+                os.chdir(diretorio)
+
+        # PDF da troca
+        try:
+            from relatorios import gerar_pdf_troca
+        except ImportError as e:
+            print(f"  PDF pulado: {e}")
+            resultados["gerar_pdf_troca"] = None
+        else:
+            nome_arquivo = os.path.join(pasta, "relatorio.pdf")
+            resultados["gerar_pdf_troca"] = medir(
+                lambda: gerar_pdf_troca(registro, datetime.now(), nome_arquivo))
+    return resultados
+
+
+def comparar(atual, base, tolerancia):
+    """Lista de regressões (tamanho, operação, ms atual, ms base)"""
+    regressoes = []
+    for tamanho, medicoes in atual.items():
+        for operacao, ms in medicoes.items():
+            referencia = base.get(tamanho, {}).get(operacao)
+            if ms is None or not referencia:
+                continue
+            if ms > referencia * tolerancia:
+                regressoes.append((tamanho, operacao, ms, referencia))
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tamanhos", default=",".join(map(str, TAMANHOS)))
+    parser.add_argument("--armazenamento", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--tolerancia", type=float, default=1.5,
+                        help="razão máxima atual/base antes de acusar regressão")
+    parser.add_argument("--salvar-base", action="store_true",
+                        help="grava os resultados como nova linha de base")
+    args = parser.parse_args()
+
+    medicoes = {}
+    for tamanho in (int(t) for t in args.tamanhos.split(",")):
+        print(f"Tamanho {tamanho}:")
+        medicoes[str(tamanho)] = medir_tamanho(tamanho, args.armazenamento)
+        for operacao, ms in medicoes[str(tamanho)].items():
+            print(f"  {operacao:<26} " + ("pulado" if ms is None else f"{ms:10.3f} ms"))
+
+    resultado = {
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "armazenamento": args.armazenamento,
+        "medicoes_ms": medicoes,
+    }
+    os.makedirs(PASTA_RESULTADOS, exist_ok=True)
+    arquivo = os.path.join(
+        PASTA_RESULTADOS,
+        f"escala_{args.armazenamento}_{datetime.now():%Y%m%d_%H%M%S}.json")
+    with open(arquivo, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+    print(f"Resultados em {arquivo}")
+
+    if args.salvar_base:
+        with open(ARQUIVO_BASE, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+        print(f"Linha de base gravada em {ARQUIVO_BASE}")
+        return
+
+    if not os.path.exists(ARQUIVO_BASE):
+        print("Sem linha de base para comparar (use --salvar-base)")
+        return
+    with open(ARQUIVO_BASE, "r", encoding="utf-8") as f:
+        base = json.load(f)
+    if base.get("armazenamento") != args.armazenamento:
+        print(f"Linha de base é do armazenamento {base.get('armazenamento')}; sem comparação")
+        return
+
+    regressoes = comparar(medicoes, base["medicoes_ms"], args.tolerancia)
+    for tamanho, operacao, ms, referencia in regressoes:
+        print(f"REGRESSÃO: {operacao} com {tamanho} trocas: "
+              f"{ms:.3f} ms (base {referencia:.3f} ms, {ms / referencia:.2f}x)")
+    if regressoes:
+        sys.exit(1)
+    print(f"Sem regressões acima de {args.tolerancia:.2f}x da linha de base")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Benchmark da exportação do histórico (exportacao.exportar_historico)
+
+Cria numa pasta temporária um histórico sintético e exporta em cada
+formato, cada exportação num processo próprio (``cli.py exportar``). Mede
+o tempo, a vazão e o pico de memória (RSS) do processo; o pico de uma
+exportação filtrada para nenhuma troca serve de referência, e a diferença é o
+que a exportação em si consome. Com a memória constante, essa diferença
+não cresce com ``--trocas``.
+
+O Parquet é pulado se o pyarrow não estiver instalado.
+
+Uso:
+    python benchmarks/bench_exportacao.py [--trocas 1000000] [--armazenamento sqlite|json]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+PASTA_BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+PASTA_PROJETO = os.path.dirname(PASTA_BENCHMARKS)
+sys.path.insert(0, PASTA_PROJETO)
+
+import dominio
+from armazenamento import criar_armazenamento
+
+CLI = os.path.join(PASTA_PROJETO, "cli.py")
+MOTIVOS = ["✅ Completou a Vida Útil", "💥 Ferramenta Quebrou", "🔧 Manutenção Preventiva"]
+LOTE = 50_000
+
+
+def trocas_sinteticas(quantidade):
+    instante = 1_577_872_800  # 2020-01-01
+    for i in range(quantidade):
+        pecas = 300 + i * 7 % 1500
+        yield {
+            "instante": instante + i * 60,
+            "operador": f"Operador {i % 40}",
+            "maquina": str(300 + i % 50),
+            "ferramenta": f"Ferramenta {i % 200:03d}",
+            "lote": f"OP-{i // 500:05d}",
+            "pecas_feitas": pecas,
+            "vida_esperada": 1200,
+            "percentual": round(dominio.calcular_percentual(pecas, 1200), 1),
+            "motivo": MOTIVOS[i % len(MOTIVOS)],
+            "observacoes": "",
+            "id_troca": uuid.UUID(int=i).hex,
+        }
+
+
+def preparar(pasta, quantidade, tipo):
+    armazenamento = criar_armazenamento(os.path.join(pasta, "ferramental.json"),
+                                        os.path.join(pasta, "historico_trocas.json"), tipo)
+    armazenamento.carregar_historico()
+    lote = []
+    for registro in trocas_sinteticas(quantidade):
+        lote.append(registro)
+        if len(lote) == LOTE:
+            armazenamento.anexar_varios(lote)
+            lote = []
+    if lote:
+        armazenamento.anexar_varios(lote)
+    armazenamento.fechar()
+
+
+def rodar(pasta, tipo, argumentos):
+    """Roda o cli.py num processo filho; retorna (segundos, pico de RSS em MB)"""
+    inicio = time.perf_counter()
+    processo = subprocess.Popen(
+        [sys.executable, CLI, "--dados", os.path.join(pasta, "ferramental.json"),
+         "--historico", os.path.join(pasta, "historico_trocas.json"),
+         "--armazenamento", tipo] + argumentos,
+        stdout=subprocess.DEVNULL)
+    _, status, uso = os.wait4(processo.pid, 0)
+    processo.returncode = os.waitstatus_to_exitcode(status)
+    decorrido = time.perf_counter() - inicio
+    if processo.returncode:
+        raise RuntimeError(f"cli.py {' '.join(argumentos)} falhou")
+    return decorrido, uso.ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--trocas", type=int, default=1_000_000)
+    parser.add_argument("--armazenamento", choices=["json", "sqlite"], default="sqlite")
+    args = parser.parse_args()
+
+    try:
+        import pyarrow  # noqa: F401
+        formatos = ["csv", "jsonl", "parquet"]
+    except ImportError:
+        formatos = ["csv", "jsonl"]
+        print("pyarrow não instalado: Parquet pulado")
+
+    with tempfile.TemporaryDirectory() as pasta:
+        inicio = time.perf_counter()
+        preparar(pasta, args.trocas, args.armazenamento)
+        print(f"{args.trocas} trocas sintéticas ({args.armazenamento}) "
+              f"em {time.perf_counter() - inicio:.1f} s")
+
+        # Mesma exportação, filtrada para nenhuma troca: só abre o histórico
+        _, referencia = rodar(pasta, args.armazenamento, [
+            "exportar", os.path.join(pasta, "vazio.csv"), "--ate", "2000-01-01"])
+        print(f"Referência (só abrir o histórico): pico de {referencia:.0f} MB")
+        for formato in formatos:
+            arquivo = os.path.join(pasta, f"historico.{formato}")
+            decorrido, pico = rodar(pasta, args.armazenamento,
+                                    ["exportar", arquivo, "--formato", formato])
+            tamanho = os.path.getsize(arquivo) / (1024 * 1024)
+            print(f"{formato:8s} {decorrido:6.1f} s  {args.trocas / decorrido:9.0f} trocas/s  "
+                  f"{tamanho / decorrido:6.1f} MB/s  arquivo {tamanho:7.1f} MB  "
+                  f"pico {pico:5.0f} MB (+{pico - referencia:.0f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Benchmark: tempo de inicialização a frio do app, com orçamento
+
+Cada medição roda num processo Python novo: importa ``main`` e constrói o
+``ToolLifePro`` numa página falsa (até a primeira tela estar pronta). O
+script falha (código de saída 1) se a mediana passar do orçamento ou se o
+FPDF for importado antes do primeiro relatório.
+
+Uso: python benchmarks/bench_inicializacao.py [orcamento_ms] [repeticoes]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ORCAMENTO_MS = 1500
+
+# Roda no processo filho, dentro de uma pasta vazia (sem dados salvos)
+PARTIDA = """
+import sys, time, json
+inicio = time.perf_counter()
+sys.path[:0] = [{raiz!r}, {benchmarks!r}]
+import main
+from pagina_falsa import PaginaFalsa
+importado = time.perf_counter()
+main.ToolLifePro(PaginaFalsa())
+pronto = time.perf_counter()
+print(json.dumps({{
+    "importacao_ms": (importado - inicio) * 1000,
+    "construcao_ms": (pronto - importado) * 1000,
+    "fpdf_carregado": "fpdf" in sys.modules,
+}}))
+"""
+
+
+def medir_partida(pasta):
+    codigo = PARTIDA.format(raiz=RAIZ, benchmarks=os.path.join(RAIZ, "benchmarks"))
+    inicio = time.perf_counter()
+    saida = subprocess.run([sys.executable, "-c", codigo], cwd=pasta, check=True,
+                           capture_output=True, text=True).stdout
+    total = (time.perf_counter() - inicio) * 1000
+    resultado = json.loads(saida.strip().splitlines()[-1])
+    resultado["total_ms"] = total
+    return resultado
+
+
+def main():
+    orcamento = float(sys.argv[1]) if len(sys.argv) > 1 else ORCAMENTO_MS
+    repeticoes = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    with tempfile.TemporaryDirectory() as pasta:
+        medicoes = [medir_partida(pasta) for _ in range(repeticoes)]
+
+    total = statistics.median(m["total_ms"] for m in medicoes)
+    importacao = statistics.median(m["importacao_ms"] for m in medicoes)
+    construcao = statistics.median(m["construcao_ms"] for m in medicoes)
+    print(f"Partidas medidas: {repeticoes}")
+    print(f"Importação dos módulos:  {importacao:.1f} ms")
+    print(f"Construção da tela:      {construcao:.1f} ms")
+    print(f"Total (processo novo):   {total:.1f} ms  (orçamento {orcamento:.0f} ms)")
+
+    falhas = []
+    if total > orcamento:
+        falhas.append(f"inicialização acima do orçamento: {total:.1f} ms > {orcamento:.0f} ms")
+    if any(m["fpdf_carregado"] for m in medicoes):
+        falhas.append("FPDF importado na inicialização")
+    for falha in falhas:
+        print(f"FALHOU: {falha}")
+    sys.exit(1 if falhas else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Benchmark: tempo por relatório de troca, antes e depois do modelo pré-compilado
+
+Uso: python benchmarks/bench_relatorio.py [quantidade]
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fpdf import FPDF
+
+from relatorios import gerar_pdf_troca, limpar_motivo
+
+
+REGISTRO = {
+    "data": "17/10/2026 14:30",
+    "operador": "Joao Silva",
+    "maquina": "304",
+    "ferramenta": "Broca Ø8mm",
+    "lote": "OP-2026-117",
+    "pecas_feitas": 1180,
+    "vida_esperada": 1200,
+    "percentual": 98.3,
+    "motivo": "✅ Completou a Vida Útil",
+    "observacoes": "Troca no fim do turno."
+}
+
+
+def gerar_pdf_troca_fluxo(registro, agora, nome_arquivo):
+    """Referência: layout recalculado a cada relatório (implementação anterior)"""
+    pecas_feitas = registro["pecas_feitas"]
+    vida_esperada = registro["vida_esperada"]
+    percentual = (pecas_feitas / vida_esperada * 100) if vida_esperada > 0 else 0
+
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Arial", 'B', 18)
+    pdf.cell(0, 15, "TOOLLIFE PRO - RELATORIO DE TROCA", ln=True, align='C')
+    pdf.set_font("Arial", 'B', 12)
+    pdf.cell(0, 10, f"Data: {agora.strftime('%d/%m/%Y %H:%M:%S')}", ln=True, align='C')
+    pdf.ln(10)
+    pdf.set_font("Arial", 'B', 12)
+    pdf.cell(0, 8, "DADOS DA TROCA", ln=True)
+    pdf.line(10, pdf.get_y(), 200, pdf.get_y())
+    pdf.ln(5)
+    pdf.set_font("Arial", size=11)
+    dados = [
+        ("Operador:", registro["operador"]),
+        ("Maquina:", registro["maquina"]),
+        ("Ferramenta:", registro["ferramenta"]),
+        ("Lote/OP:", registro["lote"] or "N/A"),
+        ("", ""),
+        ("Pecas Produzidas:", f"{pecas_feitas:,} pecas".replace(",", ".")),
+        ("Vida Esperada:", f"{vida_esperada:,} pecas".replace(",", ".")),
+        ("Percentual Utilizado:", f"{percentual:.1f}%"),
+        ("", ""),
+        ("Motivo da Troca:", limpar_motivo(registro["motivo"])),
+    ]
+    for label, valor in dados:
+        if label:
+            pdf.set_font("Arial", 'B', 11)
+            pdf.cell(70, 7, label, 0)
+            pdf.set_font("Arial", size=11)
+            pdf.cell(0, 7, str(valor), ln=True)
+        else:
+            pdf.ln(3)
+    observacoes = registro.get("observacoes")
+    if observacoes and observacoes.strip():
+        pdf.ln(5)
+        pdf.set_font("Arial", 'B', 12)
+        pdf.cell(0, 8, "OBSERVACOES", ln=True)
+        pdf.line(10, pdf.get_y(), 200, pdf.get_y())
+        pdf.ln(5)
+        pdf.set_font("Arial", size=11)
+        pdf.multi_cell(0, 6, observacoes)
+    pdf.ln(10)
+    pdf.set_font("Arial", 'I', 9)
+    pdf.cell(0, 5, "Relatorio gerado por ToolLife Pro v13.0", ln=True, align='C')
+    pdf.output(nome_arquivo)
+
+
+def medir(funcao, quantidade, pasta):
+    """Retorna o tempo médio por relatório em milissegundos"""
+    agora = datetime.now()
+    nome_arquivo = os.path.join(pasta, "relatorio.pdf")
+    funcao(REGISTRO, agora, nome_arquivo)  # aquecimento
+    inicio = time.perf_counter()
+    for _ in range(quantidade):
+        funcao(REGISTRO, agora, nome_arquivo)
+    return (time.perf_counter() - inicio) / quantidade * 1000
+
+
+def main():
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    with tempfile.TemporaryDirectory() as pasta:
+        antes = medir(gerar_pdf_troca_fluxo, quantidade, pasta)
+        depois = medir(gerar_pdf_troca, quantidade, pasta)
+
+    print(f"Relatórios por medição: {quantidade}")
+    print(f"Layout em fluxo (antes):    {antes:.3f} ms/relatório")
+    print(f"Modelo pré-compilado:       {depois:.3f} ms/relatório")
+    print(f"Ganho: {antes / depois:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
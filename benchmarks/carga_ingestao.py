@@ -0,0 +1,150 @@
+"""Gerador de carga para a central de trocas (ingestao.ServidorIngestao)
+
+Simula terminais enviando trocas ao mesmo tempo, cada um numa conexão
+HTTP mantida aberta, com ``--registros-por-envio`` trocas por POST. Uma
+fração dos envios é repetida (``--reenvios``), como um terminal que não
+recebeu a resposta e manda de novo.
+
+Sem ``--url``, sobe uma central local numa pasta temporária e confere no
+fim que cada troca foi gravada exatamente uma vez; o script falha (código
+de saída 1) se não foi.
+
+Uso:
+    python benchmarks/carga_ingestao.py [--terminais 50] [--envios 200]
+        [--registros-por-envio 1] [--reenvios 0.05] [--armazenamento json|sqlite]
+        [--url http://127.0.0.1:8470]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dominio
+from armazenamento import criar_armazenamento
+from ingestao import ServidorIngestao
+
+FERRAMENTAS = ["Broca Ø6mm", "Broca Ø8mm", "Macho M6", "Macho M8", "Inserto CNMG"]
+MOTIVOS = ["✅ Completou a Vida Útil", "💥 Ferramenta Quebrou", "🔧 Manutenção Preventiva"]
+
+
+def registro_aleatorio(terminal, instante):
+    pecas = random.randint(200, 2000)
+    return {
+        "instante": instante,
+        "operador": f"Operador {terminal}",
+        "maquina": str(300 + terminal % 40),
+        "ferramenta": random.choice(FERRAMENTAS),
+        "lote": f"OP-{random.randint(1, 999):03d}",
+        "pecas_feitas": pecas,
+        "vida_esperada": 1200,
+        "percentual": round(dominio.calcular_percentual(pecas, 1200), 1),
+        "motivo": random.choice(MOTIVOS),
+        "observacoes": "",
+        "id_troca": uuid.uuid4().hex,
+    }
+
+
+async def postar(leitor, escritor, host, corpo):
+    escritor.write((f"POST /trocas HTTP/1.1\r\nHost: {host}\r\n"
+                    "Content-Type: application/x-ndjson\r\n"
+                    f"Content-Length: {len(corpo)}\r\n\r\n").encode("latin-1") + corpo)
+    await escritor.drain()
+    status = int((await leitor.readline()).split()[1])
+    tamanho = 0
+    while (linha := await leitor.readline()) not in (b"\r\n", b""):
+        if linha.lower().startswith(b"content-length:"):
+            tamanho = int(linha.split(b":")[1])
+    await leitor.readexactly(tamanho)
+    return status
+
+
+async def terminal(numero, host, porta, envios, por_envio, reenvios, latencias):
+    leitor, escritor = await asyncio.open_connection(host, porta)
+    ids = set()
+    anterior = None
+    instante = int(time.time()) - envios * por_envio
+    for _ in range(envios):
+        if anterior is not None and random.random() < reenvios:
+            corpo = anterior
+        else:
+            lote = []
+            for _ in range(por_envio):
+                instante += 1
+                lote.append(registro_aleatorio(numero, instante))
+            ids.update(r["id_troca"] for r in lote)
+            corpo = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in lote).encode()
+        inicio = time.perf_counter()
+        status = await postar(leitor, escritor, host, corpo)
+        latencias.append(time.perf_counter() - inicio)
+        if status != 200:
+            raise RuntimeError(f"central respondeu {status}")
+        anterior = corpo
+    escritor.close()
+    return ids
+
+
+async def gerar_carga(args, host, porta):
+    latencias = []
+    resultados = await asyncio.gather(*(
+        terminal(i, host, porta, args.envios, args.registros_por_envio, args.reenvios,
+                 latencias)
+        for i in range(args.terminais)))
+    return set().union(*resultados), latencias
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--terminais", type=int, default=50)
+    parser.add_argument("--envios", type=int, default=200, help="POSTs por terminal")
+    parser.add_argument("--registros-por-envio", type=int, default=1)
+    parser.add_argument("--reenvios", type=float, default=0.05,
+                        help="fração de envios repetidos")
+    parser.add_argument("--armazenamento", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--url", help="central já rodando (sem conferência no fim)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        servidor = armazenamento = None
+        if args.url:
+            endereco = urlsplit(args.url)
+            host, porta = endereco.hostname, endereco.port
+        else:
+            armazenamento = criar_armazenamento(
+                os.path.join(pasta, "ferramental.json"),
+                os.path.join(pasta, "historico_trocas.json"), args.armazenamento)
+            armazenamento.carregar_historico()
+            servidor = ServidorIngestao(armazenamento.anexar_varios, "127.0.0.1").iniciar()
+            host, porta = "127.0.0.1", servidor.porta
+
+        inicio = time.perf_counter()
+        ids, latencias = asyncio.run(gerar_carga(args, host, porta))
+        decorrido = time.perf_counter() - inicio
+
+        enviados = len(latencias) * args.registros_por_envio
+        latencias.sort()
+        print(f"Terminais: {args.terminais}, POSTs: {len(latencias)}, trocas únicas: {len(ids)}")
+        print(f"Vazão: {enviados / decorrido:.0f} trocas/s ({len(latencias) / decorrido:.0f} POSTs/s)")
+        print(f"Latência por POST: p50 {latencias[len(latencias) // 2] * 1000:.1f} ms, "
+              f"p99 {latencias[int(len(latencias) * 0.99)] * 1000:.1f} ms")
+
+        if servidor is not None:
+            servidor.parar()
+            gravadas = len(armazenamento.consultar_historico())
+            armazenamento.fechar()
+            print(f"Grupos gravados: {servidor.grupos} "
+                  f"(média de {servidor.recebidos / max(servidor.grupos, 1):.0f} trocas), "
+                  f"gravadas: {gravadas}")
+            if gravadas != len(ids):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
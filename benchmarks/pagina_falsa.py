@@ -0,0 +1,24 @@
+"""Página falsa do Flet para rodar o ToolLifePro sem janela (benchmarks)"""
+
+
+class PaginaFalsa:
+    """Aceita as propriedades e chamadas que o app faz em ``ft.Page``"""
+
+    def __init__(self):
+        self.controls = []
+        self.dialog = None
+        self.atualizacoes = 0
+
+    def add(self, *controles):
+        self.controls.extend(controles)
+
+    def update(self, *controles):
+        self.atualizacoes += 1
+
+
+class EventoFalso:
+    """Evento de clique com ``e.control.data`` (usado por ``navegar``)"""
+
+    def __init__(self, data=None):
+        self.control = self
+        self.data = data
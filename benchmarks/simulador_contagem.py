@@ -0,0 +1,103 @@
+"""Simulador de máquinas mandando peças para o servidor de contagem
+
+Abre uma conexão por máquina e manda eventos "maquina;ferramenta;1" na
+taxa pedida, em rajadas a cada 10 ms (como um gateway de CLP que junta
+os sinais do ciclo). Sem ``--porta``, sobe um ``ServidorContagem`` local
+numa pasta temporária e confere no fim se nenhuma peça se perdeu; com
+``--porta``, alimenta o app rodando com TOOLLIFE_CONTAGEM_PORTA.
+
+Uso:
+    python benchmarks/simulador_contagem.py [--maquinas 40] [--eventos-por-segundo 5000]
+        [--duracao 10] [--host 127.0.0.1] [--porta 9100]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from contagem import ContadorPecas, ServidorContagem
+
+
+RAJADA = 0.01  # segundos entre envios de cada máquina
+
+FERRAMENTAS = ["Broca Ø6mm", "Broca Ø8mm", "Fresa Topo Ø10mm", "Macho M8", "Pastilha CNMG"]
+
+
+async def maquina(nome, host, porta, eventos_por_segundo, duracao):
+    """Manda peças da máquina por ``duracao`` segundos; retorna {ferramenta: peças}"""
+    _, escritor = await asyncio.open_connection(host, porta)
+    ferramentas = random.sample(FERRAMENTAS, 2)
+    enviadas = dict.fromkeys(ferramentas, 0)
+    por_rajada = eventos_por_segundo * RAJADA
+    acumulado = 0.0
+    fim = time.perf_counter() + duracao
+    while time.perf_counter() < fim:
+        acumulado += por_rajada
+        quantidade, acumulado = int(acumulado), acumulado - int(acumulado)
+        linhas = []
+        for _ in range(quantidade):
+            ferramenta = random.choice(ferramentas)
+            enviadas[ferramenta] += 1
+            linhas.append(f"{nome};{ferramenta};1\n")
+        escritor.write("".join(linhas).encode("utf-8"))
+        await escritor.drain()
+        await asyncio.sleep(RAJADA)
+    escritor.close()
+    await escritor.wait_closed()
+    return {(nome, f): p for f, p in enviadas.items()}
+
+
+async def simular(maquinas, host, porta, eventos_por_segundo, duracao):
+    por_maquina = eventos_por_segundo / maquinas
+    enviadas = {}
+    for resultado in await asyncio.gather(*(
+            maquina(f"M{i + 1:03d}", host, porta, por_maquina, duracao)
+            for i in range(maquinas))):
+        enviadas.update(resultado)
+    return enviadas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--maquinas", type=int, default=40)
+    parser.add_argument("--eventos-por-segundo", type=int, default=5000)
+    parser.add_argument("--duracao", type=float, default=10)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        servidor = None
+        if args.porta is None:
+            contador = ContadorPecas(os.path.join(pasta, "contagem_pecas.json"))
+            servidor = ServidorContagem(contador, args.host).iniciar()
+            porta = servidor.porta
+        else:
+            porta = args.porta
+
+        inicio = time.perf_counter()
+        enviadas = asyncio.run(simular(args.maquinas, args.host, porta,
+                                       args.eventos_por_segundo, args.duracao))
+        decorrido = time.perf_counter() - inicio
+        total = sum(enviadas.values())
+        print(f"Máquinas: {args.maquinas}, pares máquina × ferramenta: {len(enviadas)}")
+        print(f"Eventos enviados: {total} em {decorrido:.1f} s ({total / decorrido:.0f}/s)")
+
+        if servidor is not None:
+            # Dá tempo do servidor ler o que ainda está no socket
+            time.sleep(0.5)
+            servidor.parar()
+            contador.gravar()
+            perdidos = sum(abs(contador.pecas(m, f) - p) for (m, f), p in enviadas.items())
+            print(f"Eventos contados: {contador.eventos}, diferenças por par: {perdidos}")
+            if perdidos:
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
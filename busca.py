@@ -0,0 +1,202 @@
+"""Busca incremental (type-ahead) nos nomes do catálogo
+
+``IndiceBusca`` combina uma trie de prefixos (do nome inteiro e de cada
+palavra) com um índice de trigramas. A trie responde "começa com" sem
+varrer o catálogo; os trigramas acham trechos no meio do nome e erros de
+digitação. Nomes são comparados sem acento e sem diferença de caixa
+("broca o6" acha "Broca Ø6mm"). Inclusões e remoções atualizam o índice
+no lugar.
+
+Cada nó da trie guarda seus nomes já ordenados por relevância (nome mais
+curto primeiro), então as K primeiras sugestões de um prefixo saem sem
+percorrer todos os nomes que começam com ele.
+
+O mesmo índice serve todas as sessões do processo (ver ``repositorio``):
+buscas e alterações passam por um lock.
+"""
+import threading
+import unicodedata
+from bisect import bisect_left
+from collections import Counter
+
+
+# Letras que a decomposição Unicode não separa do "acento"
+EQUIVALENTES = str.maketrans({"ø": "o", "ß": "ss", "æ": "ae", "œ": "oe", "ł": "l"})
+
+
+def normalizar(texto):
+    """Minúsculas, sem acentos e com espaços simples"""
+    texto = unicodedata.normalize("NFKD", texto.casefold().translate(EQUIVALENTES))
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return " ".join(texto.split())
+
+
+def trigramas(texto):
+    texto = f"  {texto} "
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+class NoTrie:
+    """``nomes``: o nome começa com o prefixo; ``palavras``: uma palavra dele começa
+
+    As duas listas são de (tamanho normalizado, nome), em ordem.
+    """
+    __slots__ = ("filhos", "nomes", "palavras")
+
+    def __init__(self):
+        self.filhos = {}
+        self.nomes = []
+        self.palavras = []
+
+    def vazio(self):
+        return not self.nomes and not self.palavras
+
+
+class IndiceBusca:
+    """Índice de nomes com busca por prefixo, palavra e trigramas"""
+
+    # Fração mínima dos trigramas da consulta que o nome precisa ter
+    SIMILARIDADE_MINIMA = 0.4
+
+    def __init__(self, nomes=()):
+        self.raiz = NoTrie()
+        self.por_trigrama = {}
+        self.normalizados = {}
+        self._lock = threading.Lock()
+        for nome in nomes:
+            self._adicionar(nome)
+
+    def __len__(self):
+        return len(self.normalizados)
+
+    def __contains__(self, nome):
+        return nome in self.normalizados
+
+    def adicionar(self, nome):
+        with self._lock:
+            self._adicionar(nome)
+
+    def remover(self, nome):
+        with self._lock:
+            self._remover(nome)
+
+    def _adicionar(self, nome):
+        if nome in self.normalizados:
+            return
+        chave = normalizar(nome)
+        self.normalizados[nome] = chave
+        entrada = (len(chave), nome)
+        for i, prefixo in enumerate(self._chaves_trie(chave)):
+            no = self.raiz
+            for letra in prefixo:
+                no = no.filhos.setdefault(letra, NoTrie())
+                lista = no.nomes if i == 0 else no.palavras
+                posicao = bisect_left(lista, entrada)
+                if posicao == len(lista) or lista[posicao] != entrada:
+                    lista.insert(posicao, entrada)
+        for trigrama in trigramas(chave):
+            self.por_trigrama.setdefault(trigrama, set()).add(nome)
+
+    def _remover(self, nome):
+        chave = self.normalizados.pop(nome, None)
+        if chave is None:
+            return
+        entrada = (len(chave), nome)
+        for i, prefixo in enumerate(self._chaves_trie(chave)):
+            caminho = []
+            no = self.raiz
+            for letra in prefixo:
+                filho = no.filhos.get(letra)
+                if filho is None:
+                    break  # ramo já removido (palavra repetida no nome)
+                caminho.append((no, letra))
+                no = filho
+                lista = no.nomes if i == 0 else no.palavras
+                posicao = bisect_left(lista, entrada)
+                if posicao < len(lista) and lista[posicao] == entrada:
+                    del lista[posicao]
+            # Podar nós que ficaram vazios
+            for pai, letra in reversed(caminho):
+                if not pai.filhos[letra].vazio() or pai.filhos[letra].filhos:
+                    break
+                del pai.filhos[letra]
+        for trigrama in trigramas(chave):
+            nomes = self.por_trigrama.get(trigrama)
+            if nomes is not None:
+                nomes.discard(nome)
+                if not nomes:
+                    del self.por_trigrama[trigrama]
+
+    def buscar(self, consulta, limite=10):
+        """Até ``limite`` nomes, do mais ao menos relevante
+
+        Ordem: nome igual, nome começando com a consulta, alguma palavra
+        começando com ela, consulta no meio do nome, e por fim nomes
+        parecidos (trigramas em comum). Empates: nome mais curto primeiro.
+        """
+        chave = normalizar(consulta)
+        if not chave:
+            return []
+        with self._lock:
+            return self._buscar(chave, limite)
+
+    def _buscar(self, chave, limite):
+        resultado = []
+        vistos = set()
+        no = self._no(chave)
+        if no is not None:
+            # Igual e "começa com" (o igual é o mais curto), depois por palavra
+            for lista in (no.nomes, no.palavras):
+                for _, nome in lista:
+                    if nome not in vistos:
+                        vistos.add(nome)
+                        resultado.append(nome)
+                        if len(resultado) == limite:
+                            return resultado
+
+        # Trigramas só quando a trie não encheu a lista
+        da_consulta = trigramas(chave)
+        comuns = Counter()
+        for trigrama in da_consulta:
+            comuns.update(self.por_trigrama.get(trigrama, ()))
+        parecidos = []
+        for nome, quantidade in comuns.items():
+            if nome in vistos:
+                continue
+            similaridade = quantidade / len(da_consulta)
+            if chave in self.normalizados[nome]:
+                parecidos.append((0, -similaridade, len(nome), nome))
+            elif similaridade >= self.SIMILARIDADE_MINIMA:
+                parecidos.append((1, -similaridade, len(nome), nome))
+        parecidos.sort()
+        resultado.extend(nome for *_, nome in parecidos[:limite - len(resultado)])
+        return resultado
+
+    def exato(self, consulta):
+        """O nome cujo texto normalizado é igual à consulta, se houver"""
+        chave = normalizar(consulta)
+        with self._lock:
+            no = self._no(chave)
+            if no is not None:
+                for tamanho, nome in no.nomes:
+                    if tamanho != len(chave):
+                        break
+                    return nome
+        return None
+
+    def _no(self, chave):
+        no = self.raiz
+        for letra in chave:
+            no = no.filhos.get(letra)
+            if no is None:
+                return None
+        return no
+
+    @staticmethod
+    def _chaves_trie(chave):
+        """O nome inteiro e o sufixo que começa em cada palavra seguinte"""
+        chaves = [chave]
+        for i, letra in enumerate(chave):
+            if letra == " ":
+                chaves.append(chave[i + 1:])
+        return chaves
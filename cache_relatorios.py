@@ -0,0 +1,170 @@
+"""Cache LRU dos PDFs de troca gerados sob demanda
+
+Tudo o que o PDF de uma troca mostra está no registro do histórico, e a
+geração é determinística (mesmo registro, mesmos bytes; ver
+``relatorios.pdf_da_troca``). O PDF vira dado derivado: é gerado quando
+alguém pede a reimpressão e fica neste cache, limitado em bytes.
+
+``CacheBytes`` guarda os mais usados na memória; o que sai da memória vai
+para uma pasta em disco, se configurada, também limitada e com despejo do
+menos usado. Os contadores (acertos na memória e no disco, falhas e
+despejos) ficam em ``estatisticas``.
+
+Configuração do cache do processo (``obter_cache_relatorios``):
+``TOOLLIFE_CACHE_PDF_MB`` (memória, padrão 16), ``TOOLLIFE_CACHE_PDF_PASTA``
+(sem ela, nada vai para o disco) e ``TOOLLIFE_CACHE_PDF_DISCO_MB`` (padrão
+256).
+"""
+import os
+import threading
+from collections import OrderedDict
+
+
+MB = 1024 * 1024
+
+
+class CacheBytes:
+    """LRU de bytes por chave, limitado em tamanho, com segundo nível em disco
+
+    As chaves devem identificar o conteúdo (ex.: hash do registro): um
+    valor guardado nunca muda, então duas gerações simultâneas da mesma
+    chave só desperdiçam trabalho, sem risco de servir dado velho. A
+    geração roda fora do lock.
+    """
+
+    def __init__(self, limite_memoria, pasta=None, limite_disco=0):
+        self.limite_memoria = limite_memoria
+        self.pasta = pasta
+        self.limite_disco = limite_disco if pasta else 0
+        self._memoria = OrderedDict()  # chave -> bytes, do menos ao mais usado
+        self._disco = OrderedDict()  # chave -> tamanho
+        self.bytes_memoria = 0
+        self.bytes_disco = 0
+        self.acertos = 0
+        self.acertos_disco = 0
+        self.falhas = 0
+        self.despejos = 0
+        self.despejos_disco = 0
+        self._lock = threading.Lock()
+        if pasta:
+            self._carregar_pasta()
+
+    def _carregar_pasta(self):
+        """Retoma o nível em disco de uma execução anterior (mais antigos primeiro)"""
+        os.makedirs(self.pasta, exist_ok=True)
+        arquivos = []
+        for entrada in os.scandir(self.pasta):
+            if entrada.name.endswith(".pdf"):
+                estado = entrada.stat()
+                arquivos.append((estado.st_mtime, entrada.name[:-4], estado.st_size))
+        for _, chave, tamanho in sorted(arquivos):
+            self._disco[chave] = tamanho
+            self.bytes_disco += tamanho
+        self._limitar_disco()
+
+    def _caminho(self, chave):
+        return os.path.join(self.pasta, chave + ".pdf")
+
+    def obter(self, chave, gerar):
+        """Bytes da chave; numa falha, ``gerar()`` produz e o resultado é guardado"""
+        with self._lock:
+            conteudo = self._memoria.get(chave)
+            if conteudo is not None:
+                self._memoria.move_to_end(chave)
+                self.acertos += 1
+                return conteudo
+            no_disco = chave in self._disco
+
+        if no_disco:
+            try:
+                with open(self._caminho(chave), "rb") as f:
+                    conteudo = f.read()
+            except OSError:
+                conteudo = None
+            with self._lock:
+                if conteudo is None:
+                    tamanho = self._disco.pop(chave, None)
+                    if tamanho is not None:
+                        self.bytes_disco -= tamanho
+                else:
+                    self.acertos_disco += 1
+                    self._guardar_memoria(chave, conteudo)
+                    return conteudo
+
+        conteudo = gerar()
+        with self._lock:
+            self.falhas += 1
+            self._guardar_memoria(chave, conteudo)
+        return conteudo
+
+    def _guardar_memoria(self, chave, conteudo):
+        """Põe na memória e despeja os menos usados (chamar com o lock)"""
+        antigo = self._memoria.pop(chave, None)
+        if antigo is not None:
+            self.bytes_memoria -= len(antigo)
+        self._memoria[chave] = conteudo
+        self.bytes_memoria += len(conteudo)
+        while self.bytes_memoria > self.limite_memoria and self._memoria:
+            chave_velha, velho = self._memoria.popitem(last=False)
+            self.bytes_memoria -= len(velho)
+            self.despejos += 1
+            if self.limite_disco:
+                self._guardar_disco(chave_velha, velho)
+
+    def _guardar_disco(self, chave, conteudo):
+        if chave in self._disco:
+            self._disco.move_to_end(chave)
+            return
+        if len(conteudo) > self.limite_disco:
+            return
+        try:
+            temporario = self._caminho(chave) + ".tmp"
+            with open(temporario, "wb") as f:
+                f.write(conteudo)
+            os.replace(temporario, self._caminho(chave))
+        except OSError as e:
+            print(f"Erro ao gravar cache de PDF: {e}")
+            return
+        self._disco[chave] = len(conteudo)
+        self.bytes_disco += len(conteudo)
+        self._limitar_disco()
+
+    def _limitar_disco(self):
+        while self.bytes_disco > self.limite_disco and self._disco:
+            chave, tamanho = self._disco.popitem(last=False)
+            self.bytes_disco -= tamanho
+            self.despejos_disco += 1
+            try:
+                os.remove(self._caminho(chave))
+            except OSError:
+                pass
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                "acertos": self.acertos,
+                "acertos_disco": self.acertos_disco,
+                "falhas": self.falhas,
+                "despejos": self.despejos,
+                "despejos_disco": self.despejos_disco,
+                "itens_memoria": len(self._memoria),
+                "bytes_memoria": self.bytes_memoria,
+                "itens_disco": len(self._disco),
+                "bytes_disco": self.bytes_disco,
+            }
+
+
+_cache = None
+_lock_cache = threading.Lock()
+
+
+def obter_cache_relatorios():
+    """Cache de PDFs do processo, configurado pelas variáveis TOOLLIFE_CACHE_PDF_*"""
+    global _cache
+    with _lock_cache:
+        if _cache is None:
+            _cache = CacheBytes(
+                int(float(os.environ.get("TOOLLIFE_CACHE_PDF_MB", "16")) * MB),
+                os.environ.get("TOOLLIFE_CACHE_PDF_PASTA") or None,
+                int(float(os.environ.get("TOOLLIFE_CACHE_PDF_DISCO_MB", "256")) * MB))
+        return _cache
@@ -0,0 +1,375 @@
+"""ToolLife Pro sem interface: tarefas em lote pela linha de comando
+
+Não importa o Flet; o FPDF só é carregado pelos comandos que geram PDF e
+o NumPy só pelo ``recomendar``.
+
+Exemplos:
+    python cli.py registrar --operador Ana --maquina 301 --ferramenta "Macho M6" --pecas 780
+    python cli.py relatorio-troca --desde 2026-10-01 --saida relatorios/
+    python cli.py relatorio-consolidado --dias 7 --maquina 301
+    python cli.py exportar historico.csv --dias 1
+    python cli.py exportar historico.parquet --colunas data,maquina,ferramenta,pecas_feitas
+    python cli.py importar export_mes.csv
+    python cli.py catalogo adicionar-ferramenta "Broca Ø10mm" --vida 1100
+    python cli.py recomendar --dias 180 --aplicar
+    python cli.py acervo migrar . --remover
+    python cli.py reimprimir 3f2a9c0e5b7d4e1f8a6b2c9d0e4f7a1b --saida relatorios/
+    python cli.py --armazenamento sqlite servir --porta 8470
+"""
+import argparse
+import os
+import sys
+from datetime import datetime, timedelta
+
+import dominio
+from armazenamento import criar_armazenamento
+from historico import ler_data
+
+
+def data_argumento(texto):
+    """'2026-10-17', '2026-10-17T14:30' ou '17/10/2026 14:30'"""
+    try:
+        return ler_data(texto)
+    except ValueError:
+        try:
+            return datetime.fromisoformat(texto)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"data inválida: {texto!r}")
+
+
+def filtros_historico(args):
+    """Filtros comuns (--maquina, --ferramenta, --operador, --lote, --motivo, --desde,
+    --ate, --dias)"""
+    inicio = args.desde
+    if args.dias is not None:
+        inicio = datetime.now() - timedelta(days=args.dias)
+    return {
+        "maquina": args.maquina,
+        "ferramenta": args.ferramenta,
+        "operador": args.operador,
+        "lote": args.lote,
+        "motivo": args.motivo,
+        "inicio": inicio,
+        "fim": args.ate,
+    }
+
+
+def cmd_registrar(armazenamento, args):
+    dados = armazenamento.carregar_dados()
+    vida_esperada = args.vida
+    if vida_esperada is None:
+        vida_esperada = dados["vida_padrao"].get(args.ferramenta, 0)
+    agora = datetime.now()
+    registro = dominio.montar_registro(
+        agora, args.operador, args.maquina, args.ferramenta, args.lote_op,
+        args.pecas, vida_esperada, args.motivo, args.observacoes
+    )
+    # Só anexa: o histórico gravado não precisa ser lido para uma troca nova
+    armazenamento.anexar_historico(registro)
+    print(f"Troca registrada: {registro['percentual']}% da vida útil")
+
+    if args.pdf:
+        from acervo import obter_acervo
+        from relatorios import arquivar_pdf_troca
+        acervo = obter_acervo(args.acervo)
+        arquivar_pdf_troca(registro, dominio.nome_relatorio_troca(agora), acervo=acervo)
+        print(f"PDF guardado no acervo: {registro['id_troca']}")
+        if args.saida:
+            print(f"PDF criado: {acervo.extrair(registro['id_troca'], args.saida)}")
+
+
+def cmd_relatorio_troca(armazenamento, args):
+    """Regenera o PDF de cada troca filtrada (data do relatório = data da troca)"""
+    from relatorios import gerar_pdf_troca
+
+    armazenamento.carregar_historico()
+    os.makedirs(args.saida, exist_ok=True)
+    quantidade = 0
+    for registro in armazenamento.iterar_historico(**filtros_historico(args)):
+        agora = datetime.fromtimestamp(registro["instante"])
+        # Várias trocas no mesmo minuto: o contador evita sobrescrever arquivos
+        nome_arquivo = os.path.join(
+            args.saida, f"Relatorio_Troca_{agora.strftime('%Y%m%d_%H%M')}_{quantidade:06d}.pdf")
+        gerar_pdf_troca(registro, agora, nome_arquivo)
+        quantidade += 1
+    print(f"{quantidade} relatórios gerados em {args.saida}")
+
+
+def cmd_relatorio_consolidado(armazenamento, args):
+    from acervo import obter_acervo
+    from relatorios import arquivar_pdf_consolidado
+
+    armazenamento.carregar_historico()
+    filtros = filtros_historico(args)
+    filtros.pop("operador")
+    filtros.pop("lote")
+    filtros.pop("motivo")
+    agora = datetime.now()
+    nome_arquivo = dominio.nome_relatorio_consolidado(agora)
+    titulo = f"Ultimos {args.dias} Dias" if args.dias is not None else "Todo o historico"
+    acervo = obter_acervo(args.acervo)
+    chave = arquivar_pdf_consolidado(armazenamento, nome_arquivo,
+                                     dict(filtros, titulo_periodo=titulo), acervo=acervo)
+    print(f"PDF guardado no acervo: {chave}")
+    if args.arquivo:
+        print(f"PDF criado: {acervo.extrair(chave, args.arquivo)}")
+
+
+def cmd_exportar(armazenamento, args):
+    """Grava o histórico filtrado, em ordem cronológica, registro a registro
+
+    No CSV o instante vira a coluna 'data' em ISO 8601 (com segundos), que
+    planilhas e o ``importar`` entendem.
+    """
+    from exportacao import exportar_historico
+
+    armazenamento.carregar_historico()
+    colunas = args.colunas.split(",") if args.colunas else None
+    quantidade = exportar_historico(armazenamento, args.arquivo, args.formato, colunas,
+                                    **filtros_historico(args))
+    print(f"{quantidade} trocas exportadas para {args.arquivo}")
+
+
+def cmd_importar(armazenamento, args):
+    from importacao import gravar_rejeitadas, importar_trocas
+
+    dados = armazenamento.carregar_dados()
+    armazenamento.carregar_historico()
+
+    def progresso(resultado):
+        print(f"  {resultado.lidas} lidas, {resultado.importadas} importadas, "
+              f"{resultado.total_rejeitadas} rejeitadas", file=sys.stderr)
+
+    resultado = importar_trocas(armazenamento, args.arquivo, dados["vida_padrao"],
+                                ao_progresso=progresso)
+    print(f"{resultado.importadas} trocas importadas, {resultado.duplicadas} já existiam, "
+          f"{resultado.total_rejeitadas} rejeitadas")
+    if args.rejeitadas and resultado.total_rejeitadas:
+        gravar_rejeitadas(resultado, args.rejeitadas)
+        print(f"Linhas rejeitadas em {args.rejeitadas}")
+
+
+def cmd_catalogo(armazenamento, args):
+    dados = dominio.ordenar_catalogo(armazenamento.carregar_dados())
+    if args.acao == "listar":
+        print("Máquinas:")
+        for maquina in dados["maquinas"]:
+            print(f"  {maquina}")
+        print("Ferramentas:")
+        for ferramenta in dados["ferramentas"]:
+            print(f"  {ferramenta} ({dados['vida_padrao'].get(ferramenta, 0)} peças)")
+        return
+
+    if args.acao == "adicionar-maquina":
+        dominio.adicionar_maquina(dados, args.nome)
+    elif args.acao == "adicionar-ferramenta":
+        dominio.adicionar_ferramenta(dados, args.nome, args.vida)
+    elif args.acao == "remover-maquina":
+        dominio.remover_maquina(dados, args.nome)
+    elif args.acao == "remover-ferramenta":
+        dominio.remover_ferramenta(dados, args.nome)
+    armazenamento.salvar_dados(dados)
+    print("Catálogo atualizado")
+
+
+def cmd_recomendar(armazenamento, args):
+    """Vida sugerida por ferramenta (e por máquina) a partir das trocas filtradas"""
+    from analise import AnaliseVida
+    from recomendacao import RecomendadorVida
+
+    dados = armazenamento.carregar_dados()
+    armazenamento.carregar_historico()
+    analise = AnaliseVida(armazenamento.iterar_historico(**filtros_historico(args)))
+    recomendador = RecomendadorVida(analise, args.confiabilidade, args.confianca)
+    recomendacoes = recomendador.recomendacoes(dados["vida_padrao"])
+    if not recomendacoes:
+        print("Trocas insuficientes para sugerir vidas")
+        return
+
+    print(f"Vida que {args.confiabilidade:.0%} das ferramentas alcançam "
+          f"(faixa de {args.confianca:.0%} de confiança):")
+    for ferramenta in sorted(recomendacoes):
+        item = recomendacoes[ferramenta]
+        minimo, maximo = item["faixa"]
+        print(f"  {ferramenta}: {item['recomendada']} peças ({minimo}-{maximo}), "
+              f"atual {item['atual'] if item['atual'] is not None else '-'}, "
+              f"{item['falhas']} falhas e {item['censuradas']} censuradas")
+        for maquina in sorted(item["maquinas"]):
+            por_maquina = item["maquinas"][maquina]
+            minimo, maximo = por_maquina["faixa"]
+            print(f"      máquina {maquina}: {por_maquina['recomendada']} peças "
+                  f"({minimo}-{maximo})")
+
+    if args.aplicar:
+        aplicadas = 0
+        for ferramenta, item in recomendacoes.items():
+            if ferramenta in dados["vida_padrao"]:
+                dados["vida_padrao"][ferramenta] = item["recomendada"]
+                aplicadas += 1
+        armazenamento.salvar_dados(dados)
+        print(f"Vida padrão atualizada em {aplicadas} ferramentas")
+
+
+def cmd_acervo(armazenamento, args):
+    """Consulta o acervo de PDFs, extrai relatórios e migra PDFs soltos"""
+    from acervo import migrar_pasta, obter_acervo
+
+    acervo = obter_acervo(args.acervo)
+    if args.acao == "info":
+        estatisticas = acervo.estatisticas()
+        for chave, valor in estatisticas.items():
+            print(f"{chave}: {valor}")
+    elif args.acao == "extrair":
+        if not args.alvo:
+            raise ValueError("Informe o id_troca")
+        try:
+            print(f"PDF criado: {acervo.extrair(args.alvo, args.saida)}")
+        except KeyError:
+            raise ValueError(f"Troca sem relatório no acervo: {args.alvo}")
+    else:
+        armazenamento.carregar_historico()
+        migrados, deixados = migrar_pasta(acervo, armazenamento, args.alvo or ".",
+                                          args.remover)
+        print(f"{migrados} PDFs migrados para o acervo, {deixados} sem troca correspondente")
+    acervo.fechar()
+
+
+def cmd_reimprimir(armazenamento, args):
+    """Regenera o PDF de uma troca do histórico, idêntico ao emitido na troca"""
+    from relatorios import pdf_da_troca
+
+    armazenamento.carregar_historico()
+    registro = armazenamento.buscar_troca(args.id_troca)
+    if registro is None:
+        raise ValueError(f"Troca não encontrada: {args.id_troca}")
+    destino = args.saida
+    if os.path.isdir(destino):
+        destino = os.path.join(destino, dominio.nome_relatorio_troca(
+            datetime.fromtimestamp(registro["instante"])))
+    with open(destino, "wb") as f:
+        f.write(pdf_da_troca(registro))
+    print(f"PDF criado: {destino}")
+
+
+def cmd_servir(armazenamento, args):
+    """Central de trocas: recebe os registros dos terminais por HTTP"""
+    from ingestao import ServidorIngestao
+
+    armazenamento.carregar_historico()
+    servidor = ServidorIngestao(armazenamento.anexar_varios, args.host, args.porta).iniciar()
+    print(f"Central de trocas em http://{args.host}:{servidor.porta}/trocas (Ctrl+C para parar)")
+    servidor.aguardar()
+    print(f"{servidor.gravados} trocas gravadas, {servidor.recebidos} recebidas")
+
+
+def criar_parser():
+    parser = argparse.ArgumentParser(prog="toollife", description="ToolLife Pro em lote")
+    parser.add_argument("--dados", default=dominio.ARQUIVO_DADOS,
+                        help="arquivo do catálogo (padrão: %(default)s)")
+    parser.add_argument("--historico", default=dominio.ARQUIVO_HISTORICO,
+                        help="arquivo do histórico (padrão: %(default)s)")
+    parser.add_argument("--armazenamento", choices=["json", "sqlite"],
+                        help="backend (padrão: TOOLLIFE_ARMAZENAMENTO ou json)")
+    parser.add_argument("--acervo", default=dominio.PASTA_ACERVO,
+                        help="pasta do acervo de PDFs (padrão: %(default)s)")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    def com_filtros(sub):
+        sub.add_argument("--maquina")
+        sub.add_argument("--ferramenta")
+        sub.add_argument("--operador")
+        sub.add_argument("--lote")
+        sub.add_argument("--motivo")
+        sub.add_argument("--desde", type=data_argumento, help="início (inclusive)")
+        sub.add_argument("--ate", type=data_argumento, help="fim (exclusive)")
+        sub.add_argument("--dias", type=int, help="últimos N dias (substitui --desde)")
+        return sub
+
+    sub = comandos.add_parser("registrar", help="registra uma troca")
+    sub.add_argument("--operador", required=True)
+    sub.add_argument("--maquina", required=True)
+    sub.add_argument("--ferramenta", required=True)
+    sub.add_argument("--lote", dest="lote_op", default="")
+    sub.add_argument("--pecas", type=int, required=True)
+    sub.add_argument("--vida", type=int, help="vida esperada (padrão: a do catálogo)")
+    sub.add_argument("--motivo", default="✅ Completou a Vida Útil")
+    sub.add_argument("--observacoes", default="")
+    sub.add_argument("--pdf", action="store_true", help="gera também o PDF da troca (no acervo)")
+    sub.add_argument("--saida", help="pasta para uma cópia do PDF fora do acervo")
+    sub.set_defaults(funcao=cmd_registrar)
+
+    sub = com_filtros(comandos.add_parser("relatorio-troca",
+                                          help="regenera os PDFs das trocas filtradas"))
+    sub.add_argument("--saida", default="relatorios", help="pasta de destino")
+    sub.set_defaults(funcao=cmd_relatorio_troca)
+
+    sub = com_filtros(comandos.add_parser("relatorio-consolidado",
+                                          help="gera o PDF consolidado"))
+    sub.add_argument("--arquivo", help="pasta ou arquivo para uma cópia do PDF fora do acervo")
+    sub.set_defaults(funcao=cmd_relatorio_consolidado)
+
+    sub = com_filtros(comandos.add_parser("exportar", help="exporta o histórico"))
+    sub.add_argument("arquivo")
+    sub.add_argument("--formato", choices=["csv", "jsonl", "parquet"],
+                     help="padrão: pela extensão do arquivo (csv se não reconhecer)")
+    sub.add_argument("--colunas", help="colunas separadas por vírgula (padrão: todas)")
+    sub.set_defaults(funcao=cmd_exportar)
+
+    sub = comandos.add_parser("importar",
+                              help="importa trocas de CSV, JSON-lines ou array JSON do MES")
+    sub.add_argument("arquivo")
+    sub.add_argument("--rejeitadas", help="CSV para as linhas rejeitadas")
+    sub.set_defaults(funcao=cmd_importar)
+
+    sub = comandos.add_parser("catalogo", help="consulta ou edita máquinas e ferramentas")
+    sub.add_argument("acao", choices=["listar", "adicionar-maquina", "adicionar-ferramenta",
+                                      "remover-maquina", "remover-ferramenta"])
+    sub.add_argument("nome", nargs="?")
+    sub.add_argument("--vida", help="vida padrão da ferramenta")
+    sub.set_defaults(funcao=cmd_catalogo)
+
+    sub = com_filtros(comandos.add_parser(
+        "recomendar", help="sugere a vida padrão a partir do histórico"))
+    sub.add_argument("--confiabilidade", type=float, default=0.9,
+                     help="fração das ferramentas que deve alcançar a vida (padrão: %(default)s)")
+    sub.add_argument("--confianca", type=float, default=0.9,
+                     help="nível de confiança da faixa (padrão: %(default)s)")
+    sub.add_argument("--aplicar", action="store_true",
+                     help="grava as vidas sugeridas no catálogo")
+    sub.set_defaults(funcao=cmd_recomendar)
+
+    sub = comandos.add_parser("acervo", help="acervo de PDFs das trocas")
+    sub.add_argument("acao", choices=["info", "extrair", "migrar"])
+    sub.add_argument("alvo", nargs="?", help="id_troca (extrair) ou pasta com PDFs soltos (migrar)")
+    sub.add_argument("--saida", default=".", help="pasta ou arquivo do PDF extraído")
+    sub.add_argument("--remover", action="store_true", help="apaga os PDFs migrados")
+    sub.set_defaults(funcao=cmd_acervo)
+
+    sub = comandos.add_parser("reimprimir", help="regenera o PDF de uma troca pelo id_troca")
+    sub.add_argument("id_troca")
+    sub.add_argument("--saida", default=".", help="pasta ou arquivo do PDF")
+    sub.set_defaults(funcao=cmd_reimprimir)
+
+    sub = comandos.add_parser("servir", help="central que recebe as trocas dos terminais")
+    sub.add_argument("--host", default="0.0.0.0")
+    sub.add_argument("--porta", type=int, default=8470)
+    sub.set_defaults(funcao=cmd_servir)
+
+    return parser
+
+
+def principal(argv=None):
+    args = criar_parser().parse_args(argv)
+    armazenamento = criar_armazenamento(args.dados, args.historico, args.armazenamento)
+    try:
+        args.funcao(armazenamento, args)
+    except ValueError as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 1
+    finally:
+        armazenamento.fechar()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(principal())
@@ -0,0 +1,213 @@
+"""Contagem ao vivo das peças feitas por máquina × ferramenta
+
+Hoje o operador só informa as peças na hora da troca, digitando o número
+na aba TROCA. Com ``TOOLLIFE_CONTAGEM_PORTA`` definida, o app abre um
+servidor TCP (asyncio, numa thread própria, ver ``servico``) onde as
+máquinas, ou o gateway do CLP, mandam as peças conforme saem, uma linha
+por evento:
+
+    maquina;ferramenta;quantidade
+
+(``quantidade`` é opcional, padrão 1; linhas vazias são ignoradas). O
+``ContadorPecas`` acumula as peças desde a última troca de cada par,
+compara com a ``vida_padrao`` e preenche "peças feitas" na aba TROCA; ao
+registrar a troca, o par volta a zero.
+
+Os eventos de cada leitura do socket são somados num lote e aplicados com
+uma só passada pelo lock. Nada é gravado por evento: as contagens vão
+para ``dominio.ARQUIVO_CONTAGEM`` a cada ``TOOLLIFE_CONTAGEM_INTERVALO``
+segundos (padrão 2), só se algo mudou, e na saída do processo. Uma queda
+perde no máximo esse intervalo de peças.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+
+import dominio
+from servico import ServicoAsyncio
+
+
+VERSAO_ARQUIVO = 1
+
+# Maior linha aceita; acima disso a conexão é encerrada
+TAMANHO_MAXIMO_LINHA = 4096
+
+
+def ler_evento(linha):
+    """(maquina, ferramenta, quantidade) de uma linha do protocolo; ``ValueError`` se inválida"""
+    partes = linha.split(";")
+    if len(partes) == 2:
+        partes.append("1")
+    if len(partes) != 3:
+        raise ValueError(f"Evento inválido: {linha!r}")
+    maquina, ferramenta = partes[0].strip(), partes[1].strip()
+    quantidade = int(partes[2])
+    if not maquina or not ferramenta or quantidade < 0:
+        raise ValueError(f"Evento inválido: {linha!r}")
+    return maquina, ferramenta, quantidade
+
+
+class ContadorPecas:
+    """Peças feitas desde a última troca, por (máquina, ferramenta)"""
+
+    def __init__(self, arquivo):
+        self.arquivo = arquivo
+        self.contagens = {}
+        self.eventos = 0  # eventos aceitos desde a abertura
+        self.rejeitados = 0
+        self._alterado = False
+        self._lock = threading.Lock()
+        self._carregar()
+
+    def _carregar(self):
+        if not os.path.exists(self.arquivo):
+            return
+        try:
+            with open(self.arquivo, "r", encoding="utf-8") as f:
+                conteudo = json.load(f)
+            for maquina, ferramenta, pecas in conteudo.get("contagens", []):
+                self.contagens[(maquina, ferramenta)] = int(pecas)
+        except Exception as e:
+            print(f"Erro ao carregar contagem de peças: {e}")
+
+    def somar(self, lote, eventos=None, rejeitados=0):
+        """Aplica um lote {(maquina, ferramenta): peças} de uma vez
+
+        ``rejeitados`` conta as linhas inválidas da mesma leitura, no mesmo lock.
+        """
+        with self._lock:
+            contagens = self.contagens
+            for chave, pecas in lote.items():
+                contagens[chave] = contagens.get(chave, 0) + pecas
+            self.eventos += len(lote) if eventos is None else eventos
+            self.rejeitados += rejeitados
+            if lote:
+                self._alterado = True
+
+    def registrar(self, maquina, ferramenta, quantidade=1):
+        self.somar({(maquina, ferramenta): quantidade}, 1)
+
+    def pecas(self, maquina, ferramenta):
+        with self._lock:
+            return self.contagens.get((maquina, ferramenta), 0)
+
+    def situacao(self, maquina, ferramenta, vida_padrao):
+        """(peças, restante, percentual) do par; restante é None sem vida conhecida"""
+        pecas = self.pecas(maquina, ferramenta)
+        restante = vida_padrao - pecas if vida_padrao > 0 else None
+        return pecas, restante, dominio.calcular_percentual(pecas, vida_padrao)
+
+    def zerar(self, maquina, ferramenta, descontar=None):
+        """Recomeça a contagem do par depois de uma troca
+
+        Com ``descontar`` (as peças mostradas ao operador), só elas saem: o
+        que chegou depois já é da ferramenta nova.
+        """
+        chave = (maquina, ferramenta)
+        with self._lock:
+            pecas = self.contagens.get(chave, 0)
+            restante = 0 if descontar is None else max(pecas - descontar, 0)
+            if restante:
+                self.contagens[chave] = restante
+            else:
+                self.contagens.pop(chave, None)
+            self._alterado = True
+
+    def gravar(self):
+        """Grava as contagens de forma atômica, se mudaram desde a última gravação"""
+        with self._lock:
+            if not self._alterado:
+                return
+            contagens = [[m, f, p] for (m, f), p in self.contagens.items()]
+            self._alterado = False
+        temporario = self.arquivo + ".tmp"
+        try:
+            with open(temporario, "w", encoding="utf-8") as f:
+                json.dump({"versao": VERSAO_ARQUIVO, "contagens": contagens}, f,
+                          ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporario, self.arquivo)
+        except Exception as e:
+            with self._lock:
+                self._alterado = True
+            print(f"Erro ao salvar contagem de peças: {e}")
+
+    def gravar_periodicamente(self, intervalo):
+        def gravar():
+            while True:
+                time.sleep(intervalo)
+                self.gravar()
+
+        threading.Thread(target=gravar, name="contagem-gravacao", daemon=True).start()
+        atexit.register(self.gravar)
+
+
+class ServidorContagem(ServicoAsyncio):
+    """Servidor TCP que alimenta um ``ContadorPecas``"""
+
+    nome_thread = "contagem"
+
+    def __init__(self, contador, host="0.0.0.0", porta=0):
+        super().__init__(host, porta)
+        self.contador = contador
+
+    async def _conexao(self, leitor, escritor):
+        contador = self.contador
+        pendente = b""
+        try:
+            while True:
+                dados = await leitor.read(65536)
+                if not dados:
+                    break
+                linhas = (pendente + dados).split(b"\n")
+                pendente = linhas.pop()
+                if len(pendente) > TAMANHO_MAXIMO_LINHA:
+                    break
+                # Um lote por leitura: o lock é pego uma vez para todas as linhas
+                lote = {}
+                eventos = rejeitados = 0
+                for linha in linhas:
+                    linha = linha.strip()
+                    if not linha:
+                        continue
+                    try:
+                        maquina, ferramenta, quantidade = ler_evento(linha.decode("utf-8"))
+                    except ValueError:
+                        rejeitados += 1
+                        continue
+                    chave = (maquina, ferramenta)
+                    lote[chave] = lote.get(chave, 0) + quantidade
+                    eventos += 1
+                if lote or rejeitados:
+                    contador.somar(lote, eventos, rejeitados)
+        except ConnectionError:
+            pass
+        finally:
+            escritor.close()
+
+
+_contador = None
+_lock_contador = threading.Lock()
+
+
+def obter_contador():
+    """Contador do processo, ou None se TOOLLIFE_CONTAGEM_PORTA não estiver definida"""
+    global _contador
+    porta = os.environ.get("TOOLLIFE_CONTAGEM_PORTA")
+    if not porta:
+        return None
+    with _lock_contador:
+        if _contador is None:
+            contador = ContadorPecas(dominio.ARQUIVO_CONTAGEM)
+            intervalo = float(os.environ.get("TOOLLIFE_CONTAGEM_INTERVALO", "2"))
+            contador.gravar_periodicamente(intervalo)
+            host = os.environ.get("TOOLLIFE_CONTAGEM_HOST", "0.0.0.0")
+            try:
+                ServidorContagem(contador, host, int(porta)).iniciar()
+            except Exception as e:
+                print(f"Erro ao abrir servidor de contagem: {e}")
+            _contador = contador
+        return _contador
@@ -0,0 +1,142 @@
+"""Regras do ToolLife Pro que não dependem da interface
+
+Usadas pela tela do Flet (``main.py``) e pela linha de comando (``cli.py``):
+cálculo do percentual de vida, montagem do registro de troca, nomes dos
+relatórios e edição do catálogo. Erros de validação levantam ``ValueError``
+com a mensagem que a interface mostra ao usuário.
+
+As listas ``maquinas`` e ``ferramentas`` do catálogo ficam sempre em ordem
+alfabética (``ordenar_catalogo`` na carga); inclusões e remoções usam busca
+binária e devolvem a posição afetada, para a tela mexer só naquela linha.
+"""
+import uuid
+from bisect import bisect_left
+from datetime import timedelta
+
+ARQUIVO_DADOS = "ferramental.json"
+ARQUIVO_HISTORICO = "historico_trocas.json"
+ARQUIVO_CONTAGEM = "contagem_pecas.json"
+ARQUIVO_FILA_CENTRAL = "fila_central.jsonl"
+PASTA_ACERVO = "acervo_relatorios"
+
+# Períodos oferecidos na aba de histórico e no relatório consolidado
+PERIODOS = {
+    "Último Turno (8h)": timedelta(hours=8),
+    "Últimos 7 Dias": timedelta(days=7),
+    "Últimos 30 Dias": timedelta(days=30),
+}
+
+
+def calcular_percentual(pecas_feitas, vida_esperada):
+    """Percentual da vida esperada já usado (0 se a vida não é conhecida)"""
+    return (pecas_feitas / vida_esperada * 100) if vida_esperada > 0 else 0
+
+
+def montar_registro(agora, operador, maquina, ferramenta, lote, pecas_feitas,
+                    vida_esperada, motivo, observacoes):
+    """Registro de troca no formato gravado no histórico
+
+    A data vai como ``instante`` (segundos desde a época); o texto para
+    exibição sai de ``historico.formatar_data``. ``id_troca`` identifica a
+    troca em qualquer terminal: reenvios com o mesmo id não duplicam.
+    """
+    if pecas_feitas < 0:
+        raise ValueError("O número de peças não pode ser negativo!")
+    return {
+        "instante": int(agora.timestamp()),
+        "operador": operador,
+        "maquina": maquina,
+        "ferramenta": ferramenta,
+        "lote": lote or "N/A",
+        "pecas_feitas": pecas_feitas,
+        "vida_esperada": vida_esperada,
+        "percentual": round(calcular_percentual(pecas_feitas, vida_esperada), 1),
+        "motivo": motivo,
+        "observacoes": observacoes or "",
+        "id_troca": uuid.uuid4().hex
+    }
+
+
+def inicio_do_periodo(periodo, agora):
+    """Começo do período escolhido (None para "Todo o Histórico")"""
+    duracao = PERIODOS.get(periodo)
+    return agora - duracao if duracao else None
+
+
+def nome_relatorio_troca(agora):
+    """Nome do PDF de uma troca feita em ``agora`` (data e hora até os segundos)"""
+    return f"Relatorio_Troca_{agora.strftime('%Y%m%d_%H%M%S')}.pdf"
+
+
+def nome_relatorio_consolidado(agora):
+    """Nome do PDF consolidado gerado em ``agora`` (data e hora até os segundos)"""
+    return f"Relatorio_Consolidado_{agora.strftime('%Y%m%d_%H%M%S')}.pdf"
+
+
+def ordenar_catalogo(dados):
+    """Coloca máquinas e ferramentas em ordem alfabética (catálogos antigos)"""
+    dados["maquinas"].sort()
+    dados["ferramentas"].sort()
+    return dados
+
+
+def _posicao(lista, nome):
+    """Posição de ``nome`` na lista ordenada e se ele já está lá"""
+    posicao = bisect_left(lista, nome)
+    return posicao, posicao < len(lista) and lista[posicao] == nome
+
+
+def adicionar_maquina(dados, nome):
+    """Inclui a máquina no catálogo; retorna (nome, posição na lista)"""
+    nome = (nome or "").strip()
+    if not nome:
+        raise ValueError("Digite o nome da máquina!")
+    posicao, existe = _posicao(dados["maquinas"], nome)
+    if existe:
+        raise ValueError("Esta máquina já existe!")
+    dados["maquinas"].insert(posicao, nome)
+    return nome, posicao
+
+
+def adicionar_ferramenta(dados, nome, vida):
+    """Inclui a ferramenta com sua vida padrão; retorna (nome, posição na lista)
+
+    ``vida`` pode vir como texto.
+    """
+    nome = (nome or "").strip()
+    if not nome:
+        raise ValueError("Digite o nome da ferramenta!")
+    if vida in (None, ""):
+        raise ValueError("Digite a vida esperada!")
+    try:
+        vida = int(vida)
+    except (TypeError, ValueError):
+        vida = 0
+    if vida <= 0:
+        raise ValueError("Vida esperada deve ser um número positivo!")
+    posicao, existe = _posicao(dados["ferramentas"], nome)
+    if existe:
+        raise ValueError("Esta ferramenta já existe!")
+    dados["ferramentas"].insert(posicao, nome)
+    dados["vida_padrao"][nome] = vida
+    return nome, posicao
+
+
+def _remover(lista, nome):
+    posicao, existe = _posicao(lista, nome)
+    if not existe:
+        raise ValueError(f"'{nome}' não está no catálogo!")
+    del lista[posicao]
+    return posicao
+
+
+def remover_maquina(dados, nome):
+    """Tira a máquina do catálogo; retorna a posição que ela ocupava"""
+    return _remover(dados["maquinas"], nome)
+
+
+def remover_ferramenta(dados, nome):
+    """Tira a ferramenta do catálogo; retorna a posição que ela ocupava"""
+    posicao = _remover(dados["ferramentas"], nome)
+    dados["vida_padrao"].pop(nome, None)
+    return posicao
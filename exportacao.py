@@ -0,0 +1,156 @@
+"""Exportação do histórico em fluxo (CSV, JSON-lines e Parquet)
+
+O histórico sai do armazenamento por ``iterar_historico`` (já filtrado
+por data, máquina, ferramenta...) e passa por estágios geradores:
+
+    registros -> projetar (colunas escolhidas) -> escritor do formato
+
+Cada estágio consome um registro por vez; CSV e JSON-lines são gravados
+linha a linha e o Parquet em grupos de ``TAMANHO_GRUPO`` linhas. Só um
+grupo fica na memória, então exportar milhões de trocas usa a mesma
+memória que exportar mil. O arquivo é gravado com outro nome e renomeado
+no fim: quem lê (a carga noturna do BI) nunca vê uma exportação pela
+metade.
+
+A coluna ``data`` não é gravada no histórico: sai do ``instante``, em ISO
+8601 no CSV e no JSON-lines e como timestamp no Parquet.
+"""
+import csv
+import json
+import os
+from datetime import datetime
+from itertools import islice
+from operator import itemgetter
+
+import historico
+
+
+FORMATOS = ("csv", "jsonl", "parquet")
+TAMANHO_GRUPO = 65536
+TAMANHO_PAGINA = 5000  # do iterar_historico no SQLite
+TAMANHO_BUFFER = 1024 * 1024
+
+# "data" é derivada do instante; as demais vêm do registro
+COLUNAS = ("data",) + historico.CAMPOS
+COLUNAS_PADRAO = {
+    "csv": ("data",) + historico.CAMPOS[1:],
+    "jsonl": historico.CAMPOS,
+    "parquet": ("data",) + historico.CAMPOS[1:],
+}
+
+
+def validar_colunas(colunas):
+    """Confere os nomes pedidos; levanta ValueError com os desconhecidos"""
+    desconhecidas = [c for c in colunas if c not in COLUNAS]
+    if desconhecidas:
+        raise ValueError(f"Colunas desconhecidas: {', '.join(desconhecidas)} "
+                         f"(disponíveis: {', '.join(COLUNAS)})")
+    return tuple(colunas)
+
+
+def projetar(registros, colunas, data_como_texto=True):
+    """Gera uma tupla por registro, só com as colunas pedidas"""
+    # itemgetter com um nome só devolve o valor, não uma tupla: o campo extra
+    # (descartado no fim) garante a tupla
+    campos = tuple("instante" if c == "data" else c for c in colunas)
+    pegar = itemgetter(*campos, "instante")
+    if "data" not in colunas:
+        for registro in registros:
+            yield pegar(registro)[:-1]
+        return
+
+    posicao = colunas.index("data")
+    # Trocas seguidas costumam repetir o instante: a conversão é reaproveitada
+    ultimo_instante = data = None
+    for registro in registros:
+        linha = pegar(registro)
+        if linha[-1] != ultimo_instante:
+            ultimo_instante = linha[-1]
+            data = datetime.fromtimestamp(ultimo_instante)
+            if data_como_texto:
+                data = data.isoformat(timespec="seconds")
+        yield linha[:posicao] + (data,) + linha[posicao + 1:-1]
+
+
+def escrever_csv(arquivo, colunas, linhas):
+    with open(arquivo, "w", encoding="utf-8", newline="", buffering=TAMANHO_BUFFER) as f:
+        escritor = csv.writer(f, delimiter=";")
+        escritor.writerow(colunas)
+        escritor.writerows(linhas)
+
+
+def escrever_jsonl(arquivo, colunas, linhas):
+    codificar = json.JSONEncoder(ensure_ascii=False).encode
+    with open(arquivo, "w", encoding="utf-8", buffering=TAMANHO_BUFFER) as f:
+        f.writelines(codificar(dict(zip(colunas, linha))) + "\n" for linha in linhas)
+
+
+def esquema_parquet(colunas):
+    import pyarrow as pa
+
+    tipos = {"data": pa.timestamp("s"), "instante": pa.int64(), "pecas_feitas": pa.int64(),
+             "vida_esperada": pa.int64(), "percentual": pa.float64()}
+    return pa.schema([(c, tipos.get(c, pa.string())) for c in colunas])
+
+
+def escrever_parquet(arquivo, colunas, linhas, tamanho_grupo=TAMANHO_GRUPO):
+    """Grava um row group por ``tamanho_grupo`` linhas (precisa do pyarrow)"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Exportar em Parquet requer o pacote pyarrow")
+
+    esquema = esquema_parquet(colunas)
+    with pq.ParquetWriter(arquivo, esquema, compression="zstd") as escritor:
+        while True:
+            grupo = list(islice(linhas, tamanho_grupo))
+            if not grupo:
+                break
+            escritor.write_table(pa.Table.from_arrays(
+                [pa.array(valores, tipo) for valores, tipo in zip(zip(*grupo), esquema.types)],
+                schema=esquema))
+
+
+ESCRITORES = {"csv": escrever_csv, "jsonl": escrever_jsonl, "parquet": escrever_parquet}
+
+
+def formato_do_arquivo(caminho):
+    """Formato pela extensão (.csv, .jsonl/.ndjson, .parquet); csv se não reconhecer"""
+    extensao = os.path.splitext(caminho)[1].lower()
+    if extensao in (".jsonl", ".ndjson"):
+        return "jsonl"
+    if extensao in (".parquet", ".pq"):
+        return "parquet"
+    return "csv"
+
+
+def exportar_historico(armazenamento, arquivo, formato=None, colunas=None, **filtros):
+    """Exporta as trocas filtradas, em ordem cronológica; retorna quantas foram
+
+    ``filtros`` são os de ``iterar_historico``. Sem ``formato``, usa a
+    extensão do arquivo; sem ``colunas``, as do formato (``COLUNAS_PADRAO``).
+    """
+    formato = formato or formato_do_arquivo(arquivo)
+    if formato not in ESCRITORES:
+        raise ValueError(f"Formato desconhecido: {formato}")
+    colunas = validar_colunas(colunas or COLUNAS_PADRAO[formato])
+
+    quantidade = 0
+
+    def contar(registros):
+        nonlocal quantidade
+        for registro in registros:
+            quantidade += 1
+            yield registro
+
+    registros = contar(armazenamento.iterar_historico(tamanho_pagina=TAMANHO_PAGINA, **filtros))
+    linhas = projetar(registros, colunas, data_como_texto=formato != "parquet")
+    temporario = arquivo + ".tmp"
+    try:
+        ESCRITORES[formato](temporario, colunas, linhas)
+        os.replace(temporario, arquivo)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+    return quantidade
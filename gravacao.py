@@ -0,0 +1,97 @@
+"""Gravação adiada (write-behind) do catálogo
+
+Cada edição do catálogo (incluir ou tirar máquina ou ferramenta) regravava
+o ``ferramental.json`` inteiro, na hora e na thread do clique: numa edição
+em massa, milhares de regravações do arquivo todo. Com ``GravacaoAdiada``
+a edição só marca que há alteração (``marcar``) e segue; uma thread espera
+``janela`` segundos, juntando as edições que chegarem nesse meio tempo,
+tira uma cópia do estado e grava uma vez só.
+
+``pendente`` diz se há alteração ainda não gravada. ``descarregar`` grava
+na hora o que estiver pendente e também roda na saída do processo. Se a
+gravação falha, a alteração continua pendente e a thread tenta de novo
+depois de outra janela.
+"""
+import atexit
+import threading
+
+
+JANELA = 0.5
+
+
+class GravacaoAdiada:
+    """Junta as alterações de uma janela de tempo numa só gravação, numa thread
+
+    ``capturar()`` devolve a cópia do estado a gravar e deve segurar o lock
+    de quem altera o estado; ``gravar(copia)`` grava, fora de qualquer lock.
+    ``ao_gravar()``, se dado, é chamado depois de cada gravação bem-sucedida.
+    Quem segura o lock do estado não deve chamar ``descarregar`` nem
+    ``fechar``: a thread pode estar esperando esse lock em ``capturar``.
+    """
+
+    def __init__(self, capturar, gravar, janela=JANELA, ao_gravar=None, nome="gravacao"):
+        self.capturar = capturar
+        self.gravar = gravar
+        self.janela = janela
+        self.ao_gravar = ao_gravar
+        self.gravacoes = 0
+        self.falhas = 0
+        self._versao = 0  # sobe a cada marcar
+        self._versao_gravada = 0
+        self._lock = threading.Lock()
+        self._lock_gravacao = threading.Lock()  # uma gravação por vez
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._rodar, name=nome, daemon=True)
+        self._thread.start()
+        atexit.register(self.fechar)
+
+    @property
+    def pendente(self):
+        """Há alteração marcada que ainda não foi gravada"""
+        return self._versao != self._versao_gravada
+
+    def marcar(self):
+        """Registra uma alteração; a gravação sai na próxima janela"""
+        with self._lock:
+            self._versao += 1
+        self._acordar.set()
+
+    def descarregar(self):
+        """Grava já o que estiver pendente; retorna False se a gravação falhou"""
+        with self._lock_gravacao:
+            with self._lock:
+                versao = self._versao
+            if versao == self._versao_gravada:
+                return True
+            # Marcações depois da leitura da versão podem entrar na cópia; no
+            # pior caso, a próxima janela grava o mesmo estado de novo
+            try:
+                self.gravar(self.capturar())
+            except Exception as e:
+                self.falhas += 1
+                print(f"Erro ao salvar dados: {e}")
+                return False
+            self._versao_gravada = versao
+            self.gravacoes += 1
+        if self.ao_gravar is not None:
+            self.ao_gravar()
+        return True
+
+    def fechar(self):
+        """Para a thread e grava o que estiver pendente"""
+        self._parar.set()
+        self._acordar.set()
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join()
+        return self.descarregar()
+
+    def _rodar(self):
+        while True:
+            self._acordar.wait()
+            # Espera a janela para juntar as próximas edições numa só gravação
+            if self._parar.wait(self.janela):
+                return
+            self._acordar.clear()
+            if not self.descarregar():
+                self._acordar.set()  # tenta de novo depois de outra janela
@@ -0,0 +1,383 @@
+"""Histórico de trocas em memória no formato colunar
+
+Com centenas de milhares de trocas, um dict por registro ocupa muita
+memória nos tablets. ``HistoricoColunar`` guarda cada campo numa coluna:
+números em ``array`` tipados, o instante da troca como inteiro (segundos
+desde a época) e os campos de texto repetitivos (máquina, ferramenta,
+operador, motivo, lote) codificados por dicionário. O acesso continua
+sendo por registro: cada posição devolve uma ``LinhaHistorico``, que se
+comporta como o dict original.
+
+O registro guarda só o ``instante``; o texto ``data`` ('17/10/2026 14:30')
+é montado na hora de exibir (``formatar_data``). Registros antigos, que só
+têm ``data``, são aceitos e convertidos uma vez na entrada.
+
+Um índice por instante (``consultar``) acha o começo e o fim de um período
+por busca binária, sem percorrer o histórico inteiro.
+
+Cada troca registrada pelo app leva um ``id_troca`` único (registros
+antigos não têm: None). ``buscar_id`` acha a troca pelo id sem varrer o
+histórico; o armazenamento usa isso para não gravar duas vezes a mesma
+troca reenviada.
+"""
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Mapping
+from datetime import datetime
+from functools import lru_cache
+
+
+FORMATO_DATA = '%d/%m/%Y %H:%M'
+BLOCO_ORDEM = 512  # posições do índice fora de ordem lidas por vez em consultar
+
+CAMPOS_CATEGORICOS = ("operador", "maquina", "ferramenta", "lote", "motivo")
+CAMPOS_NUMERICOS = {"pecas_feitas": 'q', "vida_esperada": 'q', "percentual": 'd'}
+# Mesma ordem de chaves dos registros criados pelo app
+CAMPOS = ("instante", "operador", "maquina", "ferramenta", "lote",
+          "pecas_feitas", "vida_esperada", "percentual", "motivo", "observacoes",
+          "id_troca")
+
+
+class LinhaHistorico(Mapping):
+    """Visão somente leitura de um registro do ``HistoricoColunar``
+
+    Além dos campos gravados, ``linha["data"]`` devolve o instante já
+    formatado para exibição.
+    """
+
+    __slots__ = ("_historico", "_indice")
+
+    def __init__(self, historico, indice):
+        self._historico = historico
+        self._indice = indice
+
+    def __getitem__(self, campo):
+        return self._historico._valor(self._indice, campo)
+
+    def __iter__(self):
+        yield from CAMPOS
+        yield from self._historico._extras.get(self._indice, ())
+
+    def __len__(self):
+        return len(CAMPOS) + len(self._historico._extras.get(self._indice, ()))
+
+    def __repr__(self):
+        return f"LinhaHistorico({dict(self)!r})"
+
+
+class HistoricoColunar:
+    """Sequência de registros de troca, mais recentes primeiro
+
+    Internamente os registros ficam em ordem de chegada; a posição 0 da
+    sequência é o último registro anexado. ``insert(0, registro)`` é
+    aceito para manter compatibilidade com o código que usava lista.
+
+    As colunas só crescem e um valor gravado nunca muda, então leituras
+    em outras threads (sessões do app) só precisam de um retrato
+    consistente do tamanho e do índice por instante, tirado com o lock.
+    """
+
+    def __init__(self, registros=()):
+        self._instantes = array('q')
+        self._numeros = {campo: array(tipo) for campo, tipo in CAMPOS_NUMERICOS.items()}
+        self._codigos = {campo: array('I') for campo in CAMPOS_CATEGORICOS}
+        self._valores = {campo: [] for campo in CAMPOS_CATEGORICOS}
+        self._indice_valores = {campo: {} for campo in CAMPOS_CATEGORICOS}
+        self._observacoes = []
+        self._ids = []
+        self._por_id = {}  # id_troca -> índice interno
+        # Campos fora do esquema, raros: índice interno -> {campo: valor}
+        self._extras = {}
+        # Índice por instante. Enquanto os registros chegam em ordem
+        # cronológica (o normal), a própria coluna de instantes serve e
+        # _ordem fica None; uma troca fora de ordem (importação de dados
+        # antigos) cria a permutação ordenada. Trocas que chegam depois do
+        # fim dela entram no fim; as fora de ordem esperam em _pendentes e
+        # são intercaladas de uma vez, como uma sequência ordenada, na
+        # próxima leitura do índice (_juntar_pendentes).
+        self._ordem = None
+        self._ordem_instantes = None
+        self._pendentes = []
+        self._lock = threading.Lock()
+
+        for registro in registros:
+            self.anexar(registro)
+
+    def anexar(self, registro):
+        """Acrescenta um registro (passa a ser o mais recente)
+
+        Tudo é convertido antes de mexer nas colunas: um registro inválido
+        (campo faltando, número fora do tipo) levanta a exceção sem deixar
+        uma coluna maior que as outras.
+        """
+        instantes = array('q', (instante_do_registro(registro),))
+        instante = instantes[0]
+        numeros = {campo: array(tipo, (registro[campo],))
+                   for campo, tipo in CAMPOS_NUMERICOS.items()}
+        categoricos = {campo: registro[campo] for campo in CAMPOS_CATEGORICOS}
+        id_troca = registro.get("id_troca")
+        hash(id_troca)  # vai para o índice por id: um id inválido falha aqui
+        extras = {k: v for k, v in registro.items() if k not in CAMPOS and k != "data"}
+        with self._lock:
+            # Valor novo fica no dicionário mesmo se outro campo falhar: só não é usado
+            codigos = {campo: self._codificar(campo, valor) for campo, valor in categoricos.items()}
+            indice = len(self._instantes)
+            for campo, coluna in self._numeros.items():
+                coluna.extend(numeros[campo])
+            for campo, coluna in self._codigos.items():
+                coluna.append(codigos[campo])
+            self._observacoes.append(registro.get("observacoes") or "")
+            self._ids.append(id_troca)
+            if id_troca:
+                self._por_id[id_troca] = indice
+            if extras:
+                self._extras[indice] = extras
+
+            # O instante por último: len(_instantes) é o que os leitores enxergam
+            self._instantes.extend(instantes)
+            if self._ordem is not None:
+                if instante >= self._ordem_instantes[-1]:
+                    self._ordem.append(indice)
+                    self._ordem_instantes.append(instante)
+                else:
+                    self._pendentes.append(indice)
+            elif indice and instante < self._instantes[indice - 1]:
+                # Até aqui a ordem de chegada já era a de instante
+                self._ordem = array('q', range(indice))
+                self._ordem_instantes = self._instantes[:indice]
+                self._pendentes.append(indice)
+
+    def insert(self, posicao, registro):
+        if posicao != 0:
+            raise ValueError("HistoricoColunar só aceita inserção no topo")
+        self.anexar(registro)
+
+    def instante(self, posicao):
+        """Segundos desde a época do registro na posição dada"""
+        return self._instantes[self._interno(posicao)]
+
+    def buscar_id(self, id_troca):
+        """A troca com esse ``id_troca`` (``LinhaHistorico``), ou None"""
+        indice = self._por_id.get(id_troca)
+        return None if indice is None else LinhaHistorico(self, indice)
+
+    def cronologico(self, inicio=0, fim=None):
+        """Registros em ordem de chegada (índices internos ``inicio`` a ``fim``)"""
+        fim = len(self._instantes) if fim is None else fim
+        for indice in range(inicio, fim):
+            yield LinhaHistorico(self, indice)
+
+    def consultar(self, inicio=None, fim=None, decrescente=True, deslocamento=0,
+                  limite=None, **filtros):
+        """Registros com instante em [inicio, fim), em ordem de instante
+
+        ``inicio`` e ``fim`` são segundos desde a época; ``filtros`` compara
+        campos categóricos (``maquina="301"``, ``motivo=...``; None ignora).
+        O intervalo sai do índice por busca binária e os filtros comparam
+        os códigos inteiros das colunas. ``deslocamento`` pula os primeiros
+        registros que atendem aos filtros e ``limite`` para depois de tantos
+        (paginação). Trocas anexadas durante a consulta ficam de fora.
+        """
+        colunas = []
+        for campo, valor in filtros.items():
+            if valor is None:
+                continue
+            if campo not in self._codigos:
+                raise ValueError(f"campo não filtrável: {campo!r}")
+            codigo = self._indice_valores[campo].get(valor)
+            if codigo is None:
+                return
+            colunas.append((self._codigos[campo], codigo))
+
+        with self._lock:
+            self._juntar_pendentes()
+            total = len(self._instantes)
+            ordenado = self._ordem is None
+            chaves = self._instantes if ordenado else self._ordem_instantes
+            baixo = bisect_left(chaves, inicio) if inicio is not None else 0
+            alto = bisect_left(chaves, fim) if fim is not None else len(chaves)
+            if not colunas:
+                # Sem filtros a página é só aritmética de posição
+                if decrescente:
+                    alto -= deslocamento
+                    if limite is not None:
+                        baixo = max(baixo, alto - limite)
+                else:
+                    baixo += deslocamento
+                    if limite is not None:
+                        alto = min(alto, baixo + limite)
+                deslocamento = 0
+                limite = None
+            if baixo >= alto or limite == 0:
+                return
+            if not ordenado:
+                # As posições mudam com trocas fora de ordem: a consulta segue pelos índices
+                primeiro = self._ordem[alto - 1 if decrescente else baixo]
+                ultimo = self._ordem[baixo if decrescente else alto - 1]
+
+        if ordenado:
+            # A coluna de instantes só cresce: as posições são os índices internos
+            indices = range(alto - 1, baixo - 1, -1) if decrescente else range(baixo, alto)
+        else:
+            indices = self._percorrer_ordem(primeiro, ultimo, decrescente, total)
+        for indice in indices:
+            if colunas and any(coluna[indice] != codigo for coluna, codigo in colunas):
+                continue
+            if deslocamento:
+                deslocamento -= 1
+                continue
+            yield LinhaHistorico(self, indice)
+            if limite is not None:
+                limite -= 1
+                if not limite:
+                    return
+
+    def _percorrer_ordem(self, primeiro, ultimo, decrescente, total):
+        """Índices internos de ``_ordem``, de ``primeiro`` a ``ultimo``, em blocos
+
+        Uma troca fora de ordem anexada durante a consulta desloca as
+        posições; cada bloco é lido com o lock, a partir da posição do
+        índice onde o anterior parou, achada de novo por busca binária.
+        Índices a partir de ``total`` (anexados depois do início) são pulados.
+        """
+        indice, passo = primeiro, 0
+        while True:
+            with self._lock:
+                self._juntar_pendentes()
+                posicao = self._posicao_na_ordem(indice) + passo
+                if decrescente:
+                    bloco = self._ordem[max(posicao - BLOCO_ORDEM + 1, 0):posicao + 1]
+                    bloco.reverse()
+                else:
+                    bloco = self._ordem[posicao:posicao + BLOCO_ORDEM]
+            if not bloco:
+                return
+            for indice in bloco:
+                if indice < total:
+                    yield indice
+                if indice == ultimo:
+                    return
+            passo = -1 if decrescente else 1
+
+    def _juntar_pendentes(self):
+        """Intercala as trocas fora de ordem em ``_ordem`` numa passada (chamar com lock)
+
+        As pendentes são ordenadas entre si e cada uma vai para a posição
+        achada por busca binária; as colunas novas são montadas de fatias
+        das antigas, em O(n + k log n) para k pendentes, e trocadas de uma
+        vez.
+        """
+        if not self._pendentes:
+            return
+        pendentes = sorted(self._pendentes, key=lambda i: (self._instantes[i], i))
+        self._pendentes = []
+        ordem = array('q')
+        ordem_instantes = array('q')
+        anterior = 0
+        for indice in pendentes:
+            posicao = self._posicao_na_ordem(indice)
+            ordem.extend(self._ordem[anterior:posicao])
+            ordem_instantes.extend(self._ordem_instantes[anterior:posicao])
+            ordem.append(indice)
+            ordem_instantes.append(self._instantes[indice])
+            anterior = posicao
+        ordem.extend(self._ordem[anterior:])
+        ordem_instantes.extend(self._ordem_instantes[anterior:])
+        self._ordem, self._ordem_instantes = ordem, ordem_instantes
+
+    def _posicao_na_ordem(self, indice):
+        """Posição de um índice interno em ``_ordem``, ou onde ele entraria (chamar com lock)
+
+        ``_ordem`` está em ordem de instante e, no empate, de chegada
+        (índice crescente): busca binária pelo instante e depois pelo índice.
+        """
+        instante = self._instantes[indice]
+        esquerda = bisect_left(self._ordem_instantes, instante)
+        direita = bisect_right(self._ordem_instantes, instante, esquerda)
+        return bisect_left(self._ordem, indice, esquerda, direita)
+
+    def __len__(self):
+        return len(self._instantes)
+
+    def __bool__(self):
+        return len(self._instantes) > 0
+
+    def __getitem__(self, posicao):
+        if isinstance(posicao, slice):
+            return [LinhaHistorico(self, self._interno(p))
+                    for p in range(*posicao.indices(len(self)))]
+        return LinhaHistorico(self, self._interno(posicao))
+
+    def __iter__(self):
+        for indice in range(len(self._instantes) - 1, -1, -1):
+            yield LinhaHistorico(self, indice)
+
+    def __reversed__(self):
+        return self.cronologico()
+
+    def _interno(self, posicao):
+        n = len(self._instantes)
+        if posicao < 0:
+            posicao += n
+        if not 0 <= posicao < n:
+            raise IndexError("índice fora do histórico")
+        return n - 1 - posicao
+
+    def _valor(self, indice, campo):
+        if campo == "instante":
+            return self._instantes[indice]
+        if campo == "data":
+            return formatar_data(self._instantes[indice])
+        if campo in self._codigos:
+            return self._valores[campo][self._codigos[campo][indice]]
+        if campo in self._numeros:
+            return self._numeros[campo][indice]
+        if campo == "observacoes":
+            return self._observacoes[indice]
+        if campo == "id_troca":
+            return self._ids[indice]
+        return self._extras.get(indice, {})[campo]
+
+    def _codificar(self, campo, valor):
+        indice = self._indice_valores[campo]
+        codigo = indice.get(valor)
+        if codigo is None:
+            codigo = indice[valor] = len(self._valores[campo])
+            self._valores[campo].append(valor)
+        return codigo
+
+
+def ler_data(data):
+    """'17/10/2026 14:30' -> datetime
+
+    O formato é fixo, então as posições são lidas direto; ``strptime`` fica
+    só para textos fora do padrão (e para levantar o ValueError).
+    """
+    if (len(data) == 16 and data[2] == data[5] == '/' and data[10] == ' '
+            and data[13] == ':' and data[0:2].isdigit() and data[3:5].isdigit()
+            and data[6:10].isdigit() and data[11:13].isdigit() and data[14:16].isdigit()):
+        return datetime(int(data[6:10]), int(data[3:5]), int(data[0:2]),
+                        int(data[11:13]), int(data[14:16]))
+    return datetime.strptime(data, FORMATO_DATA)
+
+
+# Trocas em lote (carga, importação) repetem o mesmo minuto muitas vezes
+@lru_cache(maxsize=4096)
+def instante_de_data(data):
+    """'17/10/2026 14:30' -> segundos desde a época (hora local)"""
+    return int(ler_data(data).timestamp())
+
+
+def instante_do_registro(registro):
+    """Segundos desde a época da troca; registros antigos só têm o texto 'data'"""
+    instante = registro.get("instante")
+    if instante is None:
+        return instante_de_data(registro["data"])
+    return int(instante)
+
+
+@lru_cache(maxsize=4096)
+def formatar_data(instante):
+    """Segundos desde a época -> '17/10/2026 14:30' (para exibir)"""
+    return datetime.fromtimestamp(instante).strftime(FORMATO_DATA)
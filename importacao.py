@@ -0,0 +1,338 @@
+"""Importação em lote de trocas exportadas pelo MES (CSV, JSON-lines ou array JSON)
+
+O arquivo é lido em fluxo, em blocos de ``tamanho_lote`` linhas (um array
+JSON, item a item). No CSV o bloco é validado por coluna (``validar_colunas``),
+já com o percentual; se alguma linha do bloco não passa, o bloco é refeito
+linha a linha por ``validar_linha``, que diz o motivo de cada rejeição. As
+trocas válidas do bloco são gravadas numa única transação (``anexar_varios``).
+Só um bloco fica na memória por vez, então o consumo não depende do tamanho
+do arquivo.
+"""
+import csv
+import json
+import os
+from datetime import datetime
+from functools import lru_cache
+from itertools import islice
+from json.decoder import WHITESPACE
+
+from historico import instante_de_data
+
+
+TAMANHO_LOTE = 20000
+TAMANHO_BLOCO = 1024 * 1024  # caracteres lidos por vez de um array JSON
+AMOSTRA_ESTIMATIVA = 64 * 1024  # bytes lidos para estimar o número de linhas
+# Amostra de linhas rejeitadas guardada no resultado; o total é sempre contado
+LIMITE_REJEITADAS = 1000
+
+
+class ResultadoImportacao:
+    """Contadores de uma importação e amostra das linhas rejeitadas"""
+
+    def __init__(self):
+        self.lidas = 0
+        self.importadas = 0
+        self.duplicadas = 0  # já estavam no histórico (mesmo id_troca)
+        self.total_rejeitadas = 0
+        self.rejeitadas = []  # (número da linha, motivo da rejeição)
+
+    def rejeitar(self, numero_linha, motivo):
+        self.total_rejeitadas += 1
+        if len(self.rejeitadas) < LIMITE_REJEITADAS:
+            self.rejeitadas.append((numero_linha, motivo))
+
+    def __repr__(self):
+        return (f"ResultadoImportacao(lidas={self.lidas}, importadas={self.importadas}, "
+                f"rejeitadas={self.total_rejeitadas})")
+
+
+def ler_blocos(caminho, tamanho):
+    """Gera blocos (campos, números das linhas, linhas) de até ``tamanho`` linhas
+
+    O formato vem da extensão. No CSV, ``campos`` é o cabeçalho e cada linha
+    é a lista de valores. Em JSON, ``campos`` é None e cada linha é o dict
+    lido (None se ilegível); um ``.json`` que começa com ``[`` é um array e
+    o número é a posição do item (a partir de 1), sem ``[`` é JSON-lines.
+    """
+    extensao = os.path.splitext(caminho)[1].lower()
+    with open(caminho, "r", encoding="utf-8-sig", newline="") as f:
+        if extensao in (".jsonl", ".ndjson", ".json"):
+            if extensao == ".json" and primeiro_caractere(f) == "[":
+                linhas = ler_array_json(f)
+            else:
+                linhas = ler_json_lines(f)
+            while True:
+                bloco = list(islice(linhas, tamanho))
+                if not bloco:
+                    return
+                numeros, linhas_bloco = zip(*bloco)
+                yield None, numeros, linhas_bloco
+
+        # Exportações do MES usam ';' ou ','; o cabeçalho decide
+        amostra = f.readline()
+        f.seek(0)
+        delimitador = ";" if amostra.count(";") > amostra.count(",") else ","
+        leitor = csv.reader(f, delimiter=delimitador)
+        campos = next(leitor, None)
+        while True:
+            # Números e valores em listas separadas: um objeto a menos por
+            # linha para o coletor de lixo percorrer
+            numeros = []
+            linhas = []
+            antes = leitor.line_num
+            for valores in islice(leitor, tamanho):
+                if valores:
+                    numeros.append(leitor.line_num)
+                    linhas.append(valores)
+            if leitor.line_num == antes:
+                return
+            if linhas:
+                yield campos, numeros, linhas
+
+
+def ler_json_lines(f):
+    """Gera (número da linha, dict) de um arquivo JSON-lines; None se ilegível"""
+    for numero, linha in enumerate(f, start=1):
+        if not linha.strip():
+            continue
+        try:
+            yield numero, json.loads(linha)
+        except ValueError:
+            yield numero, None
+
+
+def primeiro_caractere(f):
+    """Primeiro caractere do arquivo que não é espaço ('' se vazio); volta ao início"""
+    while True:
+        bloco = f.read(4096)
+        if not bloco or bloco.strip():
+            f.seek(0)
+            return bloco.lstrip()[:1]
+
+
+def ler_array_json(f):
+    """Gera (posição, item) de um array JSON, lido em blocos de ``TAMANHO_BLOCO``
+
+    Um item malformado sai como None (linha ilegível) e encerra a leitura:
+    num array não há como achar onde começa o item seguinte.
+    """
+    decodificador = json.JSONDecoder()
+    texto = ""
+    posicao = 0
+    fim_do_arquivo = False
+
+    def proximo_caractere():
+        """Pula os espaços, lendo mais blocos se preciso; '' no fim do arquivo"""
+        nonlocal texto, posicao, fim_do_arquivo
+        while True:
+            posicao = WHITESPACE.match(texto, posicao).end()
+            if posicao < len(texto) or fim_do_arquivo:
+                return texto[posicao:posicao + 1]
+            bloco = f.read(TAMANHO_BLOCO)
+            fim_do_arquivo = not bloco
+            texto, posicao = texto[posicao:] + bloco, 0
+
+    proximo_caractere()
+    posicao += 1  # o '['
+    numero = 0
+    while True:
+        caractere = proximo_caractere()
+        if caractere in ("]", ""):
+            return
+        if numero:
+            if caractere != ",":
+                yield numero + 1, None
+                return
+            posicao += 1
+            proximo_caractere()
+        while True:
+            try:
+                item, posicao = decodificador.raw_decode(texto, posicao)
+                break
+            except ValueError:
+                # Item cortado no fim do bloco: ler mais e tentar de novo
+                bloco = "" if fim_do_arquivo else f.read(TAMANHO_BLOCO)
+                if not bloco:
+                    yield numero + 1, None
+                    return
+                texto, posicao = texto[posicao:] + bloco, 0
+        numero += 1
+        yield numero, item
+
+
+@lru_cache(maxsize=4096)
+def normalizar_data(valor):
+    """Aceita 'dd/mm/aaaa HH:MM' ou ISO 8601 e devolve segundos desde a época"""
+    try:
+        return instante_de_data(valor)
+    except ValueError:
+        return int(datetime.fromisoformat(valor).timestamp())
+
+
+@lru_cache(maxsize=65536)
+def percentual_da_vida(pecas_feitas, vida_esperada):
+    """Percentual da vida usado, com a conta do app (``dominio.calcular_percentual``)
+
+    Em cache: num arquivo grande os pares (peças, vida) se repetem muito, e
+    o ``round`` com casas decimais é caro.
+    """
+    return round(pecas_feitas / vida_esperada * 100, 1) if vida_esperada > 0 else 0.0
+
+
+def validar_linha(linha, vida_padrao):
+    """Converte uma linha do arquivo em registro; levanta ValueError se inválida"""
+    if not isinstance(linha, dict):
+        raise ValueError("linha ilegível")
+
+    ferramenta = (linha.get("ferramenta") or "").strip()
+    if ferramenta not in vida_padrao:
+        raise ValueError(f"ferramenta fora do catálogo: {ferramenta!r}")
+    maquina = str(linha.get("maquina") or "").strip()
+    if not maquina:
+        raise ValueError("máquina vazia")
+
+    # Exportações do próprio app trazem o instante; as do MES, a data em texto
+    try:
+        if linha.get("instante") not in (None, ""):
+            instante = int(linha["instante"])
+        else:
+            instante = normalizar_data(str(linha.get("data")).strip())
+    except (TypeError, ValueError):
+        raise ValueError(f"data inválida: {linha.get('instante') or linha.get('data')!r}")
+
+    try:
+        pecas_feitas = int(linha.get("pecas_feitas"))
+    except (TypeError, ValueError):
+        raise ValueError(f"peças feitas inválidas: {linha.get('pecas_feitas')!r}")
+    if pecas_feitas < 0:
+        raise ValueError("peças feitas negativas")
+
+    # Sem vida esperada no arquivo, vale a vida padrão da ferramenta no catálogo
+    vida_esperada = linha.get("vida_esperada")
+    try:
+        vida_esperada = int(vida_esperada) if vida_esperada not in (None, "") \
+            else int(vida_padrao[ferramenta])
+    except (TypeError, ValueError):
+        raise ValueError(f"vida esperada inválida: {linha.get('vida_esperada')!r}")
+
+    return {
+        "instante": instante,
+        "operador": (linha.get("operador") or "").strip(),
+        "maquina": maquina,
+        "ferramenta": ferramenta,
+        "lote": (linha.get("lote") or "").strip() or "N/A",
+        "pecas_feitas": pecas_feitas,
+        "vida_esperada": vida_esperada,
+        "percentual": percentual_da_vida(pecas_feitas, vida_esperada),
+        "motivo": (linha.get("motivo") or "").strip(),
+        "observacoes": (linha.get("observacoes") or "").strip(),
+        # Exportações do app trazem o id: importar de novo não duplica
+        "id_troca": str(linha.get("id_troca") or "").strip() or None
+    }
+
+
+def validar_colunas(campos, linhas, vida_padrao):
+    """Converte um bloco do CSV coluna a coluna; None se alguma linha não passa
+
+    Dá os mesmos registros que ``validar_linha`` linha a linha, mas cada
+    coluna é convertida de uma vez com ``map``. Não diz qual linha falhou:
+    com None, o bloco é refeito por ``validar_linha``, que dá os motivos.
+    """
+    if set(map(len, linhas)) != {len(campos)}:
+        return None
+    colunas = dict(zip(campos, zip(*linhas)))
+    vazia = ("",) * len(linhas)
+
+    def texto(nome):
+        return list(map(str.strip, colunas.get(nome, vazia)))
+
+    def inteiros(nome):
+        valores = colunas[nome]
+        if not all(valores):
+            raise ValueError  # vazios: a linha decide (ex.: vida padrão, data)
+        return list(map(int, valores))
+
+    try:
+        ferramentas = texto("ferramenta")
+        maquinas = texto("maquina")
+        if not set(ferramentas) <= vida_padrao.keys() or not all(maquinas):
+            return None
+        if "instante" in colunas:
+            instantes = inteiros("instante")
+        else:
+            instantes = list(map(normalizar_data, texto("data") if "data" in colunas else ()))
+            if len(instantes) != len(linhas):
+                return None
+        pecas_feitas = inteiros("pecas_feitas")
+        if min(pecas_feitas) < 0:
+            return None
+        if "vida_esperada" in colunas:
+            vidas = inteiros("vida_esperada")
+        else:
+            vidas = list(map(int, map(vida_padrao.__getitem__, ferramentas)))
+    except (KeyError, TypeError, ValueError):
+        return None
+
+    percentuais = map(percentual_da_vida, pecas_feitas, vidas)
+    lotes = [lote or "N/A" for lote in texto("lote")]
+    ids = [id_troca or None for id_troca in texto("id_troca")]
+    return [{"instante": instante, "operador": operador, "maquina": maquina,
+             "ferramenta": ferramenta, "lote": lote, "pecas_feitas": pecas,
+             "vida_esperada": vida, "percentual": percentual, "motivo": motivo,
+             "observacoes": observacoes, "id_troca": id_troca}
+            for (instante, operador, maquina, ferramenta, lote, pecas, vida, percentual,
+                 motivo, observacoes, id_troca)
+            in zip(instantes, texto("operador"), maquinas, ferramentas, lotes, pecas_feitas,
+                   vidas, percentuais, texto("motivo"), texto("observacoes"), ids)]
+
+
+def importar_trocas(armazenamento, caminho, vida_padrao, tamanho_lote=TAMANHO_LOTE,
+                    ao_progresso=None):
+    """Importa as trocas do arquivo para o armazenamento
+
+    As linhas devem estar em ordem cronológica (como o MES exporta).
+    ``ao_progresso(resultado)`` é chamado depois de cada bloco de
+    ``tamanho_lote`` linhas lido e gravado. Retorna um ``ResultadoImportacao``.
+    """
+    resultado = ResultadoImportacao()
+    armazenamento.preparar_carga(estimar_linhas(caminho))
+    try:
+        for campos, numeros, linhas in ler_blocos(caminho, tamanho_lote):
+            resultado.lidas += len(linhas)
+            lote = validar_colunas(campos, linhas, vida_padrao) if campos else None
+            if lote is None:
+                lote = []
+                for numero, linha in zip(numeros, linhas):
+                    if campos:
+                        # Como o DictReader: coluna que falta fica de fora (get -> None)
+                        linha = dict(zip(campos, linha))
+                    try:
+                        lote.append(validar_linha(linha, vida_padrao))
+                    except ValueError as e:
+                        resultado.rejeitar(numero, str(e))
+            if lote:
+                gravadas = armazenamento.anexar_varios(lote)
+                resultado.importadas += gravadas
+                resultado.duplicadas += len(lote) - gravadas
+            if ao_progresso:
+                ao_progresso(resultado)
+    finally:
+        armazenamento.compactar()  # uma vez, no fim da carga (mesmo se falhar)
+    return resultado
+
+
+def estimar_linhas(caminho):
+    """Número aproximado de linhas do arquivo, pela amostra do começo"""
+    with open(caminho, "rb") as f:
+        amostra = f.read(AMOSTRA_ESTIMATIVA)
+    if not amostra:
+        return 0
+    return os.path.getsize(caminho) * amostra.count(b"\n") // len(amostra)
+
+
+def gravar_rejeitadas(resultado, caminho):
+    """Salva a amostra de linhas rejeitadas em CSV (linha;motivo)"""
+    with open(caminho, "w", encoding="utf-8", newline="") as f:
+        escritor = csv.writer(f, delimiter=";")
+        escritor.writerow(["linha", "motivo"])
+        escritor.writerows(resultado.rejeitadas)
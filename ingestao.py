@@ -0,0 +1,401 @@
+"""Central de trocas: vários terminais gravando num histórico só
+
+Cada terminal grava o seu histórico local. Para juntar as trocas de todas
+as estações, um servidor central (``python cli.py servir``) recebe os
+registros por HTTP:
+
+    POST /trocas    corpo em JSON-lines (um registro por linha) ou lista JSON
+    GET  /saude     contadores do servidor
+
+Os registros têm o formato de ``dominio.montar_registro``. O ``id_troca``
+é obrigatório e funciona como chave de idempotência: o armazenamento
+ignora trocas já gravadas, então o terminal pode reenviar à vontade depois
+de uma falha de rede.
+
+Escrita em grupo: as requisições entram numa fila e uma única tarefa grava
+tudo o que se acumulou numa chamada a ``anexar_varios`` (uma transação, um
+fsync). Enquanto um grupo é gravado, o próximo vai se formando; a resposta
+só sai depois que o registro está no disco.
+
+No terminal, ``TOOLLIFE_CENTRAL`` (ex.: ``http://10.0.0.5:8470``) liga o
+``ClienteIngestao``: cada troca salva também entra numa fila em disco
+(``dominio.ARQUIVO_FILA_CENTRAL``) e uma thread a envia em lotes. Sem rede,
+a fila espera e é reenviada com intervalos crescentes, inclusive depois de
+reiniciar o app.
+"""
+import asyncio
+import json
+import os
+import shutil
+import threading
+import time
+from urllib import error, request
+
+import dominio
+from historico import CAMPOS
+from servico import ServicoAsyncio
+
+
+OBRIGATORIOS = ("id_troca", "instante", "operador", "maquina", "ferramenta",
+                "pecas_feitas", "vida_esperada", "motivo")
+TAMANHO_MAXIMO_ID = 64
+TAMANHO_MAXIMO_CORPO = 8 * 1024 * 1024
+
+# Registros por grupo gravado no servidor e por envio do cliente
+TAMANHO_GRUPO = 5000
+TAMANHO_ENVIO = 500
+
+ESPERA_MINIMA, ESPERA_MAXIMA = 1.0, 60.0
+
+# Bytes já enviados no começo da fila do cliente antes de regravá-la
+LIMITE_COMPACTACAO_FILA = 1024 * 1024
+
+STATUS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+          411: "Length Required", 413: "Payload Too Large", 503: "Service Unavailable"}
+
+
+def validar_registro(registro):
+    """Registro recebido -> registro no formato do histórico; ``ValueError`` se inválido"""
+    if not isinstance(registro, dict):
+        raise ValueError("registro deve ser um objeto JSON")
+    faltando = [c for c in OBRIGATORIOS if registro.get(c) in (None, "")]
+    if faltando:
+        raise ValueError(f"campos faltando: {', '.join(faltando)}")
+    id_troca = str(registro["id_troca"])
+    if len(id_troca) > TAMANHO_MAXIMO_ID:
+        raise ValueError(f"id_troca com mais de {TAMANHO_MAXIMO_ID} caracteres")
+    try:
+        pecas_feitas = int(registro["pecas_feitas"])
+        vida_esperada = int(registro["vida_esperada"])
+        instante = int(registro["instante"])
+        percentual = registro.get("percentual")
+        percentual = round(dominio.calcular_percentual(pecas_feitas, vida_esperada), 1) \
+            if percentual is None else float(percentual)
+    except (TypeError, ValueError):
+        raise ValueError(f"número inválido na troca {id_troca}")
+    if pecas_feitas < 0:
+        raise ValueError(f"peças feitas negativas na troca {id_troca}")
+
+    convertido = {campo: registro.get(campo) for campo in CAMPOS}
+    for campo in ("operador", "maquina", "ferramenta", "motivo"):
+        convertido[campo] = str(registro[campo])
+    convertido.update(
+        instante=instante, pecas_feitas=pecas_feitas, vida_esperada=vida_esperada,
+        percentual=percentual, id_troca=id_troca,
+        lote=str(registro.get("lote") or "N/A"),
+        observacoes=str(registro.get("observacoes") or ""))
+    return convertido
+
+
+def ler_corpo(corpo):
+    """Lista de registros de um corpo em lista JSON ou JSON-lines"""
+    texto = corpo.decode("utf-8").strip()
+    if texto.startswith("["):
+        registros = json.loads(texto)
+    else:
+        registros = [json.loads(linha) for linha in texto.splitlines() if linha.strip()]
+    return [validar_registro(r) for r in registros]
+
+
+class ServidorIngestao(ServicoAsyncio):
+    """Servidor HTTP (asyncio) que grava as trocas recebidas em grupos
+
+    ``gravar(registros)`` persiste uma lista e retorna quantos eram novos,
+    como ``Armazenamento.anexar_varios``; roda fora do laço, uma chamada
+    por vez.
+    """
+
+    nome_thread = "ingestao"
+
+    def __init__(self, gravar, host="0.0.0.0", porta=0, tamanho_grupo=TAMANHO_GRUPO):
+        super().__init__(host, porta)
+        self.gravar = gravar
+        self.tamanho_grupo = tamanho_grupo
+        self.recebidos = 0
+        self.gravados = 0
+        self.grupos = 0
+        self._fila = None
+        self._gravador = None
+
+    async def _ao_iniciar(self):
+        self._fila = asyncio.Queue()
+        self._gravador = asyncio.create_task(self._gravar_grupos())
+
+    async def _ao_parar(self):
+        await self._fila.join()
+        self._gravador.cancel()
+
+    async def _gravar_grupos(self):
+        """Grava de uma vez tudo o que chegou enquanto o grupo anterior era gravado"""
+        loop = asyncio.get_running_loop()
+        while True:
+            pedidos = [await self._fila.get()]
+            quantidade = len(pedidos[0][0])
+            while quantidade < self.tamanho_grupo and not self._fila.empty():
+                pedido = self._fila.get_nowait()
+                pedidos.append(pedido)
+                quantidade += len(pedido[0])
+
+            registros = [r for lote, _ in pedidos for r in lote]
+            try:
+                gravados = await loop.run_in_executor(None, self.gravar, registros)
+                erro = None
+            except Exception as e:
+                print(f"Erro ao gravar trocas recebidas: {e}")
+                erro = e
+            else:
+                self.recebidos += len(registros)
+                self.gravados += gravados
+                self.grupos += 1
+            for _, futuro in pedidos:
+                if not futuro.cancelled():
+                    if erro is None:
+                        futuro.set_result(None)
+                    else:
+                        futuro.set_exception(erro)
+                self._fila.task_done()
+
+    async def _conexao(self, leitor, escritor):
+        try:
+            while True:
+                linha = await leitor.readline()
+                if not linha:
+                    break
+                try:
+                    metodo, caminho, versao = linha.decode("latin-1").split()
+                except ValueError:
+                    await self._responder(escritor, 400, {"erro": "requisição inválida"}, False)
+                    break
+                cabecalhos = {}
+                while True:
+                    linha = await leitor.readline()
+                    if linha in (b"\r\n", b"\n", b""):
+                        break
+                    nome, _, valor = linha.decode("latin-1").partition(":")
+                    cabecalhos[nome.strip().lower()] = valor.strip()
+
+                manter = (versao == "HTTP/1.1"
+                          and cabecalhos.get("connection", "").lower() != "close")
+                if "transfer-encoding" in cabecalhos:
+                    await self._responder(escritor, 411, {"erro": "envie Content-Length"}, False)
+                    break
+                tamanho = int(cabecalhos.get("content-length") or 0)
+                if tamanho > TAMANHO_MAXIMO_CORPO:
+                    await self._responder(escritor, 413, {"erro": "corpo grande demais"}, False)
+                    break
+                corpo = await leitor.readexactly(tamanho) if tamanho else b""
+
+                status, resposta = await self._tratar(metodo, caminho, corpo)
+                await self._responder(escritor, status, resposta, manter)
+                if not manter:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            escritor.close()
+
+    async def _tratar(self, metodo, caminho, corpo):
+        if caminho == "/saude":
+            return 200, {"recebidos": self.recebidos, "gravados": self.gravados,
+                         "grupos": self.grupos}
+        if caminho != "/trocas":
+            return 404, {"erro": "caminho desconhecido"}
+        if metodo != "POST":
+            return 405, {"erro": "use POST"}
+        try:
+            registros = ler_corpo(corpo)
+        except ValueError as e:
+            return 400, {"erro": str(e)}
+        if registros:
+            futuro = asyncio.get_running_loop().create_future()
+            self._fila.put_nowait((registros, futuro))
+            try:
+                await futuro
+            except Exception as e:
+                return 503, {"erro": f"falha ao gravar: {e}"}
+        return 200, {"recebidos": len(registros)}
+
+    async def _responder(self, escritor, status, resposta, manter):
+        corpo = json.dumps(resposta, ensure_ascii=False).encode("utf-8")
+        cabecalho = (f"HTTP/1.1 {status} {STATUS[status]}\r\n"
+                     "Content-Type: application/json; charset=utf-8\r\n"
+                     f"Content-Length: {len(corpo)}\r\n"
+                     f"Connection: {'keep-alive' if manter else 'close'}\r\n\r\n")
+        escritor.write(cabecalho.encode("latin-1") + corpo)
+        await escritor.drain()
+
+
+class ClienteIngestao:
+    """Envia as trocas do terminal para a central, com fila em disco para ficar offline
+
+    A fila só cresce no fim: as trocas aceitas pela central não são apagadas,
+    o arquivo ``.cursor`` guarda até onde (em bytes) já foi enviado. Quando a
+    parte enviada passa de ``LIMITE_COMPACTACAO_FILA`` e da metade do arquivo,
+    a fila é regravada só com o resto. O cursor vai a zero antes da troca do
+    arquivo: uma queda no meio só reenvia trocas, e a central ignora repetidas.
+
+    Se a central recusa um lote (400), ele é dividido ao meio até isolar as
+    trocas recusadas; só elas vão para ``.recusadas``.
+    """
+
+    def __init__(self, url, arquivo_fila, tamanho_envio=TAMANHO_ENVIO):
+        self.url = url.rstrip("/") + "/trocas"
+        self.arquivo_fila = arquivo_fila
+        self.arquivo_cursor = arquivo_fila + ".cursor"
+        self.tamanho_envio = tamanho_envio
+        self.pendentes = []
+        self._tamanhos = []  # bytes de cada troca pendente no arquivo
+        self._bytes_pendentes = 0
+        self._cursor = 0
+        self._ler_fila()
+        self.enviados = 0
+        self.recusados = 0
+        self._condicao = threading.Condition()
+        self._arquivo = open(arquivo_fila, "ab")
+        threading.Thread(target=self._enviar_sempre, name="ingestao-cliente",
+                         daemon=True).start()
+
+    def _ler_fila(self):
+        if not os.path.exists(self.arquivo_fila):
+            return
+        try:
+            with open(self.arquivo_cursor, "r", encoding="utf-8") as f:
+                self._cursor = int(f.read())
+        except (OSError, ValueError):
+            self._cursor = 0
+        with open(self.arquivo_fila, "rb+") as f:
+            if self._cursor > os.fstat(f.fileno()).st_size:
+                self._cursor = 0
+            f.seek(self._cursor)
+            posicao = self._cursor
+            ilegiveis = 0  # bytes de linhas inválidas, contados com a troca seguinte
+            for linha in f:
+                if not linha.endswith(b"\n"):
+                    f.truncate(posicao)  # última linha truncada por queda
+                    break
+                posicao += len(linha)
+                try:
+                    self.pendentes.append(json.loads(linha))
+                except ValueError:
+                    ilegiveis += len(linha)
+                    continue
+                self._tamanhos.append(ilegiveis + len(linha))
+                ilegiveis = 0
+        if self._tamanhos:
+            self._tamanhos[-1] += ilegiveis
+        else:
+            self._cursor += ilegiveis
+        self._bytes_pendentes = sum(self._tamanhos)
+
+    def enviar(self, registro):
+        """Põe a troca na fila (já gravada em disco) e acorda o envio"""
+        linha = (json.dumps(registro, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._condicao:
+            self._arquivo.write(linha)
+            self._arquivo.flush()
+            os.fsync(self._arquivo.fileno())
+            self.pendentes.append(registro)
+            self._tamanhos.append(len(linha))
+            self._bytes_pendentes += len(linha)
+            self._condicao.notify()
+
+    def _enviar_sempre(self):
+        espera = ESPERA_MINIMA
+        limite = self.tamanho_envio
+        while True:
+            with self._condicao:
+                while not self.pendentes:
+                    self._condicao.wait()
+                lote = self.pendentes[:limite]
+            try:
+                self._postar(lote)
+            except error.HTTPError as e:
+                if e.code != 400:
+                    espera = self._esperar(espera, e)
+                    continue
+                if len(lote) > 1:
+                    # Dividir até achar a troca que a central não aceita
+                    limite = (len(lote) + 1) // 2
+                    continue
+                print(f"Erro: central recusou a troca {lote[0].get('id_troca')}: "
+                      f"{e.read()[:200]!r}")
+                self._guardar_recusadas(lote)
+                self.recusados += 1
+            except (OSError, ValueError) as e:
+                espera = self._esperar(espera, e)
+                continue
+            else:
+                self.enviados += len(lote)
+            espera = ESPERA_MINIMA
+            limite = min(limite * 2, self.tamanho_envio)
+            self._retirar(len(lote))
+
+    def _postar(self, lote):
+        corpo = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in lote).encode("utf-8")
+        pedido = request.Request(self.url, data=corpo, method="POST",
+                                 headers={"Content-Type": "application/x-ndjson"})
+        with request.urlopen(pedido, timeout=30) as resposta:
+            resposta.read()
+
+    def _esperar(self, espera, motivo):
+        print(f"Central indisponível ({motivo}); {len(self.pendentes)} trocas na fila")
+        time.sleep(espera)
+        return min(espera * 2, ESPERA_MAXIMA)
+
+    def _retirar(self, quantidade):
+        """Avança o cursor da fila além das trocas já entregues (ou recusadas)"""
+        with self._condicao:
+            retirados = sum(self._tamanhos[:quantidade])
+            self._cursor += retirados
+            self._bytes_pendentes -= retirados
+            del self.pendentes[:quantidade]
+            del self._tamanhos[:quantidade]
+            self._gravar_cursor(self._cursor)
+            # Regravar só quando a parte enviada já é metade do arquivo: cada
+            # byte é copiado poucas vezes, não a cada lote
+            if (self._cursor >= LIMITE_COMPACTACAO_FILA
+                    and self._cursor >= self._bytes_pendentes):
+                self._compactar()
+
+    def _compactar(self):
+        """Regrava a fila só com as pendentes (chamar com a condição)"""
+        self._gravar_cursor(0)  # queda daqui até o replace: reenvia, não perde
+        temporario = self.arquivo_fila + ".tmp"
+        with open(self.arquivo_fila, "rb") as origem, open(temporario, "wb") as destino:
+            origem.seek(self._cursor)
+            shutil.copyfileobj(origem, destino)
+            destino.flush()
+            os.fsync(destino.fileno())
+        self._arquivo.close()
+        os.replace(temporario, self.arquivo_fila)
+        self._arquivo = open(self.arquivo_fila, "ab")
+        self._cursor = 0
+
+    def _gravar_cursor(self, cursor):
+        temporario = self.arquivo_cursor + ".tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            f.write(str(cursor))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporario, self.arquivo_cursor)
+
+    def _guardar_recusadas(self, lote):
+        with open(self.arquivo_fila + ".recusadas", "a", encoding="utf-8") as f:
+            for registro in lote:
+                f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+
+
+_cliente = None
+_lock_cliente = threading.Lock()
+
+
+def obter_cliente_ingestao():
+    """Cliente da central do processo, ou None se TOOLLIFE_CENTRAL não estiver definida"""
+    global _cliente
+    url = os.environ.get("TOOLLIFE_CENTRAL")
+    if not url:
+        return None
+    with _lock_cliente:
+        if _cliente is None:
+            _cliente = ClienteIngestao(url, dominio.ARQUIVO_FILA_CENTRAL)
+        return _cliente
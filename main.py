@@ -1,27 +1,100 @@
 import flet as ft
+import functools
 import os
+import queue
+import threading
+from contextlib import contextmanager
 from datetime import datetime
-from fpdf import FPDF
-import json
+import dominio
+from historico import formatar_data
+from metricas import HANDLERS_APP, obter_metricas
+from repositorio import obter_repositorio
+from seletor import SeletorBusca
+
+class AtualizacoesAgrupadas:
+    """Junta os ``page.update()`` de um handler num único envio ao cliente
+
+    Dentro de um lote (``with lote()``, que pode ser aninhado) ``atualizar``
+    só marca a página como pendente; o envio acontece uma vez, quando o
+    lote mais externo termina. Fora de lote, ``atualizar`` envia na hora.
+    A profundidade é por thread: o Flet roda cada handler numa thread e a
+    fila de relatórios chama de volta pelas threads dela.
+    """
+    
+    def __init__(self, page):
+        self.page = page
+        self._local = threading.local()
+    
+    def atualizar(self):
+        if getattr(self._local, "profundidade", 0):
+            self._local.pendente = True
+        else:
+            self.page.update()
+    
+    @contextmanager
+    def lote(self):
+        self._local.profundidade = getattr(self._local, "profundidade", 0) + 1
+        try:
+            yield
+        finally:
+            self._local.profundidade -= 1
+            if self._local.profundidade == 0 and getattr(self._local, "pendente", False):
+                self._local.pendente = False
+                self.page.update()
+
+
+def em_lote(handler):
+    """Handler cujas atualizações de página (inclusive aninhadas) saem num envio só"""
+    @functools.wraps(handler)
+    def agrupado(self, *args, **kwargs):
+        with self.atualizacoes.lote():
+            return handler(self, *args, **kwargs)
+    return agrupado
+
 
 class ToolLifePro:
     """Aplicação principal de controle de vida útil de ferramentas"""
     
     def __init__(self, page: ft.Page):
         self.page = page
+        self.atualizacoes = AtualizacoesAgrupadas(page)
         self.configurar_pagina()
         
         # Arquivos de dados
-        self.ARQUIVO_DADOS = "ferramental.json"
-        self.ARQUIVO_HISTORICO = "historico_trocas.json"
-        
-        # Carregar dados
-        self.dados = self.carregar_dados()
-        self.historico = self.carregar_historico()
+        self.ARQUIVO_DADOS = dominio.ARQUIVO_DADOS
+        self.ARQUIVO_HISTORICO = dominio.ARQUIVO_HISTORICO
+        # Catálogo e histórico são do processo, compartilhados com as outras
+        # sessões (Flet web); as alterações delas chegam por dados_alterados
+        self.repositorio = obter_repositorio(self.ARQUIVO_DADOS, self.ARQUIVO_HISTORICO)
+        self.armazenamento = self.repositorio.armazenamento
+        self.dados = self.repositorio.dados
+        
+        # Peças contadas pelas máquinas (só com TOOLLIFE_CONTAGEM_PORTA definida)
+        # e envio à central (TOOLLIFE_CENTRAL); o asyncio só é importado se ligados
+        self.contador = None
+        self.pecas_contadas = None
+        if os.environ.get("TOOLLIFE_CONTAGEM_PORTA"):
+            from contagem import obter_contador
+            self.contador = obter_contador()
+        self.central = None
+        if os.environ.get("TOOLLIFE_CENTRAL"):
+            from ingestao import obter_cliente_ingestao
+            self.central = obter_cliente_ingestao()
+        
+        # Latência dos handlers (só com TOOLLIFE_METRICAS definida)
+        metricas = obter_metricas()
+        if metricas:
+            metricas.instrumentar(self, "handler", HANDLERS_APP)
+        
+        # Fila de PDFs só é criada no primeiro relatório
+        self._fila_relatorios = None
         
         # Inicializar componentes
         self.criar_componentes()
         self.construir_interface()
+        
+        self.repositorio.inscrever(self.dados_alterados)
+        page.on_close = lambda e: self.repositorio.cancelar(self.dados_alterados)
     
     def configurar_pagina(self):
         """Configura as propriedades da página"""
@@ -32,60 +105,35 @@ class ToolLifePro:
         self.page.scroll = "adaptive"
         self.page.padding = 20
     
-    def carregar_dados(self):
-        """Carrega dados do arquivo JSON"""
-        if os.path.exists(self.ARQUIVO_DADOS):
-            try:
-                with open(self.ARQUIVO_DADOS, "r", encoding="utf-8") as f:
-                    return json.load(f)
-            except:
-                pass
-        
-        # Dados padrão
-        return {
-            "maquinas": ["301", "302", "303", "304", "305", "306", "307"],
-            "ferramentas": ["Broca Ø6mm", "Broca Ø8mm", "Macho M6", "Macho M8", 
-                           "Inserto CNMG", "Inserto DNMG", "Bedame 12mm", "Fresa Ø16mm"],
-            "vida_padrao": {
-                "Broca Ø6mm": 1500,
-                "Broca Ø8mm": 1200,
-                "Macho M6": 800,
-                "Macho M8": 600,
-                "Inserto CNMG": 2000,
-                "Inserto DNMG": 1800,
-                "Bedame 12mm": 1000,
-                "Fresa Ø16mm": 900
-            }
-        }
+    @property
+    def historico(self):
+        """Histórico de trocas do processo, carregado na primeira consulta ou gravação"""
+        return self.repositorio.historico
     
-    def salvar_dados(self):
-        """Salva dados no arquivo JSON"""
-        try:
-            with open(self.ARQUIVO_DADOS, "w", encoding="utf-8") as f:
-                json.dump(self.dados, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"Erro ao salvar dados: {e}")
+    @property
+    def fila_relatorios(self):
+        """Fila de PDFs (gerados fora da thread do handler); importa o FPDF no primeiro relatório"""
+        if self._fila_relatorios is None:
+            from relatorios import obter_fila_relatorios
+            self._fila_relatorios = obter_fila_relatorios()
+        return self._fila_relatorios
     
-    def carregar_historico(self):
-        """Carrega histórico de trocas"""
-        if os.path.exists(self.ARQUIVO_HISTORICO):
-            try:
-                with open(self.ARQUIVO_HISTORICO, "r", encoding="utf-8") as f:
-                    return json.load(f)
-            except:
-                pass
-        return []
-    
-    def salvar_historico(self):
-        """Salva histórico de trocas"""
+    def salvar_historico(self, registro):
+        """Grava uma nova troca no histórico"""
         try:
-            with open(self.ARQUIVO_HISTORICO, "w", encoding="utf-8") as f:
-                json.dump(self.historico, f, ensure_ascii=False, indent=2)
+            self.repositorio.registrar_troca(registro)
         except Exception as e:
             print(f"Erro ao salvar histórico: {e}")
+        
+        # Cópia para a central; sem rede, fica na fila em disco
+        if self.central:
+            try:
+                self.central.enviar(registro)
+            except Exception as e:
+                print(f"Erro ao enfileirar troca para a central: {e}")
     
     def criar_componentes(self):
-        """Cria todos os componentes da interface"""
+        """Cria os componentes do cabeçalho; as abas são criadas sob demanda"""
         
         # === CABEÇALHO ===
         self.txt_operador = ft.TextField(
@@ -100,18 +148,37 @@ class ToolLifePro:
             hint_text="Ex: OP-2024-001"
         )
         
-        self.sel_maq = ft.Dropdown(
-            label="🏭 Máquina",
-            options=[ft.dropdown.Option(m) for m in self.dados["maquinas"]],
-            border_radius=10
+        # Seletores com busca: o catálogo pode ter milhares de itens
+        self.sel_maq = SeletorBusca(
+            "🏭 Máquina",
+            lambda: self.repositorio.indice("maquinas"),
+            self.cabecalho_alterado,
+            self.atualizacoes,
+            hint_text="Ex: 304"
         )
         
-        self.sel_fer = ft.Dropdown(
-            label="🔧 Ferramenta",
-            options=[ft.dropdown.Option(f) for f in self.dados["ferramentas"]],
-            border_radius=10
+        self.sel_fer = SeletorBusca(
+            "🔧 Ferramenta",
+            lambda: self.repositorio.indice("ferramentas"),
+            self.cabecalho_alterado,
+            self.atualizacoes,
+            hint_text="Ex: Broca Ø8mm"
         )
         
+        # === ABAS ===
+        # Cada aba é construída na primeira visita (ver abrir_aba)
+        self.construtores_abas = {
+            "CALC": self.criar_aba_calc,
+            "TROCA": self.criar_aba_troca,
+            "HISTORICO": self.criar_aba_historico,
+            "CONFIG": self.criar_aba_config,
+        }
+        self.abas = {}
+        self.versao_listas = 0  # do catálogo, quando as listas da config foram montadas
+        self.area_abas = ft.Column(spacing=0)
+    
+    def criar_aba_calc(self):
+        """Cria os controles da calculadora"""
         # === ABA 1: CALCULADORA UNIVERSAL ===
         self.in_num1 = ft.TextField(
             label="Primeiro Número",
@@ -163,6 +230,22 @@ class ToolLifePro:
             on_click=self.limpar_calculadora
         )
         
+        return ft.Column([
+            ft.Container(
+                content=ft.Text("🧮 Calculadora", 
+                               size=20, weight=ft.FontWeight.BOLD, color="blue300"),
+                padding=ft.padding.only(bottom=10)
+            ),
+            self.in_num1,
+            self.sel_operacao,
+            self.in_num2,
+            self.btn_calcular,
+            self.res_calc,
+            self.btn_limpar_calc
+        ], visible=False)
+    
+    def criar_aba_troca(self):
+        """Cria os controles do registro de troca"""
         # === ABA 2: REGISTRO DE TROCA ===
         self.in_pecas_feitas = ft.TextField(
             label="Quantas Peças Você Fez com Esta Ferramenta?",
@@ -171,6 +254,8 @@ class ToolLifePro:
             hint_text="Ex: 1250"
         )
         
+        self.txt_contagem = ft.Text("", size=13, color="grey400", visible=False)
+        
         self.txt_vida_esperada = ft.TextField(
             label="Vida Esperada (peças)",
             border_radius=10,
@@ -230,11 +315,45 @@ class ToolLifePro:
         
         self.status_pdf = ft.Text("", color="green400", weight=ft.FontWeight.BOLD, size=14)
         
+        return ft.Column([
+            ft.Container(
+                content=ft.Text("🔧 Registro de Troca", 
+                               size=20, weight=ft.FontWeight.BOLD, color="orange300"),
+                padding=ft.padding.only(bottom=10)
+            ),
+            self.in_pecas_feitas,
+            self.txt_contagem,
+            self.txt_vida_esperada,
+            self.motivo,
+            self.txt_obs,
+            self.btn_gerar_pdf,
+            self.res_vida,
+            self.status_pdf,
+            self.btn_limpar_troca
+        ], visible=False)
+    
+    def criar_aba_historico(self):
+        """Cria os controles do histórico"""
         # === ABA 3: HISTÓRICO ===
+        # Página de histórico renderizada por vez; mais páginas ao rolar
+        self.TAMANHO_PAGINA_HISTORICO = 30
+        self.historico_exibidos = 0
+        self.carregando_historico = False
+        self.cards_historico = []
+        self.inicio_historico = None
+        
         self.lista_historico = ft.ListView(
             spacing=10,
             padding=10,
-            height=600
+            height=600,
+            on_scroll=self.rolar_historico,
+            on_scroll_interval=100
+        )
+        
+        self.txt_historico_vazio = ft.Container(
+            content=ft.Text("Nenhuma troca registrada ainda.", 
+                           color="grey", italic=True),
+            padding=20
         )
         
         self.btn_atualizar_historico = ft.ElevatedButton(
@@ -244,6 +363,44 @@ class ToolLifePro:
             color="white"
         )
         
+        # O período filtra a lista e o relatório consolidado
+        self.sel_periodo_relatorio = ft.Dropdown(
+            label="Período",
+            options=[
+                ft.dropdown.Option("Último Turno (8h)"),
+                ft.dropdown.Option("Últimos 7 Dias"),
+                ft.dropdown.Option("Últimos 30 Dias"),
+                ft.dropdown.Option("Todo o Histórico")
+            ],
+            value="Último Turno (8h)",
+            border_radius=10,
+            expand=True,
+            on_change=self.atualizar_historico
+        )
+        
+        self.btn_relatorio_consolidado = ft.ElevatedButton(
+            "📑 Relatório do Período",
+            on_click=self.gerar_relatorio_consolidado,
+            bgcolor="purple700",
+            color="white"
+        )
+        
+        self.status_consolidado = ft.Text("", color="green400", weight=ft.FontWeight.BOLD, size=14)
+        
+        return ft.Column([
+            ft.Container(
+                content=ft.Text("📜 Histórico de Trocas", 
+                               size=20, weight=ft.FontWeight.BOLD, color="purple300"),
+                padding=ft.padding.only(bottom=10)
+            ),
+            self.btn_atualizar_historico,
+            ft.Row([self.sel_periodo_relatorio, self.btn_relatorio_consolidado], spacing=10),
+            self.status_consolidado,
+            self.lista_historico
+        ], visible=False)
+    
+    def criar_aba_config(self):
+        """Cria os controles de configuração"""
         # === ABA 4: CONFIGURAÇÃO ===
         self.txt_novo_item = ft.TextField(
             label="Nome do Novo Item",
@@ -261,50 +418,10 @@ class ToolLifePro:
         self.lista_maquinas = ft.ListView(spacing=5, height=200)
         self.lista_ferramentas = ft.ListView(spacing=5, height=200)
         
-        self.atualizar_listas_config()
-        
-        # === NAVEGAÇÃO ===
-        self.layout_calc = ft.Column([
-            ft.Container(
-                content=ft.Text("🧮 Calculadora", 
-                               size=20, weight=ft.FontWeight.BOLD, color="blue300"),
-                padding=ft.padding.only(bottom=10)
-            ),
-            self.in_num1,
-            self.sel_operacao,
-            self.in_num2,
-            self.btn_calcular,
-            self.res_calc,
-            self.btn_limpar_calc
-        ], visible=True)
-        
-        self.layout_troca = ft.Column([
-            ft.Container(
-                content=ft.Text("🔧 Registro de Troca", 
-                               size=20, weight=ft.FontWeight.BOLD, color="orange300"),
-                padding=ft.padding.only(bottom=10)
-            ),
-            self.in_pecas_feitas,
-            self.txt_vida_esperada,
-            self.motivo,
-            self.txt_obs,
-            self.btn_gerar_pdf,
-            self.res_vida,
-            self.status_pdf,
-            self.btn_limpar_troca
-        ], visible=False)
+        # O catálogo é gravado em segundo plano; o texto diz se já está no disco
+        self.txt_catalogo_salvo = ft.Text("", size=12, color="grey")
         
-        self.layout_historico = ft.Column([
-            ft.Container(
-                content=ft.Text("📜 Histórico de Trocas", 
-                               size=20, weight=ft.FontWeight.BOLD, color="purple300"),
-                padding=ft.padding.only(bottom=10)
-            ),
-            self.btn_atualizar_historico,
-            self.lista_historico
-        ], visible=False)
-        
-        self.layout_config = ft.Column([
+        return ft.Column([
             ft.Container(
                 content=ft.Text("⚙️ Configurações", 
                                size=20, weight=ft.FontWeight.BOLD, color="green300"),
@@ -329,6 +446,7 @@ class ToolLifePro:
                     expand=True
                 )
             ]),
+            self.txt_catalogo_salvo,
             ft.Divider(height=20),
             ft.Text("Máquinas:", weight=ft.FontWeight.BOLD),
             self.lista_maquinas,
@@ -357,7 +475,8 @@ class ToolLifePro:
         # Campos de cabeçalho
         campos_cabecalho = ft.Column([
             ft.Row([self.txt_operador, self.txt_lote], spacing=10),
-            ft.Row([self.sel_maq, self.sel_fer], spacing=10)
+            ft.Row([self.sel_maq.controle, self.sel_fer.controle], spacing=10,
+                   vertical_alignment=ft.CrossAxisAlignment.START)
         ])
         
         # Botões de navegação
@@ -400,6 +519,10 @@ class ToolLifePro:
             )
         ], spacing=5)
         
+        # A aba inicial é montada antes do add: o add envia a página ao
+        # cliente e nada mais a atualiza até o primeiro handler
+        self.abrir_aba("CALC")
+        
         # Adicionar tudo à página
         self.page.add(
             header,
@@ -408,18 +531,29 @@ class ToolLifePro:
             ft.Divider(height=20),
             nav_buttons,
             ft.Divider(height=20),
-            self.layout_calc,
-            self.layout_troca,
-            self.layout_historico,
-            self.layout_config
+            self.area_abas
         )
     
+    def abrir_aba(self, nome):
+        """Mostra a aba, construindo seus controles na primeira visita"""
+        if nome not in self.abas:
+            # Com o lock, nenhuma alteração do catálogo entra com as listas pela
+            # metade; as que ainda estão na fila de avisos já vêm nas listas
+            with self.repositorio.lock:
+                if nome == "CONFIG":
+                    self.versao_listas = self.repositorio.versao
+                self.abas[nome] = self.construtores_abas[nome]()
+                self.area_abas.controls.append(self.abas[nome])
+                if nome == "CONFIG":
+                    self.atualizar_listas_config()
+                    self.atualizar_estado_catalogo()
+        for chave, layout in self.abas.items():
+            layout.visible = (chave == nome)
+    
+    @em_lote
     def navegar(self, e):
         """Navega entre as abas"""
-        self.layout_calc.visible = (e.control.data == "CALC")
-        self.layout_troca.visible = (e.control.data == "TROCA")
-        self.layout_historico.visible = (e.control.data == "HISTORICO")
-        self.layout_config.visible = (e.control.data == "CONFIG")
+        self.abrir_aba(e.control.data)
         
         # Atualizar vida esperada ao abrir aba de troca
         if e.control.data == "TROCA":
@@ -428,7 +562,7 @@ class ToolLifePro:
         if e.control.data == "HISTORICO":
             self.atualizar_historico(None)
         
-        self.page.update()
+        self.atualizacoes.atualizar()
     
     def validar_campos_cabecalho(self):
         """Valida se os campos do cabeçalho estão preenchidos"""
@@ -447,6 +581,7 @@ class ToolLifePro:
             return False
         return True
     
+    @em_lote
     def calcular(self, e):
         """Calcula usando a operação selecionada"""
         try:
@@ -477,11 +612,12 @@ class ToolLifePro:
             self.res_calc.content.controls[0].value = operacao_texto
             self.res_calc.content.controls[1].value = f"{resultado:.2f}"
             self.res_calc.bgcolor = "green900"
-            self.page.update()
+            self.atualizacoes.atualizar()
             
         except ValueError:
             self.mostrar_alerta("Erro", "Digite apenas números!")
     
+    @em_lote
     def limpar_calculadora(self, e):
         """Limpa os campos da calculadora"""
         self.in_num1.value = ""
@@ -490,7 +626,14 @@ class ToolLifePro:
         self.res_calc.content.controls[0].value = "RESULTADO"
         self.res_calc.content.controls[1].value = "0"
         self.res_calc.bgcolor = "blue900"
-        self.page.update()
+        self.atualizacoes.atualizar()
+    
+    def cabecalho_alterado(self):
+        """Chamado pelos seletores: com a aba TROCA montada, refaz vida e contagem"""
+        if "TROCA" in self.abas:
+            self.atualizar_vida_esperada()
+        else:
+            self.atualizacoes.atualizar()
     
     def atualizar_vida_esperada(self):
         """Atualiza a vida esperada quando a ferramenta é selecionada"""
@@ -499,8 +642,32 @@ class ToolLifePro:
             self.txt_vida_esperada.value = str(self.dados["vida_padrao"][ferramenta])
         else:
             self.txt_vida_esperada.value = "0"
-        self.page.update()
+        if self.contador:
+            self.atualizar_contagem(int(self.txt_vida_esperada.value))
+        self.atualizacoes.atualizar()
     
+    def atualizar_contagem(self, vida_esperada):
+        """Preenche as peças feitas com o contador, se o operador não digitou outro valor"""
+        maquina, ferramenta = self.sel_maq.value, self.sel_fer.value
+        if not (maquina and ferramenta):
+            self.pecas_contadas = None
+            self.txt_contagem.visible = False
+            return
+        pecas, restante, percentual = self.contador.situacao(maquina, ferramenta, vida_esperada)
+        digitado = self.in_pecas_feitas.value
+        if not digitado or digitado == str(self.pecas_contadas):
+            self.in_pecas_feitas.value = str(pecas)
+        self.pecas_contadas = pecas
+        
+        texto = f"📡 Contador da máquina: {pecas:,} peças".replace(",", ".")
+        if restante is not None:
+            texto += f" ({percentual:.0f}% da vida"
+            texto += f", faltam {restante:,})".replace(",", ".") if restante > 0 else ")"
+        self.txt_contagem.value = texto
+        self.txt_contagem.color = "red400" if percentual >= 100 else "grey400"
+        self.txt_contagem.visible = True
+    
+    @em_lote
     def gerar_relatorio(self, e):
         """Gera o relatório PDF"""
         
@@ -525,7 +692,7 @@ class ToolLifePro:
                 return
             
             # Calcular percentual de uso
-            percentual = (pecas_feitas / vida_esperada * 100) if vida_esperada > 0 else 0
+            percentual = dominio.calcular_percentual(pecas_feitas, vida_esperada)
             
             # Atualizar display
             self.res_vida.visible = True
@@ -543,299 +710,368 @@ class ToolLifePro:
                 self.res_vida.bgcolor = "blue900"
             
             self.res_vida.content.controls[2].value = status_texto
-            self.page.update()
+            self.atualizacoes.atualizar()
             
-            # Gerar PDF
             agora = datetime.now()
+            registro = dominio.montar_registro(
+                agora, self.txt_operador.value, self.sel_maq.value, self.sel_fer.value,
+                self.txt_lote.value, pecas_feitas, vida_esperada,
+                self.motivo.value, self.txt_obs.value
+            )
+            
+            # Salvar no histórico (aparece no topo de self.historico)
+            self.salvar_historico(registro)
             
+            # A contagem recomeça; peças que chegaram depois do preenchimento ficam
+            if self.contador:
+                self.contador.zerar(self.sel_maq.value, self.sel_fer.value,
+                                    self.pecas_contadas)
+                self.pecas_contadas = None
+            
+            # Gerar PDF em segundo plano, direto no acervo (achado pelo
+            # id_troca); o retorno atualiza status_pdf
+            nome_arquivo = dominio.nome_relatorio_troca(agora)
             try:
-                pdf = FPDF()
-                pdf.add_page()
-                
-                # Cabeçalho do PDF
-                pdf.set_font("Arial", 'B', 18)
-                pdf.cell(0, 15, "TOOLLIFE PRO - RELATORIO DE TROCA", ln=True, align='C')
-                pdf.set_font("Arial", 'B', 12)
-                pdf.cell(0, 10, f"Data: {agora.strftime('%d/%m/%Y %H:%M:%S')}", ln=True, align='C')
-                pdf.ln(10)
-                
-                # Dados do relatório
-                pdf.set_font("Arial", 'B', 12)
-                pdf.cell(0, 8, "DADOS DA TROCA", ln=True)
-                pdf.line(10, pdf.get_y(), 200, pdf.get_y())
-                pdf.ln(5)
-                
-                pdf.set_font("Arial", size=11)
-                dados = [
-                    ("Operador:", self.txt_operador.value),
-                    ("Maquina:", self.sel_maq.value),
-                    ("Ferramenta:", self.sel_fer.value),
-                    ("Lote/OP:", self.txt_lote.value or "N/A"),
-                    ("", ""),
-                    ("Pecas Produzidas:", f"{pecas_feitas:,} pecas".replace(",", ".")),
-                    ("Vida Esperada:", f"{vida_esperada:,} pecas".replace(",", ".")),
-                    ("Percentual Utilizado:", f"{percentual:.1f}%"),
-                    ("", ""),
-                    ("Motivo da Troca:", self.motivo.value.replace("✅ ", "").replace("💥 ", "").replace("⚠️ ", "").replace("🔧 ", "").replace("🔄 ", "")),
-                ]
-                
-                for label, valor in dados:
-                    if label:
-                        pdf.set_font("Arial", 'B', 11)
-                        pdf.cell(70, 7, label, 0)
-                        pdf.set_font("Arial", size=11)
-                        pdf.cell(0, 7, str(valor), ln=True)
-                    else:
-                        pdf.ln(3)
-                
-                # Observações
-                if self.txt_obs.value and self.txt_obs.value.strip():
-                    pdf.ln(5)
-                    pdf.set_font("Arial", 'B', 12)
-                    pdf.cell(0, 8, "OBSERVACOES", ln=True)
-                    pdf.line(10, pdf.get_y(), 200, pdf.get_y())
-                    pdf.ln(5)
-                    pdf.set_font("Arial", size=11)
-                    pdf.multi_cell(0, 6, self.txt_obs.value)
-                
-                # Rodapé
-                pdf.ln(10)
-                pdf.set_font("Arial", 'I', 9)
-                pdf.cell(0, 5, "Relatorio gerado por ToolLife Pro v13.0", ln=True, align='C')
-                
-                # Salvar PDF
-                nome_arquivo = f"Relatorio_Troca_{agora.strftime('%Y%m%d_%H%M%S')}.pdf"
-                pdf.output(nome_arquivo)
-                
-                # Salvar no histórico
-                self.historico.insert(0, {
-                    "data": agora.strftime('%d/%m/%Y %H:%M'),
-                    "operador": self.txt_operador.value,
-                    "maquina": self.sel_maq.value,
-                    "ferramenta": self.sel_fer.value,
-                    "lote": self.txt_lote.value or "N/A",
-                    "pecas_feitas": pecas_feitas,
-                    "vida_esperada": vida_esperada,
-                    "percentual": round(percentual, 1),
-                    "motivo": self.motivo.value,
-                    "observacoes": self.txt_obs.value or ""
-                })
-                
-                # Manter apenas os últimos 50 registros
-                self.historico = self.historico[:50]
-                self.salvar_historico()
-                
-                # Tentar abrir PDF
-                try:
-                    if os.name == 'nt':  # Windows
-                        os.startfile(nome_arquivo)
-                    elif os.name == 'posix':  # Linux/Mac
-                        os.system(f'xdg-open "{nome_arquivo}" 2>/dev/null || open "{nome_arquivo}" 2>/dev/null &')
-                except:
-                    pass  # Ignora erro se não conseguir abrir
-                
-                self.status_pdf.value = f"✅ PDF criado: {nome_arquivo}"
-                self.mostrar_alerta("Sucesso!", f"Relatório salvo como:\n{nome_arquivo}", "success")
-                self.page.update()
-                
-            except Exception as ex:
-                self.mostrar_alerta("Erro ao Criar PDF", f"Detalhes: {str(ex)}")
-                print(f"Erro completo: {ex}")
+                self.fila_relatorios.enviar_ao_acervo(registro, nome_arquivo,
+                                                      self.relatorio_concluido)
+                self.status_pdf.value = f"⏳ Gerando PDF: {nome_arquivo}"
+                self.status_pdf.color = "orange400"
+            except queue.Full:
+                self.status_pdf.value = "⚠️ Fila de relatórios cheia, PDF não gerado"
+                self.status_pdf.color = "red400"
+            self.atualizacoes.atualizar()
             
         except ValueError:
             self.mostrar_alerta("Erro", "Digite apenas números no campo de peças!")
     
+    @em_lote
+    def relatorio_concluido(self, nome_arquivo, erro):
+        """Chamado pela fila de relatórios quando o PDF termina"""
+        if erro:
+            self.status_pdf.value = "⚠️ Erro ao criar PDF"
+            self.status_pdf.color = "red400"
+            self.mostrar_alerta("Erro ao Criar PDF", f"Detalhes: {str(erro)}")
+            return
+        
+        self.status_pdf.value = f"✅ PDF guardado: {nome_arquivo}"
+        self.status_pdf.color = "green400"
+        self.mostrar_alerta("Sucesso!", f"Relatório guardado no acervo como:\n{nome_arquivo}",
+                            "success")
+    
+    @em_lote
+    def reimprimir(self, e):
+        """Regenera o PDF da troca do card (o botão guarda o registro em data)"""
+        registro = e.control.data
+        nome_arquivo = dominio.nome_relatorio_troca(datetime.fromtimestamp(registro["instante"]))
+        try:
+            self.fila_relatorios.enviar_reimpressao(registro, nome_arquivo,
+                                                    self.reimpressao_concluida)
+        except queue.Full:
+            self.mostrar_alerta("Erro", "Fila de relatórios cheia, tente de novo")
+    
+    @em_lote
+    def reimpressao_concluida(self, nome_arquivo, erro):
+        """Chamado pela fila de relatórios quando a reimpressão termina"""
+        if erro:
+            self.mostrar_alerta("Erro ao Criar PDF", f"Detalhes: {str(erro)}")
+    
+    @em_lote
+    def gerar_relatorio_consolidado(self, e):
+        """Gera o PDF consolidado do período escolhido"""
+        agora = datetime.now()
+        
+        # Máquina/ferramenta do cabeçalho, se escolhidas, restringem o relatório
+        filtros = {
+            "maquina": self.sel_maq.value or None,
+            "ferramenta": self.sel_fer.value or None,
+            "inicio": dominio.inicio_do_periodo(self.sel_periodo_relatorio.value, agora),
+            "titulo_periodo": self.sel_periodo_relatorio.value
+                              .replace("Ú", "U").replace("ó", "o")
+        }
+        
+        nome_arquivo = dominio.nome_relatorio_consolidado(agora)
+        try:
+            self.fila_relatorios.enviar_consolidado(self.armazenamento, nome_arquivo, filtros,
+                                                    self.consolidado_concluido)
+            self.status_consolidado.value = f"⏳ Gerando PDF: {nome_arquivo}"
+            self.status_consolidado.color = "orange400"
+        except queue.Full:
+            self.status_consolidado.value = "⚠️ Fila de relatórios cheia, tente de novo"
+            self.status_consolidado.color = "red400"
+        self.atualizacoes.atualizar()
+    
+    @em_lote
+    def consolidado_concluido(self, nome_arquivo, erro):
+        """Chamado pela fila de relatórios quando o consolidado termina"""
+        if erro:
+            self.status_consolidado.value = "⚠️ Erro ao criar PDF"
+            self.status_consolidado.color = "red400"
+            self.mostrar_alerta("Erro ao Criar PDF", f"Detalhes: {str(erro)}")
+            return
+        
+        self.status_consolidado.value = f"✅ PDF guardado no acervo: {nome_arquivo}"
+        self.status_consolidado.color = "green400"
+        self.atualizacoes.atualizar()
+    
+    @em_lote
     def limpar_troca(self, e):
         """Limpa os campos de troca"""
         self.in_pecas_feitas.value = ""
+        self.pecas_contadas = None
         self.txt_obs.value = ""
         self.motivo.value = "✅ Completou a Vida Útil"
         self.res_vida.visible = False
         self.status_pdf.value = ""
-        self.page.update()
+        self.atualizacoes.atualizar()
     
+    @em_lote
     def atualizar_historico(self, e):
-        """Atualiza a lista de histórico"""
+        """Atualiza a lista de histórico do período, exibindo só a primeira página"""
+        self.historico_exibidos = 0
         self.lista_historico.controls.clear()
+        # O início fica fixo até a próxima atualização, para as páginas baterem
+        self.inicio_historico = dominio.inicio_do_periodo(
+            self.sel_periodo_relatorio.value, datetime.now())
+        
+        if not self.carregar_pagina_historico():
+            # Página vazia: uma troca qualquer, sem filtro, diz qual aviso mostrar
+            if self.armazenamento.consultar_historico(limite=1):
+                self.txt_historico_vazio.content.value = "Nenhuma troca no período."
+            else:
+                self.txt_historico_vazio.content.value = "Nenhuma troca registrada ainda."
+            self.lista_historico.controls.append(self.txt_historico_vazio)
         
-        if not self.historico:
-            self.lista_historico.controls.append(
-                ft.Container(
-                    content=ft.Text("Nenhuma troca registrada ainda.", 
-                                   color="grey", italic=True),
-                    padding=20
-                )
-            )
-        else:
-            for registro in self.historico:
-                # Determinar cor baseada no percentual
-                cor_card = "green900"
-                if registro["percentual"] < 80:
-                    cor_card = "blue900"
-                elif registro["percentual"] < 100:
-                    cor_card = "orange900"
-                
-                card = ft.Container(
-                    content=ft.Column([
-                        ft.Row([
-                            ft.Text("🔧", size=20),
-                            ft.Text(registro["ferramenta"], 
-                                   weight=ft.FontWeight.BOLD, size=16),
-                            ft.Text(f"({registro['percentual']}%)", 
-                                   color="grey", size=14)
-                        ]),
-                        ft.Divider(height=10, color="white24"),
-                        ft.Row([
-                            ft.Column([
-                                ft.Text(f"Máquina: {registro['maquina']}", size=12),
-                                ft.Text(f"Operador: {registro['operador']}", size=12),
-                                ft.Text(f"Data: {registro['data']}", size=12, color="grey"),
-                            ], expand=True),
-                            ft.Column([
-                                ft.Text(f"Feitas: {registro['pecas_feitas']}", size=12),
-                                ft.Text(f"Esperadas: {registro['vida_esperada']}", size=12),
-                                ft.Text(f"{registro['motivo'][:20]}...", size=11, color="grey"),
-                            ], expand=True)
-                        ])
-                    ]),
-                    padding=15,
-                    border_radius=10,
-                    bgcolor=cor_card,
-                    border=ft.border.all(1, "white24")
-                )
-                
+        self.atualizacoes.atualizar()
+    
+    @em_lote
+    def rolar_historico(self, e):
+        """Carrega a próxima página quando a rolagem chega perto do fim"""
+        if e.pixels >= e.max_scroll_extent - 200:
+            if self.carregar_pagina_historico():
+                self.atualizacoes.atualizar()
+    
+    def carregar_pagina_historico(self):
+        """Anexa a próxima página de registros à lista; retorna se anexou algo"""
+        if self.carregando_historico:
+            return False
+        self.carregando_historico = True
+        try:
+            # Busca binária pelo instante: o período não exige varrer o histórico
+            inicio = self.historico_exibidos
+            pagina = self.armazenamento.consultar_historico(
+                inicio=self.inicio_historico, limite=self.TAMANHO_PAGINA_HISTORICO,
+                deslocamento=inicio)
+            
+            for i, registro in enumerate(pagina, start=inicio):
+                # Reaproveitar cards já criados em visitas anteriores
+                if i == len(self.cards_historico):
+                    self.cards_historico.append(self.criar_card_historico())
+                card = self.cards_historico[i]
+                self.preencher_card_historico(card, registro)
                 self.lista_historico.controls.append(card)
+            
+            self.historico_exibidos += len(pagina)
+            return len(pagina) > 0
+        finally:
+            self.carregando_historico = False
+    
+    def criar_card_historico(self):
+        """Cria um card de histórico vazio; os textos ficam em card.data"""
+        textos = {
+            "ferramenta": ft.Text("", weight=ft.FontWeight.BOLD, size=16),
+            "percentual": ft.Text("", color="grey", size=14),
+            "maquina": ft.Text("", size=12),
+            "operador": ft.Text("", size=12),
+            "data": ft.Text("", size=12, color="grey"),
+            "pecas_feitas": ft.Text("", size=12),
+            "vida_esperada": ft.Text("", size=12),
+            "motivo": ft.Text("", size=11, color="grey"),
+            "reimprimir": ft.TextButton("🖨️", tooltip="Reimprimir PDF",
+                                        on_click=self.reimprimir),
+        }
         
-        self.page.update()
+        return ft.Container(
+            content=ft.Column([
+                ft.Row([
+                    ft.Text("🔧", size=20),
+                    textos["ferramenta"],
+                    textos["percentual"],
+                    ft.Container(expand=True),
+                    textos["reimprimir"]
+                ]),
+                ft.Divider(height=10, color="white24"),
+                ft.Row([
+                    ft.Column([
+                        textos["maquina"],
+                        textos["operador"],
+                        textos["data"],
+                    ], expand=True),
+                    ft.Column([
+                        textos["pecas_feitas"],
+                        textos["vida_esperada"],
+                        textos["motivo"],
+                    ], expand=True)
+                ])
+            ]),
+            padding=15,
+            border_radius=10,
+            border=ft.border.all(1, "white24"),
+            data=textos
+        )
     
+    def preencher_card_historico(self, card, registro):
+        """Preenche um card existente com os valores de um registro"""
+        # Determinar cor baseada no percentual
+        cor_card = "green900"
+        if registro["percentual"] < 80:
+            cor_card = "blue900"
+        elif registro["percentual"] < 100:
+            cor_card = "orange900"
+        card.bgcolor = cor_card
+        
+        textos = card.data
+        textos["ferramenta"].value = registro["ferramenta"]
+        textos["percentual"].value = f"({registro['percentual']}%)"
+        textos["maquina"].value = f"Máquina: {registro['maquina']}"
+        textos["operador"].value = f"Operador: {registro['operador']}"
+        textos["data"].value = f"Data: {formatar_data(registro['instante'])}"
+        textos["pecas_feitas"].value = f"Feitas: {registro['pecas_feitas']}"
+        textos["vida_esperada"].value = f"Esperadas: {registro['vida_esperada']}"
+        textos["motivo"].value = f"{registro['motivo'][:20]}..."
+        textos["reimprimir"].data = registro
+    
+    @em_lote
     def adicionar_maquina(self, e):
         """Adiciona uma nova máquina"""
-        if not self.txt_novo_item.value or not self.txt_novo_item.value.strip():
-            self.mostrar_alerta("Erro", "Digite o nome da máquina!")
-            return
-        
-        nome = self.txt_novo_item.value.strip()
-        
-        if nome in self.dados["maquinas"]:
-            self.mostrar_alerta("Erro", "Esta máquina já existe!")
+        try:
+            # A linha nova entra na lista por dados_alterados, como nas outras sessões
+            nome, _ = self.repositorio.adicionar_maquina(self.txt_novo_item.value)
+        except ValueError as ex:
+            self.mostrar_alerta("Erro", str(ex))
             return
         
-        self.dados["maquinas"].append(nome)
-        self.dados["maquinas"].sort()
-        self.salvar_dados()
-        
-        # Atualizar dropdown
-        self.sel_maq.options = [ft.dropdown.Option(m) for m in self.dados["maquinas"]]
-        
-        # Atualizar lista
-        self.atualizar_listas_config()
-        
         self.txt_novo_item.value = ""
-        self.page.update()
+        self.atualizacoes.atualizar()
         
         self.mostrar_alerta("Pronto!", f"Máquina '{nome}' adicionada!", "success")
     
+    @em_lote
     def adicionar_ferramenta(self, e):
         """Adiciona uma nova ferramenta"""
-        if not self.txt_novo_item.value or not self.txt_novo_item.value.strip():
-            self.mostrar_alerta("Erro", "Digite o nome da ferramenta!")
-            return
-        
-        if not self.txt_vida_nova_ferramenta.value:
-            self.mostrar_alerta("Erro", "Digite a vida esperada!")
-            return
-        
-        nome = self.txt_novo_item.value.strip()
-        
         try:
-            vida = int(self.txt_vida_nova_ferramenta.value)
-            if vida <= 0:
-                raise ValueError()
-        except:
-            self.mostrar_alerta("Erro", "Vida esperada deve ser um número positivo!")
+            nome, _ = self.repositorio.adicionar_ferramenta(self.txt_novo_item.value,
+                                                            self.txt_vida_nova_ferramenta.value)
+        except ValueError as ex:
+            self.mostrar_alerta("Erro", str(ex))
             return
         
-        if nome in self.dados["ferramentas"]:
-            self.mostrar_alerta("Erro", "Esta ferramenta já existe!")
-            return
-        
-        self.dados["ferramentas"].append(nome)
-        self.dados["ferramentas"].sort()
-        self.dados["vida_padrao"][nome] = vida
-        self.salvar_dados()
-        
-        # Atualizar dropdown
-        self.sel_fer.options = [ft.dropdown.Option(f) for f in self.dados["ferramentas"]]
-        
-        # Atualizar lista
-        self.atualizar_listas_config()
-        
         self.txt_novo_item.value = ""
         self.txt_vida_nova_ferramenta.value = ""
-        self.page.update()
+        self.atualizacoes.atualizar()
         
         self.mostrar_alerta("Pronto!", f"Ferramenta '{nome}' adicionada!", "success")
     
+    @em_lote
     def remover_maquina(self, nome, e):
         """Remove uma máquina"""
-        self.dados["maquinas"].remove(nome)
-        self.salvar_dados()
-        self.sel_maq.options = [ft.dropdown.Option(m) for m in self.dados["maquinas"]]
-        self.atualizar_listas_config()
-        self.page.update()
+        try:
+            self.repositorio.remover_maquina(nome)
+        except ValueError:
+            pass  # clique repetido, ou outra sessão já removeu
     
+    @em_lote
     def remover_ferramenta(self, nome, e):
         """Remove uma ferramenta"""
-        self.dados["ferramentas"].remove(nome)
-        if nome in self.dados["vida_padrao"]:
-            del self.dados["vida_padrao"][nome]
-        self.salvar_dados()
-        self.sel_fer.options = [ft.dropdown.Option(f) for f in self.dados["ferramentas"]]
-        self.atualizar_listas_config()
-        self.page.update()
+        try:
+            self.repositorio.remover_ferramenta(nome)
+        except ValueError:
+            pass  # clique repetido, ou outra sessão já removeu
+    
+    def dados_alterados(self, evento, nome, posicao, versao):
+        """Aviso do repositório (desta ou de outra sessão), já sem o lock
+        
+        Só a linha afetada muda: entra ou sai da lista na posição ordenada.
+        Avisos até ``versao_listas`` já estavam no catálogo quando as listas
+        foram montadas.
+        """
+        if evento == "troca_registrada":
+            aba = self.abas.get("HISTORICO")
+            if aba is not None and aba.visible:
+                self.atualizar_historico(None)
+            return
+        
+        if "CONFIG" in self.abas:
+            self.atualizar_estado_catalogo()
+        if evento == "catalogo_gravado":
+            self.atualizacoes.atualizar()
+            return
+        
+        maquina = evento.startswith("maquina")
+        lista = None
+        if "CONFIG" in self.abas and versao > self.versao_listas:
+            lista = self.lista_maquinas if maquina else self.lista_ferramentas
+        if evento.endswith("adicionada"):
+            if lista is not None:
+                criar_linha = self.criar_linha_maquina if maquina else self.criar_linha_ferramenta
+                lista.controls.insert(posicao, criar_linha(nome))
+        else:
+            (self.sel_maq if maquina else self.sel_fer).removido(nome)
+            if lista is not None:
+                del lista.controls[posicao]
+        self.atualizacoes.atualizar()
+    
+    def atualizar_estado_catalogo(self):
+        """Indicador da config: edições do catálogo pendentes ou já gravadas"""
+        if self.repositorio.catalogo_pendente:
+            self.txt_catalogo_salvo.value = "💾 Salvando alterações..."
+            self.txt_catalogo_salvo.color = "orange400"
+        else:
+            self.txt_catalogo_salvo.value = "✅ Catálogo salvo"
+            self.txt_catalogo_salvo.color = "green400"
     
     def atualizar_listas_config(self):
-        """Atualiza as listas de máquinas e ferramentas na config"""
-        self.lista_maquinas.controls.clear()
-        for maq in self.dados["maquinas"]:
-            self.lista_maquinas.controls.append(
-                ft.Container(
-                    content=ft.Row([
-                        ft.Text(maq, expand=True),
-                        ft.TextButton(
-                            "🗑️",
-                            on_click=lambda e, m=maq: self.remover_maquina(m, e),
-                            tooltip="Excluir"
-                        )
-                    ]),
-                    padding=5,
-                    border_radius=5,
-                    bgcolor="grey900"
+        """Monta as listas de máquinas e ferramentas na config (primeira visita)"""
+        self.lista_maquinas.controls = [self.criar_linha_maquina(m)
+                                        for m in self.dados["maquinas"]]
+        self.lista_ferramentas.controls = [self.criar_linha_ferramenta(f)
+                                           for f in self.dados["ferramentas"]]
+    
+    def criar_linha_maquina(self, maq):
+        """Linha da lista de máquinas; a posição na lista é a mesma do catálogo"""
+        return ft.Container(
+            content=ft.Row([
+                ft.Text(maq, expand=True),
+                ft.TextButton(
+                    "🗑️",
+                    on_click=lambda e, m=maq: self.remover_maquina(m, e),
+                    tooltip="Excluir"
                 )
-            )
-        
-        self.lista_ferramentas.controls.clear()
-        for fer in self.dados["ferramentas"]:
-            vida = self.dados["vida_padrao"].get(fer, 0)
-            self.lista_ferramentas.controls.append(
-                ft.Container(
-                    content=ft.Row([
-                        ft.Column([
-                            ft.Text(fer, weight=ft.FontWeight.BOLD),
-                            ft.Text(f"Vida: {vida} peças", 
-                                   size=11, color="grey")
-                        ], expand=True),
-                        ft.TextButton(
-                            "🗑️",
-                            on_click=lambda e, f=fer: self.remover_ferramenta(f, e),
-                            tooltip="Excluir"
-                        )
-                    ]),
-                    padding=5,
-                    border_radius=5,
-                    bgcolor="grey900"
+            ]),
+            padding=5,
+            border_radius=5,
+            bgcolor="grey900"
+        )
+    
+    def criar_linha_ferramenta(self, fer):
+        """Linha da lista de ferramentas; a posição na lista é a mesma do catálogo"""
+        vida = self.dados["vida_padrao"].get(fer, 0)
+        return ft.Container(
+            content=ft.Row([
+                ft.Column([
+                    ft.Text(fer, weight=ft.FontWeight.BOLD),
+                    ft.Text(f"Vida: {vida} peças", 
+                           size=11, color="grey")
+                ], expand=True),
+                ft.TextButton(
+                    "🗑️",
+                    on_click=lambda e, f=fer: self.remover_ferramenta(f, e),
+                    tooltip="Excluir"
                 )
-            )
+            ]),
+            padding=5,
+            border_radius=5,
+            bgcolor="grey900"
+        )
     
     def mostrar_alerta(self, titulo, mensagem, tipo="error"):
         """Mostra um alerta para o usuário"""
@@ -843,7 +1079,7 @@ class ToolLifePro:
         
         def fechar_dlg(e):
             dlg.open = False
-            self.page.update()
+            self.atualizacoes.atualizar()
         
         dlg = ft.AlertDialog(
             title=ft.Text(f"{emoji} {titulo}"),
@@ -856,7 +1092,7 @@ class ToolLifePro:
         
         self.page.dialog = dlg
         dlg.open = True
-        self.page.update()
+        self.atualizacoes.atualizar()
 
 def main(page: ft.Page):
     """Função principal"""
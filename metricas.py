@@ -0,0 +1,258 @@
+"""Latência dos handlers da tela e das chamadas ao armazenamento
+
+Ligado pela variável de ambiente ``TOOLLIFE_METRICAS`` com o caminho de um
+arquivo ``.prom``: os handlers do ``ToolLifePro`` e os métodos do
+armazenamento passam a ser cronometrados, e os histogramas são gravados
+nesse arquivo no formato texto do Prometheus a cada
+``TOOLLIFE_METRICAS_INTERVALO`` segundos (padrão 15), pronto para o
+coletor textfile do node_exporter. Com ``TOOLLIFE_METRICAS_PORTA`` as
+mesmas métricas também ficam em ``http://localhost:<porta>/metrics``.
+
+Desligado (variável ausente), nada é embrulhado: o custo é zero.
+
+Os histogramas são no estilo HDR: faixas logarítmicas em microssegundos
+com 16 subdivisões lineares cada, ou seja, erro relativo de no máximo
+~6% em qualquer escala, com memória proporcional ao número de faixas
+usadas. Na exportação, cada faixa entra no ``_bucket`` do primeiro limite
+que cobre o seu maior valor: uma faixa que atravessa um limite vai inteira
+para o seguinte, então as contagens acumuladas nunca passam das reais e
+ficam abaixo delas no máximo pelas medições dessa faixa (~6% acima do
+limite).
+"""
+import atexit
+import functools
+import os
+import threading
+import time
+
+
+HANDLERS_APP = (
+    "navegar", "calcular", "limpar_calculadora", "gerar_relatorio", "relatorio_concluido",
+    "gerar_relatorio_consolidado", "consolidado_concluido", "limpar_troca",
+    "atualizar_historico", "rolar_historico", "adicionar_maquina", "adicionar_ferramenta",
+    "remover_maquina", "remover_ferramenta", "reimprimir", "reimpressao_concluida",
+)
+
+# iterar_historico é um gerador: o tempo fica com quem o consome
+METODOS_ARMAZENAMENTO = (
+    "carregar_dados", "salvar_dados", "carregar_historico", "anexar_historico",
+    "anexar_varios", "consultar_historico",
+)
+
+# Limites (em segundos) das faixas exportadas para o Prometheus
+LIMITES_EXPORTACAO = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                      0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUANTIS_EXPORTACAO = (0.5, 0.9, 0.99)
+
+BITS_SUBFAIXA = 5
+METADE_SUBFAIXAS = 1 << (BITS_SUBFAIXA - 1)
+
+
+class HistogramaLatencia:
+    """Histograma log-linear (estilo HDR) de durações em microssegundos"""
+
+    def __init__(self):
+        self.contagens = {}
+        self.quantidade = 0
+        self.soma_us = 0
+        self.maximo_us = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def indice(valor_us):
+        if valor_us < 2 * METADE_SUBFAIXAS:
+            return valor_us
+        expoente = valor_us.bit_length() - BITS_SUBFAIXA
+        return (expoente << (BITS_SUBFAIXA - 1)) + (valor_us >> expoente)
+
+    @staticmethod
+    def faixa(indice):
+        """(menor, maior) valor em microssegundos que cai no índice"""
+        if indice < 2 * METADE_SUBFAIXAS:
+            return indice, indice
+        expoente = (indice >> (BITS_SUBFAIXA - 1)) - 1
+        mantissa = indice - (expoente << (BITS_SUBFAIXA - 1))
+        return mantissa << expoente, ((mantissa + 1) << expoente) - 1
+
+    def registrar(self, valor_us):
+        indice = self.indice(valor_us)
+        with self._lock:
+            self.contagens[indice] = self.contagens.get(indice, 0) + 1
+            self.quantidade += 1
+            self.soma_us += valor_us
+            if valor_us > self.maximo_us:
+                self.maximo_us = valor_us
+
+    def copia(self):
+        """Estado consistente para exportar sem segurar o lock"""
+        with self._lock:
+            return sorted(self.contagens.items()), self.quantidade, self.soma_us, self.maximo_us
+
+    @classmethod
+    def quantil(cls, faixas, quantidade, q):
+        """Valor (maior da faixa, em µs) abaixo do qual ficam ``q`` das medições"""
+        if not quantidade:
+            return 0
+        alvo = q * quantidade
+        acumulado = 0
+        for indice, contagem in faixas:
+            acumulado += contagem
+            if acumulado >= alvo:
+                return cls.faixa(indice)[1]
+        return cls.faixa(faixas[-1][0])[1]
+
+
+class Metricas:
+    """Histogramas e contadores de erro por (tipo, nome), compartilhados no processo"""
+
+    def __init__(self):
+        self.histogramas = {}
+        self.erros = {}
+        self._lock = threading.Lock()
+
+    def histograma(self, tipo, nome):
+        chave = (tipo, nome)
+        histograma = self.histogramas.get(chave)
+        if histograma is None:
+            with self._lock:
+                histograma = self.histogramas.setdefault(chave, HistogramaLatencia())
+        return histograma
+
+    def cronometrar(self, tipo, nome, funcao):
+        """Embrulha ``funcao`` registrando a duração de cada chamada"""
+        histograma = self.histograma(tipo, nome)
+        chave = (tipo, nome)
+
+        @functools.wraps(funcao)
+        def cronometrada(*args, **kwargs):
+            inicio = time.perf_counter_ns()
+            try:
+                return funcao(*args, **kwargs)
+            except Exception:
+                with self._lock:
+                    self.erros[chave] = self.erros.get(chave, 0) + 1
+                raise
+            finally:
+                histograma.registrar((time.perf_counter_ns() - inicio) // 1000)
+
+        return cronometrada
+
+    def instrumentar(self, objeto, tipo, nomes):
+        """Troca os métodos ``nomes`` do objeto por versões cronometradas
+
+        Deve ser chamado antes de os métodos serem ligados aos controles.
+        """
+        for nome in nomes:
+            metodo = getattr(objeto, nome, None)
+            if metodo is not None:
+                setattr(objeto, nome, self.cronometrar(tipo, nome, metodo))
+
+    def texto_prometheus(self):
+        """Métricas no formato texto de exposição do Prometheus"""
+        linhas = []
+        with self._lock:
+            histogramas = sorted(self.histogramas.items())
+            erros = sorted(self.erros.items())
+
+        for tipo in sorted({t for (t, _), _ in histogramas}):
+            metrica = f"toollife_{tipo}_latencia_segundos"
+            linhas.append(f"# HELP {metrica} Duração das chamadas ({tipo})")
+            linhas.append(f"# TYPE {metrica} histogram")
+            quantis = []
+            for (t, nome), histograma in histogramas:
+                if t != tipo:
+                    continue
+                faixas, quantidade, soma_us, maximo_us = histograma.copia()
+                acumulado = 0
+                pendentes = iter(faixas)
+                proxima = next(pendentes, None)
+                for limite in LIMITES_EXPORTACAO:
+                    limite_us = limite * 1_000_000
+                    while proxima is not None and HistogramaLatencia.faixa(proxima[0])[1] <= limite_us:
+                        acumulado += proxima[1]
+                        proxima = next(pendentes, None)
+                    linhas.append(f'{metrica}_bucket{{nome="{nome}",le="{limite}"}} {acumulado}')
+                linhas.append(f'{metrica}_bucket{{nome="{nome}",le="+Inf"}} {quantidade}')
+                linhas.append(f'{metrica}_sum{{nome="{nome}"}} {soma_us / 1_000_000:.6f}')
+                linhas.append(f'{metrica}_count{{nome="{nome}"}} {quantidade}')
+                for q in QUANTIS_EXPORTACAO:
+                    valor = min(HistogramaLatencia.quantil(faixas, quantidade, q),
+                                maximo_us) / 1_000_000
+                    quantis.append(f'{metrica}_quantil{{nome="{nome}",quantil="{q}"}} {valor:.6f}')
+                quantis.append(f'{metrica}_quantil{{nome="{nome}",quantil="1.0"}} '
+                               f'{maximo_us / 1_000_000:.6f}')
+            linhas.append(f"# HELP {metrica}_quantil Quantis do histograma HDR ({tipo})")
+            linhas.append(f"# TYPE {metrica}_quantil gauge")
+            linhas.extend(quantis)
+
+        linhas.append("# HELP toollife_erros_total Chamadas que terminaram com exceção")
+        linhas.append("# TYPE toollife_erros_total counter")
+        for (tipo, nome), quantidade in erros:
+            linhas.append(f'toollife_erros_total{{tipo="{tipo}",nome="{nome}"}} {quantidade}')
+        return "\n".join(linhas) + "\n"
+
+    def gravar(self, caminho):
+        """Grava o arquivo .prom de forma atômica (o coletor nunca lê pela metade)"""
+        temporario = caminho + ".tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            f.write(self.texto_prometheus())
+        os.replace(temporario, caminho)
+
+    def exportar_periodicamente(self, caminho, intervalo):
+        def exportar():
+            while True:
+                time.sleep(intervalo)
+                try:
+                    self.gravar(caminho)
+                except Exception as e:
+                    print(f"Erro ao gravar métricas: {e}")
+
+        threading.Thread(target=exportar, name="metricas", daemon=True).start()
+        atexit.register(self.gravar, caminho)
+
+    def servir(self, porta):
+        """Serve as métricas em /metrics numa thread própria"""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        metricas = self
+
+        class Manipulador(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                corpo = metricas.texto_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+            def log_message(self, *args):
+                pass
+
+        servidor = ThreadingHTTPServer(("127.0.0.1", porta), Manipulador)
+        threading.Thread(target=servidor.serve_forever, name="metricas-http",
+                         daemon=True).start()
+        return servidor
+
+
+_metricas = None
+_lock_metricas = threading.Lock()
+
+
+def obter_metricas():
+    """Métricas do processo, ou None se TOOLLIFE_METRICAS não estiver definida"""
+    global _metricas
+    caminho = os.environ.get("TOOLLIFE_METRICAS")
+    if not caminho:
+        return None
+    with _lock_metricas:
+        if _metricas is None:
+            _metricas = Metricas()
+            intervalo = float(os.environ.get("TOOLLIFE_METRICAS_INTERVALO", "15"))
+            _metricas.exportar_periodicamente(caminho, intervalo)
+            porta = os.environ.get("TOOLLIFE_METRICAS_PORTA")
+            if porta:
+                _metricas.servir(int(porta))
+        return _metricas
@@ -0,0 +1,231 @@
+"""Vida esperada sugerida a partir do histórico de trocas
+
+A ``vida_padrao`` do catálogo é digitada na CONFIG e raramente revista. O
+``RecomendadorVida`` ajusta uma distribuição de Weibull às peças feitas
+em cada troca, por ferramenta e, onde há falhas suficientes, por
+ferramenta × máquina, e sugere a vida que ``confiabilidade`` (padrão 90%)
+das ferramentas alcança, com faixa de confiança.
+
+Trocas por manutenção preventiva ou mudança de setup não mostram até onde
+a ferramenta iria: entram como observações censuradas (a ferramenta
+durou *pelo menos* aquilo). As demais (vida completa, quebra, acabamento
+ruim) são falhas.
+
+O ajuste é por máxima verossimilhança, com Newton na forma ``k`` rodando
+em todos os grupos ao mesmo tempo (somas por grupo com ``np.bincount``).
+Os dados vêm de uma ``AnaliseVida``; depois do primeiro ajuste, só os
+grupos que receberam trocas novas são reajustados, partindo da forma
+anterior.
+"""
+from statistics import NormalDist
+
+import numpy as np
+
+
+MOTIVOS_CENSURADOS = ("Preventiva", "Setup")
+
+# Falhas mínimas para sugerir uma vida (por ferramenta / por ferramenta × máquina)
+MINIMO_FALHAS = 5
+MINIMO_FALHAS_MAQUINA = 10
+
+FORMA_INICIAL = 1.5
+FORMA_MINIMA, FORMA_MAXIMA = 0.1, 50.0
+
+
+def motivo_censurado(motivo):
+    """A troca foi antes do fim da vida (preventiva, setup)?"""
+    return any(chave in motivo for chave in MOTIVOS_CENSURADOS)
+
+
+def ajustar_weibull(codigos, pecas, falhou, grupos, forma=None, ativos=None,
+                    iteracoes=100, tolerancia=1e-9):
+    """Weibull com censura à direita, por máxima verossimilhança, em cada grupo
+
+    ``codigos`` diz o grupo de cada observação; ``falhou`` é False para as
+    censuradas. ``forma`` (um valor por grupo) é o ponto de partida e
+    ``ativos`` restringe os grupos ajustados (as observações dos outros
+    nem entram nas contas). Observações com 0 peças são ignoradas.
+
+    Trabalha no logaritmo (valor extremo com posição u = ln(escala) e
+    escala b = 1/forma). Retorna (forma, u, falhas, censuradas, covariancia)
+    por grupo; ``covariancia`` tem (Var u, Cov u b, Var b), da informação
+    observada. Grupos sem ajuste ficam com NaN.
+    """
+    if ativos is None:
+        ativos = np.ones(grupos, bool)
+    validos = (pecas > 0) & ativos[codigos]
+    codigos = codigos[validos]
+    y = np.log(pecas[validos].astype(np.float64))
+    falhou = falhou[validos].astype(np.float64)
+
+    falhas = np.bincount(codigos, weights=falhou, minlength=grupos)
+    censuradas = np.bincount(codigos, weights=1 - falhou, minlength=grupos)
+    ativos = ativos & (falhas > 0)
+    # Centralizar por grupo: exp(k * y) não estoura e k não muda
+    quantidade = np.maximum(falhas + censuradas, 1)
+    centro = np.bincount(codigos, weights=y, minlength=grupos) / quantidade
+    y0 = y - centro[codigos]
+    media_falhas = np.bincount(codigos, weights=y0 * falhou, minlength=grupos) \
+        / np.maximum(falhas, 1)
+
+    k = np.full(grupos, FORMA_INICIAL) if forma is None else \
+        np.where(np.isfinite(forma), forma, FORMA_INICIAL)
+    pendentes = ativos.copy()
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        for _ in range(iteracoes):
+            # Só as observações dos grupos que ainda não convergiram
+            linhas = pendentes[codigos]
+            c, v = codigos[linhas], y0[linhas]
+            e = np.exp(k[c] * v)
+            s0 = np.bincount(c, weights=e, minlength=grupos)
+            s1 = np.bincount(c, weights=v * e, minlength=grupos)
+            s2 = np.bincount(c, weights=v * v * e, minlength=grupos)
+            # g(k) = 0 é a equação de verossimilhança perfilada de k (g crescente)
+            g = s1 / s0 - 1 / k - media_falhas
+            derivada = (s2 * s0 - s1 * s1) / (s0 * s0) + 1 / (k * k)
+            novo = np.clip(k - g / derivada, k / 2, k * 2)
+            novo = np.clip(novo, FORMA_MINIMA, FORMA_MAXIMA)
+            k = np.where(pendentes, novo, k)
+            # Falhas todas iguais empurram k para o limite: para ali
+            pendentes &= ~((np.abs(g / derivada) <= tolerancia * k)
+                           | (k == FORMA_MINIMA) | (k == FORMA_MAXIMA))
+            if not pendentes.any():
+                break
+
+        linhas = ativos[codigos]
+        c, v = codigos[linhas], y0[linhas]
+        s0 = np.bincount(c, weights=np.exp(k[c] * v), minlength=grupos)
+        u0 = np.log(s0 / np.maximum(falhas, 1)) / k
+        u = centro + u0
+
+        # Informação observada em (u, b); z = (y - u) / b
+        b = 1 / k
+        z = (v - u0[c]) * k[c]
+        ez = np.exp(z)
+        i_uu = np.bincount(c, weights=ez, minlength=grupos) / (b * b)
+        i_ub = np.bincount(c, weights=z * ez, minlength=grupos) / (b * b)
+        i_bb = (falhas + np.bincount(c, weights=z * z * ez, minlength=grupos)) / (b * b)
+        determinante = i_uu * i_bb - i_ub * i_ub
+        covariancia = np.stack([i_bb, -i_ub, i_uu]) / determinante
+
+    k = np.where(ativos, k, np.nan)
+    u = np.where(ativos, u, np.nan)
+    covariancia = np.where(ativos, covariancia, np.nan)
+    return k, u, falhas, censuradas, covariancia
+
+
+class RecomendadorVida:
+    """Vida sugerida por ferramenta e por ferramenta × máquina
+
+    ``analise`` é a ``AnaliseVida`` do histórico; trocas anexadas a ela
+    depois do último cálculo marcam seus grupos para reajuste.
+    """
+
+    def __init__(self, analise, confiabilidade=0.9, nivel_confianca=0.9):
+        self.analise = analise
+        self.confiabilidade = confiabilidade
+        self.z = NormalDist().inv_cdf((1 + nivel_confianca) / 2)
+        self._ate = 0  # trocas da análise já consideradas
+        self._pares = {}  # (código da ferramenta << 32 | código da máquina) -> grupo
+        self._ferramenta_par = []
+        self._maquina_par = []
+        self.codigo_par = np.empty(0, np.int64)
+        self._ajustes = {}  # "ferramenta" | "par" -> (forma, u, falhas, censuradas, cov)
+
+    def recomendacoes(self, vida_padrao=None):
+        """{ferramenta: {...}} com a vida sugerida de cada ferramenta
+
+        Cada item tem "falhas", "censuradas", "forma", "vida_caracteristica",
+        "recomendada", "faixa" (mínimo, máximo) e "atual" (de ``vida_padrao``),
+        e em "maquinas" o mesmo por máquina onde há dados suficientes.
+        Ferramentas com menos de ``MINIMO_FALHAS`` falhas ficam de fora.
+        """
+        self._atualizar()
+        vida_padrao = vida_padrao or {}
+        ferramentas = self.analise.valores["ferramenta"]
+        maquinas = self.analise.valores["maquina"]
+
+        resultado = {}
+        for grupo, item in self._itens("ferramenta", MINIMO_FALHAS):
+            nome = ferramentas[grupo]
+            item["atual"] = vida_padrao.get(nome)
+            item["maquinas"] = {}
+            resultado[nome] = item
+        for grupo, item in self._itens("par", MINIMO_FALHAS_MAQUINA):
+            nome = ferramentas[self._ferramenta_par[grupo]]
+            if nome in resultado:
+                resultado[nome]["maquinas"][maquinas[self._maquina_par[grupo]]] = item
+        return resultado
+
+    def _itens(self, dimensao, minimo):
+        forma, u, falhas, censuradas, covariancia = self._ajustes[dimensao]
+        # Quantil da confiabilidade pedida: ln t = u + b * w
+        w = np.log(-np.log(self.confiabilidade))
+        b = 1 / forma
+        y = u + b * w
+        erro = np.sqrt(covariancia[0] + 2 * w * covariancia[1] + w * w * covariancia[2])
+        for grupo in np.flatnonzero((falhas >= minimo) & np.isfinite(y)):
+            yield int(grupo), {
+                "falhas": int(falhas[grupo]),
+                "censuradas": int(censuradas[grupo]),
+                "forma": float(forma[grupo]),
+                "vida_caracteristica": float(np.exp(u[grupo])),
+                "recomendada": int(np.exp(y[grupo])),
+                "faixa": (int(np.exp(y[grupo] - self.z * erro[grupo])),
+                          int(np.exp(y[grupo] + self.z * erro[grupo]))),
+            }
+
+    def _atualizar(self):
+        """Ajusta grupos com trocas novas desde o último cálculo"""
+        analise = self.analise
+        inicio, fim = self._ate, analise.n
+        if inicio == fim and self._ajustes:
+            return
+        ferramenta = analise.codigos["ferramenta"][:fim]
+        novos_ferramenta = np.unique(ferramenta[inicio:])
+        novos_par = np.unique(self._codificar_pares(inicio, fim))
+        self._ate = fim
+
+        censurado = np.array([motivo_censurado(m) for m in analise.valores["motivo"]], bool)
+        falhou = ~censurado[analise.codigos["motivo"][:fim]]
+        pecas = analise.pecas[:fim]
+        for dimensao, codigos, grupos, novos in (
+                ("ferramenta", ferramenta, len(analise.valores["ferramenta"]), novos_ferramenta),
+                ("par", self.codigo_par[:fim], len(self._pares), novos_par)):
+            anterior = self._ajustes.get(dimensao)
+            forma = None
+            ativos = np.zeros(grupos, bool)
+            ativos[novos] = True
+            if anterior is not None:
+                forma = np.pad(anterior[0], (0, grupos - len(anterior[0])),
+                               constant_values=np.nan)
+            ajuste = ajustar_weibull(codigos, pecas, falhou, grupos, forma, ativos)
+            if anterior is not None:
+                # Grupos sem trocas novas mantêm o ajuste anterior
+                ajuste = tuple(np.where(ativos, novo, self._estender(velho, grupos))
+                               for novo, velho in zip(ajuste, anterior))
+            self._ajustes[dimensao] = ajuste
+
+    @staticmethod
+    def _estender(valores, grupos):
+        faltam = grupos - valores.shape[-1]
+        largura = [(0, 0)] * (valores.ndim - 1) + [(0, faltam)]
+        return np.pad(valores, largura, constant_values=np.nan)
+
+    def _codificar_pares(self, inicio, fim):
+        """Códigos de ferramenta × máquina das trocas ``inicio:fim``"""
+        codigos = self.analise.codigos
+        chaves = ((codigos["ferramenta"][inicio:fim].astype(np.int64) << 32)
+                  | codigos["maquina"][inicio:fim])
+        unicas, inversa = np.unique(chaves, return_inverse=True)
+        mapa = np.empty(len(unicas), np.int64)
+        for i, chave in enumerate(unicas.tolist()):
+            grupo = self._pares.get(chave)
+            if grupo is None:
+                grupo = self._pares[chave] = len(self._pares)
+                self._ferramenta_par.append(chave >> 32)
+                self._maquina_par.append(chave & 0xFFFFFFFF)
+            mapa[i] = grupo
+        novos = mapa[inversa]
+        self.codigo_par = np.concatenate([self.codigo_par[:inicio], novos])
+        return novos
@@ -0,0 +1,519 @@
+"""Geração dos relatórios PDF do ToolLife Pro
+
+O PDF de uma troca é determinístico: a data impressa e a data de criação
+do documento são o instante da troca e o /ID do arquivo sai do hash do
+registro (``chave_do_conteudo``), então o mesmo registro gera sempre os
+mesmos bytes. Isso permite regenerar qualquer troca do histórico
+(``pdf_da_troca``) e guardar o resultado em cache sem risco.
+"""
+import hashlib
+import json
+import os
+import queue
+import tempfile
+import threading
+from datetime import datetime, timezone
+
+from fpdf import FPDF
+
+import dominio
+import historico
+from historico import formatar_data
+
+
+EMOJIS_MOTIVO = ["✅ ", "💥 ", "⚠️ ", "🔧 ", "🔄 "]
+
+# Muda quando o layout muda: PDFs em cache de versões anteriores deixam de valer
+VERSAO_RELATORIO = 1
+
+PASTA_TEMPORARIA = os.path.join(tempfile.gettempdir(), "toollife_relatorios")
+
+
+def limpar_motivo(motivo):
+    """Remove o emoji do motivo (a fonte Arial do PDF não tem esses glifos)"""
+    for emoji in EMOJIS_MOTIVO:
+        motivo = motivo.replace(emoji, "")
+    return motivo
+
+
+def formatar_pecas(quantidade):
+    """1250 -> '1.250 pecas'"""
+    return f"{quantidade:,} pecas".replace(",", ".")
+
+
+def percentual_do_registro(registro):
+    """Percentual de vida usado, sem o arredondamento gravado no histórico"""
+    return dominio.calcular_percentual(registro["pecas_feitas"], registro["vida_esperada"])
+
+
+# Definição do relatório de troca: cada campo é (rótulo, formatador do registro);
+# None é um espaçamento entre blocos.
+DEFINICAO_TROCA = {
+    "titulo": "TOOLLIFE PRO - RELATORIO DE TROCA",
+    "secao": "DADOS DA TROCA",
+    "campos": [
+        ("Operador:", lambda r: r["operador"]),
+        ("Maquina:", lambda r: r["maquina"]),
+        ("Ferramenta:", lambda r: r["ferramenta"]),
+        ("Lote/OP:", lambda r: r["lote"] or "N/A"),
+        None,
+        ("Pecas Produzidas:", lambda r: formatar_pecas(r["pecas_feitas"])),
+        ("Vida Esperada:", lambda r: formatar_pecas(r["vida_esperada"])),
+        ("Percentual Utilizado:", lambda r: f"{percentual_do_registro(r):.1f}%"),
+        None,
+        ("Motivo da Troca:", lambda r: limpar_motivo(r["motivo"])),
+    ],
+    "rodape": "Relatorio gerado por ToolLife Pro v13.0",
+}
+
+
+class ModeloRelatorio:
+    """Relatório de página única com layout estático pré-calculado
+
+    A definição é compilada uma vez: posições de todos os elementos fixos e
+    dos campos são calculadas de antemão e os comandos são agrupados por
+    fonte. Cada relatório só repete os comandos já prontos e preenche os
+    valores dos campos; só as observações (texto livre) seguem em fluxo.
+    """
+
+    MARGEM = 10
+    LARGURA = 190
+    LARGURA_ROTULO = 70
+    ALTURA_LINHA = 7
+    ESPACAMENTO = 3
+
+    def __init__(self, definicao):
+        self.rodape = definicao["rodape"]
+        # Comandos agrupados por fonte: [(fonte, [comando, ...]), ...]
+        self.grupos = []
+        self.linhas = []
+        self.y_fim = 0
+        self._compilar(definicao)
+
+    def _compilar(self, definicao):
+        x, y = self.MARGEM, self.MARGEM
+        valor_x = x + self.LARGURA_ROTULO
+
+        # Cabeçalho: título fixo e data variável
+        self.grupos.append((("Arial", 'B', 18), [
+            ("texto", x, y, self.LARGURA, 15, definicao["titulo"], 'C')]))
+        y += 15
+        cabecalho = [("data", x, y, self.LARGURA, 10, None, 'C')]
+        y += 10 + 10
+
+        cabecalho.append(("texto", x, y, self.LARGURA, 8, definicao["secao"], 'L'))
+        y += 8
+        self.linhas.append((x, y, x + self.LARGURA, y))
+        y += 5
+        self.grupos.append((("Arial", 'B', 12), cabecalho))
+
+        # Rótulos (negrito) e valores (normal) num grupo de fonte cada
+        rotulos = []
+        valores = []
+        for campo in definicao["campos"]:
+            if campo is None:
+                y += self.ESPACAMENTO
+                continue
+            rotulo, formatador = campo
+            rotulos.append(("texto", x, y, self.LARGURA_ROTULO, self.ALTURA_LINHA, rotulo, 'L'))
+            valores.append(("campo", valor_x, y, self.LARGURA - self.LARGURA_ROTULO,
+                            self.ALTURA_LINHA, formatador, 'L'))
+            y += self.ALTURA_LINHA
+        self.grupos.append((("Arial", 'B', 11), rotulos))
+        self.grupos.append((("Arial", '', 11), valores))
+
+        self.y_fim = y
+
+    def renderizar(self, registro, agora, nome_arquivo=None):
+        """Gera o PDF preenchendo os campos com os valores do registro
+
+        Sem ``nome_arquivo``, retorna o PDF em bytes. ``agora`` é a data
+        impressa; a data de criação e o /ID do documento saem do registro,
+        então o mesmo registro gera sempre os mesmos bytes (com o fpdf2).
+        """
+        pdf = FPDF()
+        pdf.creation_date = datetime.fromtimestamp(registro["instante"], timezone.utc)
+        identificador = chave_do_conteudo(registro)[:32]
+        pdf.file_id = lambda: f"<{identificador}><{identificador}>"
+        pdf.add_page()
+
+        for fonte, comandos in self.grupos:
+            pdf.set_font(*fonte)
+            for tipo, x, y, largura, altura, conteudo, alinhamento in comandos:
+                if tipo == "campo":
+                    conteudo = str(conteudo(registro))
+                elif tipo == "data":
+                    conteudo = f"Data: {agora.strftime('%d/%m/%Y %H:%M:%S')}"
+                pdf.set_xy(x, y)
+                pdf.cell(largura, altura, conteudo, align=alinhamento)
+
+        for linha in self.linhas:
+            pdf.line(*linha)
+
+        pdf.set_xy(self.MARGEM, self.y_fim)
+
+        # Observações
+        observacoes = registro.get("observacoes")
+        if observacoes and observacoes.strip():
+            pdf.ln(5)
+            pdf.set_font("Arial", 'B', 12)
+            pdf.cell(0, 8, "OBSERVACOES", ln=True)
+            pdf.line(10, pdf.get_y(), 200, pdf.get_y())
+            pdf.ln(5)
+            pdf.set_font("Arial", size=11)
+            pdf.multi_cell(0, 6, observacoes)
+
+        # Rodapé
+        pdf.ln(10)
+        pdf.set_font("Arial", 'I', 9)
+        pdf.cell(0, 5, self.rodape, ln=True, align='C')
+
+        conteudo = pdf_em_bytes(pdf)
+        if nome_arquivo is None:
+            return conteudo
+        with open(nome_arquivo, "wb") as f:
+            f.write(conteudo)
+
+
+MODELO_TROCA = ModeloRelatorio(DEFINICAO_TROCA)
+
+
+def gerar_pdf_troca(registro, agora, nome_arquivo=None):
+    """Gera o PDF de uma troca a partir de um registro do histórico (bytes sem arquivo)"""
+    return MODELO_TROCA.renderizar(registro, agora, nome_arquivo)
+
+
+def pdf_em_bytes(pdf):
+    """Conteúdo do PDF em memória (o FPDF 1.x devolve str latin-1, o fpdf2 bytearray)"""
+    conteudo = pdf.output(dest="S")
+    return conteudo.encode("latin-1") if isinstance(conteudo, str) else bytes(conteudo)
+
+
+def chave_do_conteudo(registro):
+    """Hash de tudo o que o PDF da troca mostra (chave do cache)"""
+    campos = [registro.get(campo) for campo in historico.CAMPOS]
+    texto = json.dumps([VERSAO_RELATORIO, campos], ensure_ascii=False)
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+def pdf_da_troca(registro, cache=None):
+    """PDF (bytes) de uma troca do histórico, datado no instante da troca
+
+    Passa pelo cache do processo (``cache_relatorios``) se ``cache`` não
+    for dado: pedir de novo a mesma troca não gera outra vez.
+    """
+    if cache is None:
+        from cache_relatorios import obter_cache_relatorios
+        cache = obter_cache_relatorios()
+    return cache.obter(chave_do_conteudo(registro), lambda: gerar_pdf_troca(
+        registro, datetime.fromtimestamp(registro["instante"])))
+
+
+def copia_temporaria(conteudo, nome_arquivo):
+    """Grava o PDF na pasta temporária do sistema, para abrir no visualizador"""
+    os.makedirs(PASTA_TEMPORARIA, exist_ok=True)
+    caminho = os.path.join(PASTA_TEMPORARIA, nome_arquivo)
+    with open(caminho, "wb") as f:
+        f.write(conteudo)
+    return caminho
+
+
+def arquivar_pdf_troca(registro, nome_arquivo, abrir=False, acervo=None):
+    """Gera o PDF da troca direto no acervo; com ``abrir``, mostra uma cópia temporária
+
+    Sem ``acervo``, usa o do processo (``acervo.obter_acervo``). O PDF
+    também fica no cache, pronto para uma reimpressão.
+    """
+    if acervo is None:
+        from acervo import obter_acervo
+        acervo = obter_acervo()
+    conteudo = pdf_da_troca(registro)
+    acervo.guardar_registro(registro, conteudo, nome_arquivo)
+    if abrir:
+        abrir_arquivo(copia_temporaria(conteudo, nome_arquivo))
+
+
+def reimprimir_pdf_troca(registro, nome_arquivo, abrir=True):
+    """Regenera (ou tira do cache) o PDF de uma troca antiga e abre uma cópia"""
+    caminho = copia_temporaria(pdf_da_troca(registro), nome_arquivo)
+    if abrir:
+        abrir_arquivo(caminho)
+    return caminho
+
+
+class PDFConsolidado(FPDF):
+    """Documento do relatório consolidado com rodapé e paginação automáticos"""
+
+    def footer(self):
+        self.set_y(-15)
+        self.set_font("Arial", 'I', 9)
+        self.cell(0, 5, f"Relatorio gerado por ToolLife Pro v13.0 - Pagina {self.page_no()}",
+                  align='C')
+
+
+# (título, largura, chave do registro, alinhamento)
+COLUNAS_CONSOLIDADO = [
+    ("Data", 30, "instante", 'L'),
+    ("Ferramenta", 42, "ferramenta", 'L'),
+    ("Operador", 35, "operador", 'L'),
+    ("Feitas", 20, "pecas_feitas", 'R'),
+    ("Esperada", 20, "vida_esperada", 'R'),
+    ("%", 15, "percentual", 'R'),
+    ("Motivo", 28, "motivo", 'L'),
+]
+
+
+def resumir_historico(registros):
+    """Agrega trocas por máquina e por ferramenta numa única passada"""
+    por_maquina = {}
+    por_ferramenta = {}
+    for registro in registros:
+        quebrou = "Quebrou" in registro["motivo"]
+        for chave, grupos in ((registro["maquina"], por_maquina),
+                              (registro["ferramenta"], por_ferramenta)):
+            grupo = grupos.setdefault(chave, {"trocas": 0, "pecas": 0, "percentual": 0.0,
+                                              "quebras": 0, "vida_esperada": 0})
+            grupo["trocas"] += 1
+            grupo["pecas"] += registro["pecas_feitas"]
+            grupo["percentual"] += registro["percentual"]
+            grupo["quebras"] += quebrou
+            grupo["vida_esperada"] = registro["vida_esperada"]
+    return por_maquina, por_ferramenta
+
+
+def celulas_consolidado(registro, limites):
+    """Textos das colunas de uma troca na tabela de detalhe do consolidado"""
+    celulas = []
+    for (_, _, chave, _), limite in zip(COLUNAS_CONSOLIDADO, limites):
+        valor = registro[chave]
+        if chave == "motivo":
+            valor = limpar_motivo(valor)
+        elif chave == "instante":
+            valor = formatar_data(valor)
+        celulas.append(str(valor)[:limite])
+    return celulas
+
+
+def gerar_pdf_consolidado(armazenamento, nome_arquivo=None, maquina=None, ferramenta=None,
+                          inicio=None, fim=None, titulo_periodo="Todo o historico"):
+    """Gera um PDF com resumo e seções por máquina para um conjunto de trocas
+
+    Os registros são lidos do armazenamento página por página, numa única
+    passada: ela soma os totais do resumo e separa por máquina as células já
+    formatadas das tabelas de detalhe. Fontes e larguras de coluna são
+    definidas uma vez por documento. Sem ``nome_arquivo``, retorna o PDF em
+    bytes.
+    """
+    filtros = {"ferramenta": ferramenta, "inicio": inicio, "fim": fim}
+    maquinas = [maquina] if maquina else None
+    limites = [int(c[1] / 1.9) for c in COLUNAS_CONSOLIDADO]
+    linhas_por_maquina = {}
+
+    def separar_por_maquina(registros):
+        for registro in registros:
+            linhas_por_maquina.setdefault(registro["maquina"], []).append(
+                celulas_consolidado(registro, limites))
+            yield registro
+
+    # Passada única: totais para o resumo e linhas de cada máquina, em ordem cronológica
+    por_maquina, por_ferramenta = resumir_historico(
+        separar_por_maquina(armazenamento.iterar_historico(maquina=maquina, **filtros)))
+    if maquinas is None:
+        maquinas = sorted(por_maquina)
+
+    pdf = PDFConsolidado()
+    pdf.set_auto_page_break(True, margin=20)
+    pdf.add_page()
+
+    # Cabeçalho do PDF
+    pdf.set_font("Arial", 'B', 18)
+    pdf.cell(0, 15, "TOOLLIFE PRO - RELATORIO CONSOLIDADO", ln=True, align='C')
+    pdf.set_font("Arial", 'B', 12)
+    pdf.cell(0, 10, f"Periodo: {titulo_periodo}", ln=True, align='C')
+    pdf.ln(5)
+
+    def secao(titulo):
+        pdf.set_font("Arial", 'B', 12)
+        pdf.cell(0, 8, titulo, ln=True)
+        pdf.line(10, pdf.get_y(), 200, pdf.get_y())
+        pdf.ln(3)
+
+    def linha_tabela(valores, larguras, negrito=False):
+        pdf.set_font("Arial", 'B' if negrito else '', 9)
+        for valor, largura in zip(valores, larguras):
+            pdf.cell(largura, 6, valor, border=1)
+        pdf.ln()
+
+    # Resumo por máquina
+    secao("RESUMO POR MAQUINA")
+    larguras = [40, 30, 40, 40, 40]
+    linha_tabela(["Maquina", "Trocas", "Pecas", "Media % Vida", "Quebras"], larguras, True)
+    for nome in maquinas:
+        grupo = por_maquina.get(nome)
+        if grupo:
+            linha_tabela([nome, str(grupo["trocas"]), str(grupo["pecas"]),
+                          f"{grupo['percentual'] / grupo['trocas']:.1f}%",
+                          str(grupo["quebras"])], larguras)
+    pdf.ln(5)
+
+    # Resumo por ferramenta
+    secao("RESUMO POR FERRAMENTA")
+    larguras = [60, 25, 35, 35, 35]
+    linha_tabela(["Ferramenta", "Trocas", "Media Pecas", "Media % Vida", "Quebras"],
+                 larguras, True)
+    for nome in sorted(por_ferramenta):
+        grupo = por_ferramenta[nome]
+        linha_tabela([nome[:35], str(grupo["trocas"]),
+                      str(round(grupo["pecas"] / grupo["trocas"])),
+                      f"{grupo['percentual'] / grupo['trocas']:.1f}%",
+                      str(grupo["quebras"])], larguras)
+
+    # Uma seção por máquina, com as trocas em ordem cronológica
+    titulos = [c[0] for c in COLUNAS_CONSOLIDADO]
+    larguras = [c[1] for c in COLUNAS_CONSOLIDADO]
+    for nome in maquinas:
+        if nome not in por_maquina:
+            continue
+        pdf.ln(8)
+        secao(f"MAQUINA {nome}")
+        linha_tabela(titulos, larguras, True)
+        pdf.set_font("Arial", size=9)
+        for celulas in linhas_por_maquina.pop(nome):
+            for (_, largura, _, alinhamento), valor in zip(COLUNAS_CONSOLIDADO, celulas):
+                pdf.cell(largura, 5, valor, border=1, align=alinhamento)
+            pdf.ln()
+
+    if nome_arquivo is None:
+        return pdf_em_bytes(pdf)
+    pdf.output(nome_arquivo)
+
+
+def chave_consolidado(nome_arquivo):
+    """Chave do relatório consolidado no acervo (não colide com as das trocas)"""
+    return f"consolidado:{nome_arquivo}"
+
+
+def arquivar_pdf_consolidado(armazenamento, nome_arquivo, filtros, abrir=False, acervo=None):
+    """Gera o consolidado direto no acervo, como o PDF de troca; retorna a chave
+
+    ``filtros`` vai para ``gerar_pdf_consolidado``. Com ``abrir``, mostra
+    uma cópia temporária.
+    """
+    if acervo is None:
+        from acervo import obter_acervo
+        acervo = obter_acervo()
+    conteudo = gerar_pdf_consolidado(armazenamento, **filtros)
+    chave = acervo.guardar(chave_consolidado(nome_arquivo), conteudo, nome_arquivo)
+    if abrir:
+        abrir_arquivo(copia_temporaria(conteudo, nome_arquivo))
+    return chave
+
+
+def abrir_arquivo(nome_arquivo):
+    """Tenta abrir o arquivo no visualizador padrão do sistema"""
+    try:
+        if os.name == 'nt':  # Windows
+            os.startfile(nome_arquivo)
+        elif os.name == 'posix':  # Linux/Mac
+            os.system(f'xdg-open "{nome_arquivo}" 2>/dev/null || open "{nome_arquivo}" 2>/dev/null &')
+    except:
+        pass  # Ignora erro se não conseguir abrir
+
+
+class FilaRelatorios:
+    """Pool limitado de threads que gera PDFs fora dos handlers da interface
+
+    Os trabalhos entram numa fila de capacidade fixa; ``enviar`` nunca
+    bloqueia e levanta ``queue.Full`` se a fila estiver lotada. Ao terminar,
+    cada trabalho chama ``ao_concluir(nome_arquivo, erro)`` na thread do
+    trabalhador (``erro`` é ``None`` em caso de sucesso).
+    """
+
+    def __init__(self, trabalhadores=2, capacidade=64):
+        self.fila = queue.Queue(maxsize=capacidade)
+        self.threads = []
+        for i in range(trabalhadores):
+            thread = threading.Thread(
+                target=self._trabalhar,
+                name=f"relatorios-{i}",
+                daemon=True
+            )
+            thread.start()
+            self.threads.append(thread)
+
+    def enviar(self, registro, agora, nome_arquivo, ao_concluir=None, abrir=True):
+        """Agenda a geração do PDF de uma troca"""
+        self.enviar_tarefa(gerar_pdf_troca, (registro, agora, nome_arquivo),
+                           nome_arquivo, ao_concluir, abrir)
+
+    def enviar_ao_acervo(self, registro, nome_arquivo, ao_concluir=None, abrir=True,
+                         acervo=None):
+        """Agenda o PDF de uma troca para o acervo (``nome_arquivo`` é o nome guardado)"""
+        self.enviar_tarefa(arquivar_pdf_troca, (registro, nome_arquivo, abrir, acervo),
+                           nome_arquivo, ao_concluir, abrir=False)
+
+    def enviar_reimpressao(self, registro, nome_arquivo, ao_concluir=None, abrir=True):
+        """Agenda a reimpressão de uma troca do histórico"""
+        self.enviar_tarefa(reimprimir_pdf_troca, (registro, nome_arquivo, abrir),
+                           nome_arquivo, ao_concluir, abrir=False)
+
+    def enviar_tarefa(self, funcao, argumentos, nome_arquivo, ao_concluir=None, abrir=True):
+        """Agenda ``funcao(*argumentos)``, que deve gravar ``nome_arquivo``"""
+        self.fila.put_nowait((funcao, argumentos, nome_arquivo, ao_concluir, abrir))
+
+    def enviar_consolidado(self, armazenamento, nome_arquivo, filtros, ao_concluir=None,
+                           abrir=True, acervo=None):
+        """Agenda um relatório consolidado para o acervo (``filtros`` vai para gerar_pdf_consolidado)"""
+        self.enviar_tarefa(arquivar_pdf_consolidado,
+                           (armazenamento, nome_arquivo, filtros, abrir, acervo),
+                           nome_arquivo, ao_concluir, abrir=False)
+
+    def aguardar(self):
+        """Bloqueia até todos os trabalhos enviados terminarem"""
+        self.fila.join()
+
+    def encerrar(self):
+        """Termina os trabalhos pendentes e para as threads"""
+        for _ in self.threads:
+            self.fila.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+
+    def _trabalhar(self):
+        while True:
+            trabalho = self.fila.get()
+            try:
+                if trabalho is None:
+                    return
+                funcao, argumentos, nome_arquivo, ao_concluir, abrir = trabalho
+
+                erro = None
+                try:
+                    funcao(*argumentos)
+                    if abrir:
+                        abrir_arquivo(nome_arquivo)
+                except Exception as ex:
+                    erro = ex
+                    print(f"Erro completo: {ex}")
+
+                if ao_concluir:
+                    try:
+                        ao_concluir(nome_arquivo, erro)
+                    except Exception as ex:
+                        print(f"Erro no retorno do relatório: {ex}")
+            finally:
+                self.fila.task_done()
+
+
+_fila_compartilhada = None
+_lock_fila = threading.Lock()
+
+
+def obter_fila_relatorios():
+    """Fila única por processo, compartilhada por todas as sessões do Flet"""
+    global _fila_compartilhada
+    with _lock_fila:
+        if _fila_compartilhada is None:
+            _fila_compartilhada = FilaRelatorios()
+        return _fila_compartilhada
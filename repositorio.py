@@ -0,0 +1,267 @@
+"""Dados compartilhados pelas sessões do app no mesmo processo
+
+Servido pelo Flet em modo web, cada terminal abre uma sessão com o seu
+``ToolLifePro``. Em vez de cada sessão ler os arquivos e guardar a sua
+cópia (e uma sobrescrever o que a outra gravou), todas usam o mesmo
+``Repositorio``: catálogo, histórico e índices de busca são carregados uma
+vez por processo.
+
+Toda escrita passa pelo ``lock`` do repositório, um escritor por vez: a
+alteração é aplicada no catálogo em memória, gravada e, ainda com o lock,
+posta na fila de avisos para as sessões inscritas (``inscrever``) naquele
+momento. Os avisos são entregues depois que o lock é solto, uma thread
+por vez e na mesma ordem em que as alterações aconteceram: uma sessão
+lenta não segura os outros escritores. Assim cada sessão mexe só nas
+linhas afetadas da sua tela e nenhuma alteração se perde. Quem lê o
+catálogo para montar uma tela inteira segura o ``lock`` e guarda a
+``versao``: os avisos de alterações que já estavam no que leu chegam com
+versão menor ou igual e são ignorados.
+
+``analise`` (estatísticas de vida, ``analise.AnaliseVida``) é montada do
+histórico no primeiro uso e, daí em diante, acompanha cada troca
+registrada pelo repositório, sem recalcular tudo.
+
+O catálogo não é gravado a cada edição: ``salvar_dados`` marca a
+alteração e a ``GravacaoAdiada`` grava uma cópia numa thread, juntando as
+edições de ``janela`` segundos (ver ``gravacao``). ``catalogo_pendente``
+indica se há edição ainda não gravada; ``fechar`` e a saída do processo
+gravam o que faltar.
+
+As sessões são guardadas por referência fraca: uma sessão fechada sai da
+lista sozinha, mesmo sem ``cancelar``.
+"""
+import collections
+import copy
+import os
+import threading
+import weakref
+
+import dominio
+from armazenamento import criar_armazenamento, dados_padrao
+from busca import IndiceBusca
+from gravacao import JANELA, GravacaoAdiada
+from metricas import METODOS_ARMAZENAMENTO, obter_metricas
+
+
+class Repositorio:
+    """Catálogo e histórico de um par de arquivos, compartilhados no processo
+
+    Eventos avisados às sessões, como ``ao_alterar(evento, nome, posicao,
+    versao)``: ``maquina_adicionada``, ``maquina_removida``,
+    ``ferramenta_adicionada``, ``ferramenta_removida`` (com o nome e a
+    posição na lista do catálogo), ``troca_registrada`` (sem nome nem
+    posição, também para um lote de ``registrar_trocas``) e
+    ``catalogo_gravado`` (as edições anteriores já estão no disco, sem nome
+    nem posição). ``versao`` é a do catálogo logo depois da alteração. O
+    aviso chega sem o ``lock``, em geral na thread que fez a alteração,
+    logo antes de o método retornar; deve ser rápido (mexer nos controles e
+    enviar a página).
+    """
+
+    def __init__(self, arquivo_dados, arquivo_historico, tipo=None, janela=JANELA):
+        self.armazenamento = criar_armazenamento(arquivo_dados, arquivo_historico, tipo)
+        metricas = obter_metricas()
+        if metricas:
+            metricas.instrumentar(self.armazenamento, "armazenamento", METODOS_ARMAZENAMENTO)
+
+        self.lock = threading.RLock()
+        self._inscritos = []
+        self.versao = 0  # sobe a cada máquina ou ferramenta incluída ou removida
+        self._avisos = collections.deque()  # (inscritos, argumentos) a entregar
+        self._lock_avisos = threading.Lock()  # de quem está entregando
+        self.dados = self.carregar_dados()
+        self._historico = None
+        self._indices = {}
+        self._analise = None
+        self._gravacao = GravacaoAdiada(self._copiar_catalogo, self.armazenamento.salvar_dados,
+                                        janela, self._catalogo_gravado, "catalogo-gravacao")
+
+    def carregar_dados(self):
+        """Carrega o catálogo de máquinas e ferramentas"""
+        try:
+            return dominio.ordenar_catalogo(self.armazenamento.carregar_dados())
+        except Exception as e:
+            print(f"Erro ao carregar dados: {e}")
+            return dominio.ordenar_catalogo(dados_padrao())
+
+    def salvar_dados(self):
+        """Agenda a gravação do catálogo (chamar com o lock)"""
+        self._gravacao.marcar()
+
+    @property
+    def catalogo_pendente(self):
+        """Há edição do catálogo ainda não gravada"""
+        return self._gravacao.pendente
+
+    def _copiar_catalogo(self):
+        with self.lock:
+            return {chave: copy.copy(valor) for chave, valor in self.dados.items()}
+
+    def _catalogo_gravado(self):
+        with self.lock:
+            self._avisar("catalogo_gravado")
+        self._entregar_avisos()
+
+    @property
+    def historico(self):
+        """Histórico de trocas, carregado na primeira consulta"""
+        if self._historico is None:
+            with self.lock:
+                if self._historico is None:
+                    try:
+                        self._historico = self.armazenamento.carregar_historico()
+                    except Exception as e:
+                        print(f"Erro ao carregar histórico: {e}")
+                        self._historico = []
+        return self._historico
+
+    def indice(self, lista):
+        """``IndiceBusca`` de ``"maquinas"`` ou ``"ferramentas"``, montado no primeiro uso"""
+        indice = self._indices.get(lista)
+        if indice is None:
+            with self.lock:
+                indice = self._indices.get(lista)
+                if indice is None:
+                    indice = self._indices[lista] = IndiceBusca(self.dados[lista])
+        return indice
+
+    @property
+    def analise(self):
+        """``AnaliseVida`` do histórico, montada no primeiro uso (ler com o lock)"""
+        if self._analise is None:
+            with self.lock:
+                if self._analise is None:
+                    from analise import AnaliseVida
+                    self._analise = AnaliseVida(self.armazenamento.iterar_historico())
+        return self._analise
+
+    def inscrever(self, ao_alterar):
+        """Passa a avisar ``ao_alterar`` (método de uma sessão) das alterações"""
+        with self.lock:
+            self._inscritos.append(weakref.WeakMethod(ao_alterar))
+
+    def cancelar(self, ao_alterar):
+        with self.lock:
+            self._inscritos = [r for r in self._inscritos if r() not in (None, ao_alterar)]
+
+    def adicionar_maquina(self, nome):
+        """Inclui a máquina; retorna (nome, posição). ``ValueError`` se inválida"""
+        with self.lock:
+            nome, posicao = dominio.adicionar_maquina(self.dados, nome)
+            self._catalogo_alterado("maquinas", "maquina_adicionada", nome, posicao)
+        self._entregar_avisos()
+        return nome, posicao
+
+    def adicionar_ferramenta(self, nome, vida):
+        """Inclui a ferramenta; retorna (nome, posição). ``ValueError`` se inválida"""
+        with self.lock:
+            nome, posicao = dominio.adicionar_ferramenta(self.dados, nome, vida)
+            self._catalogo_alterado("ferramentas", "ferramenta_adicionada", nome, posicao)
+        self._entregar_avisos()
+        return nome, posicao
+
+    def remover_maquina(self, nome):
+        """Tira a máquina; ``ValueError`` se ela já não estava no catálogo"""
+        with self.lock:
+            posicao = dominio.remover_maquina(self.dados, nome)
+            self._catalogo_alterado("maquinas", "maquina_removida", nome, posicao)
+        self._entregar_avisos()
+        return posicao
+
+    def remover_ferramenta(self, nome):
+        """Tira a ferramenta; ``ValueError`` se ela já não estava no catálogo"""
+        with self.lock:
+            posicao = dominio.remover_ferramenta(self.dados, nome)
+            self._catalogo_alterado("ferramentas", "ferramenta_removida", nome, posicao)
+        self._entregar_avisos()
+        return posicao
+
+    def registrar_troca(self, registro):
+        """Grava uma troca no histórico e avisa as sessões
+
+        Não carrega o histórico: a troca vai direto para o armazenamento, que
+        atualiza a visão em memória só se ela já foi carregada.
+        """
+        with self.lock:
+            self.armazenamento.anexar_historico(registro)
+            if self._analise is not None:
+                self._analise.anexar(registro)
+            self._avisar("troca_registrada")
+        self._entregar_avisos()
+
+    def registrar_trocas(self, registros):
+        """Grava um lote de trocas de uma vez; retorna quantas gravou (ver ``anexar_varios``)"""
+        with self.lock:
+            registros = list(registros)
+            gravadas = self.armazenamento.anexar_varios(registros)
+            if gravadas and self._analise is not None:
+                if gravadas == len(registros):
+                    for registro in registros:
+                        self._analise.anexar(registro)
+                else:
+                    # Parte do lote já estava gravada: sem saber qual, remonta no próximo uso
+                    self._analise = None
+            if gravadas:
+                self._avisar("troca_registrada")
+        self._entregar_avisos()
+        return gravadas
+
+    def fechar(self):
+        # Sem o lock: a gravação pendente precisa dele para copiar o catálogo
+        self._gravacao.fechar()
+        with self.lock:
+            self.armazenamento.fechar()
+
+    def _catalogo_alterado(self, lista, evento, nome, posicao):
+        self.versao += 1
+        self.salvar_dados()
+        indice = self._indices.get(lista)
+        if indice is not None:
+            if evento.endswith("adicionada"):
+                indice.adicionar(nome)
+            else:
+                indice.remover(nome)
+        self._avisar(evento, nome, posicao)
+
+    def _avisar(self, evento, nome=None, posicao=None):
+        """Põe o aviso na fila para as sessões inscritas agora (chamar com o lock)"""
+        self._inscritos = [r for r in self._inscritos if r() is not None]  # sem as encerradas
+        self._avisos.append((tuple(self._inscritos), (evento, nome, posicao, self.versao)))
+
+    def _entregar_avisos(self):
+        """Entrega os avisos da fila, na ordem, fora do ``lock`` do repositório
+
+        Uma thread entrega por vez: quem encontra a entrega em andamento
+        deixa o seu aviso para ela, que confere a fila de novo ao terminar.
+        """
+        while self._avisos:
+            if not self._lock_avisos.acquire(blocking=False):
+                return
+            try:
+                while self._avisos:
+                    inscritos, argumentos = self._avisos.popleft()
+                    for referencia in inscritos:
+                        ao_alterar = referencia()
+                        if ao_alterar is None or referencia not in self._inscritos:
+                            continue  # sessão encerrada ou cancelada antes da entrega
+                        try:
+                            ao_alterar(*argumentos)
+                        except Exception as e:
+                            print(f"Erro ao avisar sessão: {e}")
+            finally:
+                self._lock_avisos.release()
+
+
+_repositorios = {}
+_lock_repositorios = threading.Lock()
+
+
+def obter_repositorio(arquivo_dados, arquivo_historico, tipo=None):
+    """Repositório do processo para esses arquivos (criado na primeira chamada)"""
+    chave = (os.path.abspath(arquivo_dados), os.path.abspath(arquivo_historico), tipo)
+    with _lock_repositorios:
+        repositorio = _repositorios.get(chave)
+        if repositorio is None:
+            repositorio = _repositorios[chave] = Repositorio(
+                arquivo_dados, arquivo_historico, tipo)
+        return repositorio
@@ -0,0 +1,101 @@
+"""Seletor com busca incremental para máquinas e ferramentas
+
+Substitui o ``ft.Dropdown`` quando o catálogo tem milhares de itens: o
+operador digita e vê as melhores sugestões do ``IndiceBusca``. A busca
+espera o operador parar de digitar (``ESPERA`` segundos) antes de rodar,
+e os botões de sugestão são criados uma vez e reaproveitados.
+"""
+import threading
+
+import flet as ft
+
+
+class SeletorBusca:
+    """Campo de texto + lista de sugestões; ``value`` é o item escolhido
+
+    Coloque ``seletor.controle`` no layout. ``value`` fica ``None`` até o
+    operador escolher uma sugestão ou digitar um nome exato do catálogo.
+    ``ao_atualizar`` é chamado quando a escolha ou as sugestões mudam.
+    A busca roda na thread do temporizador, dentro de um lote de
+    ``atualizacoes`` (``AtualizacoesAgrupadas`` da sessão): as sugestões e o
+    que ``ao_atualizar`` mudar vão ao cliente num único envio.
+
+    ``obter_indice`` devolve o ``IndiceBusca`` do catálogo, compartilhado
+    pelas sessões e mantido pelo repositório; é chamado só no primeiro uso,
+    para a montagem do índice não pesar na abertura do app.
+    """
+
+    ESPERA = 0.15
+    LIMITE = 8
+
+    def __init__(self, label, obter_indice, ao_atualizar, atualizacoes, hint_text=None):
+        self.obter_indice = obter_indice
+        self.ao_atualizar = ao_atualizar
+        self.atualizacoes = atualizacoes
+        self.value = None
+        self._temporizador = None
+        self._lock = threading.Lock()
+
+        self.campo = ft.TextField(
+            label=label,
+            border_radius=10,
+            hint_text=hint_text or "Digite para buscar...",
+            on_change=self._digitou,
+            on_focus=self._digitou
+        )
+        self.botoes = [
+            ft.TextButton("", visible=False, on_click=self._escolheu)
+            for _ in range(self.LIMITE)
+        ]
+        self.sugestoes = ft.Column(self.botoes, spacing=0, visible=False)
+        self.controle = ft.Column([self.campo, self.sugestoes], spacing=2, expand=True)
+
+    @property
+    def indice(self):
+        return self.obter_indice()
+
+    def removido(self, nome):
+        """Chamado depois de ``nome`` sair do catálogo (o índice já foi atualizado)"""
+        if self.value == nome:
+            self.limpar()
+
+    def limpar(self):
+        self.value = None
+        self.campo.value = ""
+        self.sugestoes.visible = False
+
+    def _digitou(self, e):
+        # O valor só vale se for um nome exato; senão o operador ainda está buscando
+        self.value = self.indice.exato(self.campo.value or "")
+        with self._lock:
+            if self._temporizador:
+                self._temporizador.cancel()
+            self._temporizador = threading.Timer(self.ESPERA, self._buscar)
+            self._temporizador.daemon = True
+            self._temporizador.start()
+
+    def _buscar(self):
+        with self.atualizacoes.lote():
+            nomes = self.indice.buscar(self.campo.value or "", self.LIMITE)
+            if nomes == [self.value]:
+                nomes = []  # já escolhido: não precisa sugerir
+            for botao, nome in zip(self.botoes, nomes):
+                botao.text = nome
+                botao.data = nome
+                botao.visible = True
+            for botao in self.botoes[len(nomes):]:
+                botao.visible = False
+            self.sugestoes.visible = bool(nomes)
+            self.atualizacoes.atualizar()
+            self.ao_atualizar()
+
+    def _escolheu(self, e):
+        with self._lock:
+            if self._temporizador:
+                self._temporizador.cancel()
+        with self.atualizacoes.lote():
+            self.value = e.control.data
+            self.campo.value = self.value
+            self.sugestoes.visible = False
+            self.atualizacoes.atualizar()
+            self.ao_atualizar()
@@ -0,0 +1,77 @@
+"""Servidores asyncio que rodam numa thread própria ao lado do app
+
+O Flet e a linha de comando são síncronos; os servidores de rede
+(contagem de peças, ingestão de trocas) precisam atender muitas conexões
+ao mesmo tempo. ``ServicoAsyncio`` abre o servidor TCP num laço de eventos
+numa thread daemon e devolve o controle quando ele já aceita conexões.
+"""
+import asyncio
+import threading
+
+
+class ServicoAsyncio:
+    """Servidor TCP asyncio numa thread; subclasses implementam ``_conexao``"""
+
+    nome_thread = "servico"
+
+    def __init__(self, host="0.0.0.0", porta=0):
+        self.host = host
+        self.porta = porta
+        self._loop = None
+        self._parar = None
+        self._thread = None
+
+    def iniciar(self):
+        """Abre o servidor e retorna quando ele já aceita conexões
+
+        Com ``porta`` 0 o sistema escolhe uma livre; ela fica em ``self.porta``.
+        """
+        pronto = threading.Event()
+        erros = []
+        self._thread = threading.Thread(target=self._rodar, args=(pronto, erros),
+                                        name=self.nome_thread, daemon=True)
+        self._thread.start()
+        pronto.wait()
+        if erros:
+            raise erros[0]
+        return self
+
+    def aguardar(self):
+        """Bloqueia até ``parar`` (ou Ctrl+C, que também para o servidor)"""
+        try:
+            while self._thread.is_alive():
+                self._thread.join(0.5)
+        except KeyboardInterrupt:
+            self.parar()
+
+    def parar(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._parar.set)
+            self._thread.join()
+
+    def _rodar(self, pronto, erros):
+        try:
+            asyncio.run(self._servir(pronto))
+        except Exception as e:
+            erros.append(e)
+            pronto.set()
+
+    async def _servir(self, pronto):
+        self._parar = asyncio.Event()
+        servidor = await asyncio.start_server(self._conexao, self.host, self.porta)
+        self.porta = servidor.sockets[0].getsockname()[1]
+        self._loop = asyncio.get_running_loop()
+        await self._ao_iniciar()
+        pronto.set()
+        async with servidor:
+            await self._parar.wait()
+        await self._ao_parar()
+
+    async def _ao_iniciar(self):
+        """Tarefas de fundo que precisam do laço (chamado antes de aceitar conexões)"""
+
+    async def _ao_parar(self):
+        """Esvazia o que ficou pendente antes de o laço terminar"""
+
+    async def _conexao(self, leitor, escritor):
+        raise NotImplementedError
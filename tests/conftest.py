@@ -0,0 +1,5 @@
+"""Configuração comum dos testes: o projeto não é um pacote instalado"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,81 @@
+"""Acervo de PDFs: ida e volta, deduplicação e reabertura"""
+import os
+
+import pytest
+
+import acervo
+from acervo import AcervoRelatorios, chave_do_registro
+
+
+def pdf(texto):
+    return b"%PDF-1.3\n" + texto.encode() * 500 + b"\n%%EOF\n"
+
+
+@pytest.fixture
+def pasta(tmp_path):
+    return str(tmp_path / "acervo_relatorios")
+
+
+def test_ida_e_volta_e_reabertura(pasta, tmp_path):
+    relatorios = AcervoRelatorios(pasta)
+    relatorios.guardar("a" * 32, pdf("primeira"), "Relatorio_Troca_a.pdf")
+    relatorios.guardar("b" * 32, pdf("segunda"), "Relatorio_Troca_b.pdf")
+    assert relatorios.ler("a" * 32) == pdf("primeira")
+    relatorios.fechar()
+
+    relatorios = AcervoRelatorios(pasta)
+    assert len(relatorios) == 2
+    assert relatorios.ler("b" * 32) == pdf("segunda")
+    destino = relatorios.extrair("b" * 32, str(tmp_path))
+    assert os.path.basename(destino) == "Relatorio_Troca_b.pdf"
+    with open(destino, "rb") as f:
+        assert f.read() == pdf("segunda")
+    with pytest.raises(KeyError):
+        relatorios.ler("c" * 32)
+    relatorios.fechar()
+
+
+def test_conteudo_igual_gravado_uma_vez(pasta):
+    relatorios = AcervoRelatorios(pasta)
+    for chave in ("a" * 32, "b" * 32, "c" * 32):
+        relatorios.guardar(chave, pdf("igual"), f"{chave}.pdf")
+    relatorios.guardar("a" * 32, pdf("igual"), "a" * 32 + ".pdf")  # de novo: nada muda
+    estatisticas = relatorios.estatisticas()
+    assert (estatisticas["relatorios"], estatisticas["conteudos"]) == (3, 1)
+    assert estatisticas["bytes_comprimidos"] < estatisticas["bytes_originais"]
+    with open(relatorios.arquivo_indice, "rb") as f:
+        assert len(f.readlines()) == 4  # um conteúdo e três ligações
+    relatorios.fechar()
+
+
+def test_segmento_novo_ao_passar_do_tamanho(pasta, monkeypatch):
+    monkeypatch.setattr(acervo, "TAMANHO_SEGMENTO", 200)
+    relatorios = AcervoRelatorios(pasta)
+    for i in range(3):
+        relatorios.guardar(f"{i:032x}", os.urandom(150), f"{i}.pdf")
+    assert relatorios.estatisticas()["segmentos"] == 3
+    relatorios.fechar()
+    relatorios = AcervoRelatorios(pasta)
+    assert all(len(relatorios.ler(f"{i:032x}")) == 150 for i in range(3))
+    relatorios.fechar()
+
+
+def test_indice_truncado_na_queda(pasta):
+    relatorios = AcervoRelatorios(pasta)
+    relatorios.guardar("a" * 32, pdf("primeira"), "a.pdf")
+    relatorios.fechar()
+    with open(os.path.join(pasta, "indice.jsonl"), "a", encoding="utf-8") as f:
+        f.write('{"chave": "bbbb", "ha')
+    relatorios = AcervoRelatorios(pasta)
+    assert len(relatorios) == 1 and "bbbb" not in relatorios
+    relatorios.guardar("c" * 32, pdf("terceira"), "c.pdf")
+    relatorios.fechar()
+    relatorios = AcervoRelatorios(pasta)
+    assert relatorios.ler("c" * 32) == pdf("terceira")
+    relatorios.fechar()
+
+
+def test_chave_de_troca_antiga_sem_id():
+    registro = {"instante": 1_700_000_000, "maquina": "301", "ferramenta": "Broca 8"}
+    assert chave_do_registro(registro) == "1700000000:301:Broca 8"
+    assert chave_do_registro(dict(registro, id_troca="f" * 32)) == "f" * 32
@@ -0,0 +1,103 @@
+"""Análise de vida: estatísticas conferidas com o cálculo direto, anexar incremental"""
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from analise import AnaliseVida, quantis_agrupados
+from repositorio import Repositorio
+
+MOTIVOS = ["✅ Completou a Vida Útil", "💥 Quebrou", "🔧 Troca Preventiva"]
+
+
+def trocas(quantidade, semente=1):
+    sorteio = random.Random(semente)
+    resultado = []
+    for i in range(quantidade):
+        pecas = sorteio.randint(0, 2000)
+        resultado.append({
+            "instante": 1_700_000_000 + i * 60, "operador": f"Operador {sorteio.randint(0, 4)}",
+            "maquina": str(301 + sorteio.randint(0, 3)),
+            "ferramenta": f"Ferramenta {sorteio.randint(0, 6)}", "lote": "OP-1",
+            "pecas_feitas": pecas, "vida_esperada": 1000, "percentual": pecas / 10,
+            "motivo": sorteio.choice(MOTIVOS), "observacoes": "", "id_troca": f"{i:032x}",
+        })
+    return resultado
+
+
+def resumo_direto(registros, dimensao):
+    grupos = {}
+    for registro in registros:
+        grupos.setdefault(registro[dimensao], []).append(registro)
+    resultado = {}
+    for nome, linhas in grupos.items():
+        pecas = np.array([r["pecas_feitas"] for r in linhas], np.float64)
+        p10, mediana, p90 = np.percentile(pecas, [10, 50, 90])
+        resultado[nome] = {
+            "trocas": len(linhas), "media": pecas.mean(), "p10": p10, "mediana": mediana,
+            "p90": p90, "media_percentual": np.mean([r["percentual"] for r in linhas]),
+            "taxa_quebra": sum("Quebrou" in r["motivo"] for r in linhas) / len(linhas),
+        }
+    return resultado
+
+
+def conferir(analise, registros):
+    for dimensao in ("ferramenta", "maquina", "operador"):
+        esperado = resumo_direto(registros, dimensao)
+        obtido = analise.resumo(dimensao)
+        assert set(obtido) == set(esperado)
+        for nome, estatisticas in esperado.items():
+            for chave, valor in estatisticas.items():
+                assert obtido[nome][chave] == pytest.approx(valor), (dimensao, nome, chave)
+
+
+def test_quantis_agrupados_iguais_ao_percentile():
+    sorteio = np.random.default_rng(3)
+    codigos = sorteio.integers(0, 5, 500).astype(np.int32)
+    valores = sorteio.integers(0, 3000, 500)
+    quantis = quantis_agrupados(codigos, valores, 6)
+    for grupo in range(5):
+        assert quantis[grupo] == pytest.approx(
+            np.percentile(valores[codigos == grupo], [10, 50, 90]))
+    assert np.isnan(quantis[5]).all()  # grupo sem trocas
+
+
+def test_resumo_confere_com_o_calculo_direto():
+    registros = trocas(800)
+    conferir(AnaliseVida(registros), registros)
+
+
+def test_anexar_igual_a_remontar():
+    registros = trocas(600)
+    analise = AnaliseVida(registros[:400])
+    analise.resumo("ferramenta")  # agregados já calculados: anexar os atualiza
+    novos = registros[400:] + [dict(registros[0], ferramenta="Ferramenta nova",
+                                    motivo="⚠️ Motivo novo", id_troca="f" * 32)]
+    for registro in novos:
+        analise.anexar(registro)
+    todos = registros[:400] + novos
+    conferir(analise, todos)
+    remontada = AnaliseVida(todos)
+    for dimensao in ("ferramenta", "maquina", "operador"):
+        assert analise.resumo(dimensao) == remontada.resumo(dimensao)
+    assert analise.comparar_operadores() == remontada.comparar_operadores()
+
+
+def test_repositorio_acompanha_as_trocas_registradas(tmp_path):
+    repositorio = Repositorio(str(tmp_path / "ferramental.json"),
+                              str(tmp_path / "historico_trocas.json"), "json")
+    registros = trocas(50)
+    repositorio.armazenamento.anexar_varios(registros[:30])
+    analise = repositorio.analise
+    for registro in registros[30:40]:
+        repositorio.registrar_troca(registro)
+    repositorio.registrar_trocas(registros[40:])
+    assert repositorio.analise is analise
+    conferir(analise, registros)
+
+    # Lote com uma troca já gravada: a análise é remontada do histórico
+    repositorio.registrar_trocas([registros[0], dict(registros[1], id_troca="e" * 32)])
+    assert repositorio.analise is not analise
+    assert repositorio.analise.n == 51
+    repositorio.fechar()
@@ -0,0 +1,139 @@
+"""Armazenamento do histórico: JSON (diário) e SQLite"""
+from datetime import datetime
+
+import pytest
+
+from armazenamento import ArmazenamentoJSON, DiarioHistorico, criar_armazenamento
+
+
+def troca(i, id_troca=None):
+    return {
+        "instante": 1_700_000_000 + i * 60, "operador": f"Operador {i % 3}",
+        "maquina": str(300 + i % 4), "ferramenta": f"Ferramenta {i % 5}", "lote": "OP-1",
+        "pecas_feitas": 100 + i, "vida_esperada": 1000, "percentual": 10.0,
+        "motivo": "✅ Completou a Vida Útil", "observacoes": "",
+        "id_troca": id_troca or f"{i:032x}",
+    }
+
+
+@pytest.fixture
+def arquivo_historico(tmp_path):
+    return str(tmp_path / "historico_trocas.json")
+
+
+def test_anexar_sem_carregar_o_historico(arquivo_historico):
+    diario = DiarioHistorico(arquivo_historico, limite_compactacao=5)
+    diario.carregar()
+    diario.anexar_varios([troca(i) for i in range(7)])  # passa do limite: compacta
+    diario.fechar()
+
+    diario = DiarioHistorico(arquivo_historico, limite_compactacao=5)
+    # Sem carregar: a já gravada (3) sai pelos ids do snapshot, a repetida no lote também
+    assert diario.anexar_varios([troca(3), troca(7), troca(7)]) == 1
+    assert diario.anexar_varios([troca(7)]) == 0
+    # Troca nova (anexar) não confere; a repetida é descartada ao carregar
+    diario.anexar(troca(8))
+    diario.anexar(troca(8))
+    assert not diario.carregado
+    diario.fechar()
+
+    diario = DiarioHistorico(arquivo_historico, limite_compactacao=5)
+    historico = diario.carregar()
+    assert len(historico) == 9
+    assert historico[0]["id_troca"] == troca(8)["id_troca"]
+    diario.anexar(troca(9))
+    assert len(historico) == 10  # carregado: a visão em memória acompanha
+    diario.fechar()
+
+
+def test_armazenamento_json_anexa_sem_carregar(tmp_path, arquivo_historico):
+    armazenamento = ArmazenamentoJSON(str(tmp_path / "ferramental.json"), arquivo_historico)
+    armazenamento.anexar_historico(troca(0))
+    assert not armazenamento.diario.carregado
+    armazenamento.fechar()
+
+    armazenamento = ArmazenamentoJSON(str(tmp_path / "ferramental.json"), arquivo_historico)
+    assert [r["id_troca"] for r in armazenamento.carregar_historico()] == [troca(0)["id_troca"]]
+    armazenamento.fechar()
+
+
+def test_consulta_carrega_o_historico(tmp_path, arquivo_historico):
+    armazenamento = ArmazenamentoJSON(str(tmp_path / "ferramental.json"), arquivo_historico)
+    armazenamento.anexar_varios([troca(i) for i in range(3)])
+    armazenamento.fechar()
+
+    armazenamento = ArmazenamentoJSON(str(tmp_path / "ferramental.json"), arquivo_historico)
+    assert armazenamento.buscar_troca(troca(1)["id_troca"])["pecas_feitas"] == 101
+    assert [r["pecas_feitas"] for r in armazenamento.consultar_historico(limite=2)] == [102, 101]
+    assert armazenamento.carregar_historico() is armazenamento.carregar_historico()
+    armazenamento.fechar()
+
+
+@pytest.fixture
+def dois_armazenamentos(tmp_path):
+    # Instantes fora de ordem e repetidos: a ordem no empate é a de chegada
+    trocas = [dict(troca(i), instante=1_700_000_000 + (i * 37) % 50 * 60) for i in range(120)]
+    armazenamentos = {}
+    for tipo in ("json", "sqlite"):
+        pasta = tmp_path / tipo
+        pasta.mkdir()
+        armazenamento = criar_armazenamento(str(pasta / "ferramental.json"),
+                                            str(pasta / "historico_trocas.json"), tipo)
+        armazenamento.anexar_varios(trocas[:70])
+        for registro in trocas[70:]:
+            armazenamento.anexar_historico(registro)
+        armazenamentos[tipo] = armazenamento
+    yield armazenamentos
+    for armazenamento in armazenamentos.values():
+        armazenamento.fechar()
+
+
+@pytest.mark.parametrize("filtros", [
+    {},
+    {"maquina": "301"},
+    {"ferramenta": "Ferramenta 2", "operador": "Operador 1"},
+    {"inicio": datetime.fromtimestamp(1_700_000_000 + 600),
+     "fim": datetime.fromtimestamp(1_700_000_000 + 2400)},
+    {"maquina": "302", "inicio": datetime.fromtimestamp(1_700_000_000 + 900)},
+    {"maquina": "inexistente"},
+])
+def test_json_e_sqlite_paginam_igual(dois_armazenamentos, filtros):
+    paginas = {}
+    for tipo, armazenamento in dois_armazenamentos.items():
+        paginas[tipo] = [
+            [r["id_troca"] for r in armazenamento.consultar_historico(
+                limite=13, deslocamento=deslocamento, **filtros)]
+            for deslocamento in range(0, 130, 13)]
+        paginas[tipo].append([r["id_troca"] for r in armazenamento.iterar_historico(
+            tamanho_pagina=7, **filtros)])
+    assert paginas["json"] == paginas["sqlite"]
+    # A última entrada (iterar) é a ordem crescente das páginas decrescentes
+    assert sum(paginas["json"][:-1], [])[::-1] == paginas["json"][-1]
+
+
+def test_sqlite_sequencia_na_ordem_da_consulta(dois_armazenamentos):
+    armazenamento = dois_armazenamentos["sqlite"]
+    historico = armazenamento.carregar_historico()
+    esperado = [r["id_troca"] for r in armazenamento.consultar_historico()]
+    historico.TAMANHO_PAGINA = 7  # várias páginas na iteração
+    assert [r["id_troca"] for r in historico] == esperado
+    assert [r["id_troca"] for r in historico[10:40]] == esperado[10:40]
+    assert historico[0]["id_troca"] == esperado[0]
+    assert historico[-1]["id_troca"] == esperado[-1]
+
+
+def test_migracao_conta_as_trocas_gravadas(tmp_path):
+    import json
+    from armazenamento import migrar_json_para_sqlite
+
+    arquivo_historico = tmp_path / "historico_trocas.json"
+    # Histórico antigo (lista) com uma troca reenviada
+    trocas = [troca(2), troca(1), troca(1), troca(0)]
+    arquivo_historico.write_text(json.dumps(trocas), encoding="utf-8")
+    banco = str(tmp_path / "ferramental.db")
+    migradas = migrar_json_para_sqlite(str(tmp_path / "ferramental.json"),
+                                       str(arquivo_historico), banco)
+    armazenamento = criar_armazenamento(str(tmp_path / "ferramental.json"),
+                                        str(arquivo_historico), "sqlite")
+    assert migradas == len(armazenamento.carregar_historico()) == 3
+    armazenamento.fechar()
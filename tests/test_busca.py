@@ -0,0 +1,95 @@
+"""Busca no catálogo: prefixo pela trie, trigramas, nome exato e o seletor da tela"""
+import threading
+
+import pytest
+
+from busca import IndiceBusca, normalizar
+
+FERRAMENTAS = ["Broca Ø6mm", "Broca Ø8mm", "Broca Ø10mm", "Macho M6", "Macho M8",
+               "Inserto CNMG", "Inserto DNMG", "Bedame 12mm", "Fresa Ø16mm", "Broca"]
+
+
+@pytest.fixture
+def indice():
+    return IndiceBusca(FERRAMENTAS)
+
+
+def test_normalizar():
+    assert normalizar("  Broca   Ø6MM ") == "broca o6mm"
+    assert normalizar("Ação Çé") == "acao ce"
+
+
+def test_prefixo_pela_trie(indice):
+    # Igual primeiro, depois os que começam com a consulta, mais curtos antes
+    assert indice.buscar("broca") == ["Broca", "Broca Ø6mm", "Broca Ø8mm", "Broca Ø10mm"]
+    assert indice.buscar("BROCA o1")[0] == "Broca Ø10mm"  # os parecidos vêm depois
+    assert indice.buscar("m") == ["Macho M6", "Macho M8"]
+    # Começo de outra palavra do nome; o parecido vem depois
+    assert indice.buscar("cnmg") == ["Inserto CNMG", "Inserto DNMG"]
+    assert indice.buscar("m8")[0] == "Macho M8"
+    assert indice.buscar("broca", limite=2) == ["Broca", "Broca Ø6mm"]
+    assert indice.buscar("   ") == []
+
+
+def test_trecho_do_meio_e_erro_de_digitacao(indice):
+    # Trecho no meio do nome antes dos só parecidos
+    assert indice.buscar("16mm") == ["Fresa Ø16mm", "Broca Ø6mm"]
+    assert indice.buscar("inserot")[0] == "Inserto CNMG"  # letras trocadas
+    assert indice.buscar("bedme") == ["Bedame 12mm"]  # letra faltando
+    assert indice.buscar("xyzw") == []
+
+
+def test_exato(indice):
+    assert indice.exato("macho m8") == "Macho M8"
+    assert indice.exato("Broca") == "Broca"
+    assert indice.exato("Broca Ø") is None
+    assert indice.exato("") is None
+
+
+def test_incluir_e_remover_no_lugar(indice):
+    indice.adicionar("Broca Ø12mm")
+    assert "Broca Ø12mm" in indice.buscar("broca o1")
+    indice.remover("Broca")
+    indice.remover("Broca Ø6mm")
+    assert indice.buscar("broca") == ["Broca Ø8mm", "Broca Ø10mm", "Broca Ø12mm"]
+    assert indice.exato("broca") is None
+    for nome in list(indice.normalizados):
+        indice.remover(nome)
+    assert len(indice) == 0
+    assert not indice.raiz.filhos and not indice.por_trigrama  # nós vazios podados
+
+
+def test_seletor_busca_envia_a_pagina_uma_vez():
+    pytest.importorskip("flet")
+    from main import AtualizacoesAgrupadas
+    from seletor import SeletorBusca
+
+    class Pagina:
+        def __init__(self):
+            self.envios = []
+
+        def update(self):
+            self.envios.append(threading.current_thread().name)
+
+    pagina = Pagina()
+    atualizacoes = AtualizacoesAgrupadas(pagina)
+    chamadas = []
+
+    def ao_atualizar():
+        chamadas.append(seletor.value)
+        atualizacoes.atualizar()  # como o cabecalho_alterado do app
+
+    indice = IndiceBusca(FERRAMENTAS)
+    seletor = SeletorBusca("Ferramenta", lambda: indice, ao_atualizar, atualizacoes)
+    seletor.ESPERA = 0
+    seletor.campo.value = "macho"
+    seletor._digitou(None)
+    seletor._temporizador.join()
+    assert [b.text for b in seletor.botoes if b.visible] == ["Macho M6", "Macho M8"]
+    assert seletor.value is None and chamadas == [None]
+    assert len(pagina.envios) == 1  # sugestões e ao_atualizar num envio só
+
+    evento = type("Evento", (), {"control": seletor.botoes[1]})()
+    seletor._escolheu(evento)
+    assert seletor.value == "Macho M8" and not seletor.sugestoes.visible
+    assert len(pagina.envios) == 2
@@ -0,0 +1,69 @@
+"""Linha de comando: os comandos principais de ponta a ponta numa pasta vazia"""
+import json
+
+import pytest
+
+import cli
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def executar(request, tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+
+    def executar(*argumentos):
+        codigo = cli.principal(["--armazenamento", request.param, *argumentos])
+        saida = capsys.readouterr()
+        return codigo, saida.out, saida.err
+
+    return executar
+
+
+def test_registrar_e_exportar(executar, tmp_path):
+    for pecas in (780, 1300):
+        codigo, saida, _ = executar("registrar", "--operador", "Ana", "--maquina", "301",
+                                    "--ferramenta", "Macho M6", "--pecas", str(pecas))
+        assert codigo == 0 and "Troca registrada" in saida
+    assert "162.5%" in saida  # vida do catálogo: 800 peças
+
+    codigo, saida, _ = executar("exportar", "trocas.jsonl")
+    assert codigo == 0 and saida.startswith("2 trocas exportadas")
+    linhas = [json.loads(l) for l in (tmp_path / "trocas.jsonl").read_text("utf-8").splitlines()]
+    assert [l["pecas_feitas"] for l in linhas] == [780, 1300]
+    assert {l["operador"] for l in linhas} == {"Ana"}
+
+
+def test_registrar_nao_carrega_o_historico(executar, monkeypatch):
+    from armazenamento import Armazenamento, ArmazenamentoJSON, ArmazenamentoSQLite
+
+    def proibido(self):
+        raise AssertionError("registrar não deve ler o histórico")
+
+    for classe in (Armazenamento, ArmazenamentoJSON, ArmazenamentoSQLite):
+        monkeypatch.setattr(classe, "carregar_historico", proibido)
+    codigo, _, _ = executar("registrar", "--operador", "Ana", "--maquina", "301",
+                            "--ferramenta", "Broca Ø6mm", "--pecas", "10")
+    assert codigo == 0
+
+
+def test_importar_e_catalogo(executar, tmp_path):
+    (tmp_path / "mes.csv").write_text(
+        "data,operador,maquina,ferramenta,pecas_feitas,motivo\n"
+        "2026-10-01T08:00:00,Ana,301,Macho M6,400,Quebrou\n"
+        "2026-10-01T09:00:00,Bia,302,Broca Ø6mm,nada,Quebrou\n", encoding="utf-8")
+    codigo, saida, _ = executar("importar", "mes.csv", "--rejeitadas", "rejeitadas.csv")
+    assert codigo == 0
+    assert "1 trocas importadas" in saida and "1 rejeitadas" in saida
+    assert (tmp_path / "rejeitadas.csv").exists()
+
+    codigo, _, _ = executar("catalogo", "adicionar-ferramenta", "Broca Ø10mm", "--vida", "1100")
+    assert codigo == 0
+    _, saida, _ = executar("catalogo", "listar")
+    assert "Broca Ø10mm (1100 peças)" in saida
+
+
+def test_erro_de_validacao_retorna_1(executar):
+    codigo, _, erro = executar("reimprimir", "0" * 32)
+    assert codigo == 1 and "Troca não encontrada" in erro
+    codigo, _, erro = executar("registrar", "--operador", "Ana", "--maquina", "301",
+                               "--ferramenta", "Macho M6", "--pecas", "-1")
+    assert codigo == 1 and "negativo" in erro
@@ -0,0 +1,86 @@
+"""Contagem de peças: lotes do servidor, zerar na troca e gravação atômica"""
+import json
+import os
+import socket
+import time
+
+import pytest
+
+import contagem
+from contagem import ContadorPecas, ServidorContagem, ler_evento
+
+
+@pytest.fixture
+def contador(tmp_path):
+    return ContadorPecas(str(tmp_path / "contagem_pecas.json"))
+
+
+def test_ler_evento():
+    assert ler_evento(" 301 ; Broca Ø6mm ; 5") == ("301", "Broca Ø6mm", 5)
+    assert ler_evento("301;Macho M6") == ("301", "Macho M6", 1)
+    for linha in ("301", "301;;2", "301;Macho M6;-1", "301;Macho M6;x", "a;b;1;2"):
+        with pytest.raises(ValueError):
+            ler_evento(linha)
+
+
+def test_somar_lote_de_uma_vez(contador):
+    contador.somar({("301", "Broca"): 7, ("302", "Broca"): 2}, eventos=5, rejeitados=1)
+    contador.somar({("301", "Broca"): 3}, eventos=3)
+    contador.registrar("302", "Broca")
+    assert contador.pecas("301", "Broca") == 10 and contador.pecas("302", "Broca") == 3
+    assert (contador.eventos, contador.rejeitados) == (9, 1)
+    assert contador.situacao("301", "Broca", 40) == (10, 30, 25.0)
+    assert contador.situacao("301", "Broca", 0)[1] is None
+
+    # Lote só com rejeitadas não marca alteração: nada a gravar
+    vazio = ContadorPecas(contador.arquivo + ".outro")
+    vazio.somar({}, eventos=0, rejeitados=4)
+    vazio.gravar()
+    assert vazio.rejeitados == 4 and not os.path.exists(vazio.arquivo)
+
+
+def test_zerar_desconta_so_o_que_o_operador_viu(contador):
+    contador.somar({("301", "Broca"): 500, ("302", "Macho"): 80})
+    contador.zerar("301", "Broca", descontar=480)  # 20 chegaram depois do preenchimento
+    assert contador.pecas("301", "Broca") == 20
+    contador.zerar("301", "Broca", descontar=50)
+    assert ("301", "Broca") not in contador.contagens
+    contador.zerar("302", "Macho")
+    assert contador.contagens == {}
+
+
+def test_gravar_atomico_e_recarregar(contador, monkeypatch):
+    contador.somar({("301", "Broca Ø6mm"): 12, ("302", "Macho"): 4})
+    contador.gravar()
+    assert not os.path.exists(contador.arquivo + ".tmp")
+    with open(contador.arquivo, encoding="utf-8") as f:
+        assert json.load(f)["versao"] == contagem.VERSAO_ARQUIVO
+    assert ContadorPecas(contador.arquivo).contagens == contador.contagens
+
+    # Falha ao trocar o arquivo: o anterior fica inteiro e a próxima gravação tenta de novo
+    def falhar(origem, destino):
+        raise OSError("disco cheio")
+
+    contador.registrar("301", "Broca Ø6mm", 3)
+    with monkeypatch.context() as m:
+        m.setattr(contagem.os, "replace", falhar)
+        contador.gravar()
+    assert ContadorPecas(contador.arquivo).pecas("301", "Broca Ø6mm") == 12
+    contador.gravar()
+    assert ContadorPecas(contador.arquivo).pecas("301", "Broca Ø6mm") == 15
+
+
+def test_servidor_soma_linhas_por_leitura(contador):
+    servidor = ServidorContagem(contador, "127.0.0.1").iniciar()
+    try:
+        with socket.create_connection(("127.0.0.1", servidor.porta)) as conexao:
+            conexao.sendall(b"301;Broca;2\n\n301;Broca\n302;Macho;x\n30")
+            conexao.sendall(b"2;Macho;4\n")
+        limite = time.monotonic() + 5
+        while contador.eventos + contador.rejeitados < 4:
+            assert time.monotonic() < limite, "servidor não somou os eventos"
+            time.sleep(0.01)
+    finally:
+        servidor.parar()
+    assert contador.contagens == {("301", "Broca"): 3, ("302", "Macho"): 4}
+    assert (contador.eventos, contador.rejeitados) == (3, 1)
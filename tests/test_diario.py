@@ -0,0 +1,131 @@
+"""Diário do histórico: reaplicação depois de queda, compactação e migração"""
+import json
+import os
+
+import pytest
+
+from armazenamento import DiarioHistorico
+from historico import formatar_data
+
+
+def troca(i):
+    return {
+        "instante": 1_700_000_000 + i * 60, "operador": "Ana", "maquina": "301",
+        "ferramenta": "Broca 8", "lote": "OP-1", "pecas_feitas": i, "vida_esperada": 1000,
+        "percentual": 0.0, "motivo": "✅ Completou a Vida Útil", "observacoes": "",
+        "id_troca": f"{i:032x}",
+    }
+
+
+def pecas(historico):
+    return [r["pecas_feitas"] for r in historico]
+
+
+def test_reaplica_o_diario_e_descarta_linha_truncada(tmp_path):
+    arquivo = str(tmp_path / "historico_trocas.json")
+    diario = DiarioHistorico(arquivo)
+    diario.carregar()
+    for i in range(3):
+        diario.anexar(troca(i))
+    diario.fechar()
+    # Queda no meio da gravação da quarta troca
+    with open(diario.arquivo_diario, "a", encoding="utf-8") as f:
+        f.write('{"seq": 4, "registro": {"instante": 17')
+
+    diario = DiarioHistorico(arquivo)
+    assert pecas(diario.carregar()) == [2, 1, 0]
+    diario.anexar(troca(3))
+    diario.fechar()
+    assert pecas(DiarioHistorico(arquivo).carregar()) == [3, 2, 1, 0]
+
+
+def test_compactacao_grava_snapshot_e_esvazia_o_diario(tmp_path):
+    arquivo = str(tmp_path / "historico_trocas.json")
+    diario = DiarioHistorico(arquivo, limite_compactacao=4)
+    diario.carregar()
+    diario.anexar_varios([troca(i) for i in range(5)])
+    diario.compactar()
+    diario.anexar(troca(5))
+    diario.fechar()
+
+    with open(arquivo, encoding="utf-8") as f:
+        cabecalho = json.loads(f.readline())
+        assert cabecalho == {"versao": DiarioHistorico.VERSAO_SNAPSHOT, "ultimo_seq": 5,
+                             "quantidade": 5}
+        assert len(f.readlines()) == 5
+    assert not os.path.exists(diario.arquivo_rotacionado)
+    assert pecas(DiarioHistorico(arquivo).carregar()) == [5, 4, 3, 2, 1, 0]
+
+
+def test_compactacao_interrompida_e_retomada(tmp_path):
+    arquivo = str(tmp_path / "historico_trocas.json")
+    diario = DiarioHistorico(arquivo)
+    diario.carregar()
+    diario.anexar_varios([troca(i) for i in range(3)])
+    diario.fechar()
+    # Queda depois de rotacionar o diário, antes de gravar o snapshot
+    os.replace(diario.arquivo_diario, diario.arquivo_rotacionado)
+
+    diario = DiarioHistorico(arquivo)
+    diario.carregar()
+    diario.anexar(troca(3))
+    diario.compactar()
+    diario.fechar()
+    assert not os.path.exists(diario.arquivo_rotacionado)
+    assert pecas(DiarioHistorico(arquivo).carregar()) == [3, 2, 1, 0]
+
+
+def sem_instante(registro):
+    antigo = {k: v for k, v in registro.items() if k not in ("instante", "id_troca")}
+    antigo["data"] = formatar_data(registro["instante"])
+    return antigo
+
+
+@pytest.mark.parametrize("formato", ["v1", "v2"])
+def test_migra_snapshot_antigo_para_a_versao_atual(tmp_path, formato):
+    arquivo = str(tmp_path / "historico_trocas.json")
+    # Formatos antigos: mais novo primeiro, data em texto, sem instante
+    registros = [sem_instante(troca(i)) for i in (2, 1, 0)]
+    with open(arquivo, "w", encoding="utf-8") as f:
+        json.dump(registros if formato == "v1" else {"registros": registros, "ultimo_seq": 0}, f)
+
+    diario = DiarioHistorico(arquivo)
+    historico = diario.carregar()
+    diario.fechar()  # espera a compactação que regrava no formato novo
+    assert pecas(historico) == [2, 1, 0]
+    # A data em texto não tem segundos: o instante sai arredondado ao minuto
+    assert [r["instante"] for r in historico] == [troca(i)["instante"] // 60 * 60
+                                                 for i in (2, 1, 0)]
+
+    with open(arquivo, encoding="utf-8") as f:
+        assert json.loads(f.readline())["versao"] == 4
+        gravados = [json.loads(linha) for linha in f]
+    assert all("data" not in r and "instante" in r for r in gravados)
+    assert pecas(DiarioHistorico(arquivo).carregar()) == [2, 1, 0]
+
+
+def test_carga_grande_sem_carregar_compacta_em_fluxo(tmp_path, monkeypatch):
+    arquivo = str(tmp_path / "historico_trocas.json")
+    diario = DiarioHistorico(arquivo, limite_compactacao=10)
+    compactacoes = []
+    iniciar = diario._iniciar_compactacao
+    monkeypatch.setattr(diario, "_iniciar_compactacao",
+                        lambda: compactacoes.append(diario._pendentes) or iniciar())
+
+    diario.anexar(troca(0))  # troca nova, sem ler os ids
+    diario.anexar(troca(0))  # repetida: pulada quando os ids forem lidos
+    for inicio in range(0, 400, 20):
+        # Cada lote reenvia o anterior: só metade é nova
+        diario.anexar_varios([troca(i) for i in range(max(inicio - 20, 0), inicio + 20)])
+    diario.compactar()
+    diario.fechar()
+    assert not diario.carregado
+    # O limiar acompanha o snapshot: poucas regravações, não uma por lote
+    assert len(compactacoes) <= 7
+
+    with open(arquivo, encoding="utf-8") as f:
+        cabecalho = json.loads(f.readline())
+        linhas = f.readlines()
+    assert cabecalho["quantidade"] == len(linhas) == 400
+    assert os.path.getsize(diario.arquivo_diario) == 0
+    assert pecas(DiarioHistorico(arquivo).carregar()) == list(range(399, -1, -1))
@@ -0,0 +1,69 @@
+"""Regras do domínio: catálogo ordenado com posições e registro de troca"""
+import random
+from datetime import datetime
+
+import pytest
+
+import dominio
+
+
+def catalogo():
+    return dominio.ordenar_catalogo({
+        "maquinas": ["305", "301", "303"],
+        "ferramentas": ["Macho M6", "Broca Ø6mm"],
+        "vida_padrao": {"Macho M6": 800, "Broca Ø6mm": 1500},
+    })
+
+
+def test_incluir_e_remover_mantem_a_ordem_e_devolvem_a_posicao():
+    dados = catalogo()
+    assert dados["maquinas"] == ["301", "303", "305"]
+    sorteio = random.Random(11)
+    nomes = [f"{sorteio.randint(100, 999)}" for _ in range(200)]
+    for nome in nomes:
+        if nome in dados["maquinas"]:
+            continue
+        antes = list(dados["maquinas"])
+        nome_gravado, posicao = dominio.adicionar_maquina(dados, f"  {nome} ")
+        assert nome_gravado == nome
+        assert dados["maquinas"] == sorted(antes + [nome])
+        assert dados["maquinas"][posicao] == nome
+
+    for nome in sorteio.sample(list(dados["maquinas"]), 50):
+        posicao = dados["maquinas"].index(nome)
+        assert dominio.remover_maquina(dados, nome) == posicao
+        assert nome not in dados["maquinas"]
+    assert dados["maquinas"] == sorted(dados["maquinas"])
+
+
+def test_ferramenta_com_vida_e_posicao():
+    dados = catalogo()
+    assert dominio.adicionar_ferramenta(dados, "Fresa Ø16mm", "900") == ("Fresa Ø16mm", 1)
+    assert dados["ferramentas"] == ["Broca Ø6mm", "Fresa Ø16mm", "Macho M6"]
+    assert dados["vida_padrao"]["Fresa Ø16mm"] == 900
+    assert dominio.remover_ferramenta(dados, "Broca Ø6mm") == 0
+    assert "Broca Ø6mm" not in dados["vida_padrao"]
+
+
+@pytest.mark.parametrize("acao, argumentos, mensagem", [
+    (dominio.adicionar_maquina, ("301",), "já existe"),
+    (dominio.adicionar_maquina, ("  ",), "Digite o nome"),
+    (dominio.adicionar_ferramenta, ("Macho M6", 500), "já existe"),
+    (dominio.adicionar_ferramenta, ("Broca Ø8mm", "abc"), "número positivo"),
+    (dominio.adicionar_ferramenta, ("Broca Ø8mm", ""), "Digite a vida"),
+    (dominio.remover_maquina, ("999",), "não está no catálogo"),
+    (dominio.remover_ferramenta, ("Broca Ø8mm",), "não está no catálogo"),
+])
+def test_catalogo_invalido(acao, argumentos, mensagem):
+    dados = catalogo()
+    copia = {chave: list(valor) if isinstance(valor, list) else dict(valor)
+             for chave, valor in dados.items()}
+    with pytest.raises(ValueError, match=mensagem):
+        acao(dados, *argumentos)
+    assert dados == copia  # erro não deixa o catálogo pela metade
+
+
+def test_nomes_dos_relatorios():
+    agora = datetime(2026, 10, 17, 8, 5, 9)
+    assert dominio.nome_relatorio_troca(agora) == "Relatorio_Troca_20261017_080509.pdf"
+    assert dominio.nome_relatorio_consolidado(agora) == "Relatorio_Consolidado_20261017_080509.pdf"
@@ -0,0 +1,109 @@
+"""Exportação em fluxo: CSV, JSON-lines, troca do arquivo só no fim e volta pela importação"""
+import csv
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+import exportacao
+from armazenamento import criar_armazenamento
+from exportacao import exportar_historico
+from historico import CAMPOS
+from importacao import importar_trocas
+
+VIDA_PADRAO = {"Broca Ø6mm": 1500, "Macho M6": 800}
+
+
+def trocas(quantidade):
+    resultado = []
+    for i in range(quantidade):
+        ferramenta = ["Broca Ø6mm", "Macho M6"][i % 2]
+        pecas = 300 + i * 17
+        resultado.append({
+            "instante": 1_790_000_000 + i * 3600, "operador": ["Ana", "José; \"Zé\""][i % 2],
+            "maquina": str(301 + i % 3), "ferramenta": ferramenta, "lote": f"OP-{i // 4}",
+            "pecas_feitas": pecas, "vida_esperada": VIDA_PADRAO[ferramenta],
+            "percentual": round(pecas / VIDA_PADRAO[ferramenta] * 100, 1),
+            "motivo": "💥 Quebrou", "observacoes": "linha 1\nlinha 2" if i == 3 else "",
+            "id_troca": f"{i:032x}",
+        })
+    return resultado
+
+
+def novo_armazenamento(pasta, tipo):
+    os.makedirs(pasta, exist_ok=True)
+    return criar_armazenamento(os.path.join(pasta, "ferramental.json"),
+                               os.path.join(pasta, "historico_trocas.json"), tipo)
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def armazenamento(request, tmp_path):
+    armazenamento = novo_armazenamento(str(tmp_path / "origem"), request.param)
+    armazenamento.anexar_varios(trocas(10))
+    yield armazenamento
+    armazenamento.fechar()
+
+
+def test_csv_com_data_iso_e_filtro(armazenamento, tmp_path):
+    arquivo = str(tmp_path / "trocas.csv")
+    assert exportar_historico(armazenamento, arquivo, maquina="301") == 4
+    with open(arquivo, encoding="utf-8", newline="") as f:
+        linhas = list(csv.reader(f, delimiter=";"))
+    assert tuple(linhas[0]) == exportacao.COLUNAS_PADRAO["csv"]
+    assert [l[2] for l in linhas[1:]] == ["301"] * 4
+    esperado = [t for t in trocas(10) if t["maquina"] == "301"]  # ordem cronológica
+    assert [l[0] for l in linhas[1:]] == [
+        datetime.fromtimestamp(t["instante"]).isoformat(timespec="seconds") for t in esperado]
+    assert linhas[2][1] == "José; \"Zé\"" and linhas[2][-2] == "linha 1\nlinha 2"
+
+
+def test_jsonl_com_colunas_escolhidas(armazenamento, tmp_path):
+    arquivo = str(tmp_path / "trocas.jsonl")
+    assert exportar_historico(armazenamento, arquivo) == 10
+    with open(arquivo, encoding="utf-8") as f:
+        linhas = [json.loads(l) for l in f]
+    assert linhas == [{c: t[c] for c in CAMPOS} for t in trocas(10)]
+
+    exportar_historico(armazenamento, arquivo, colunas=["data", "pecas_feitas"])
+    with open(arquivo, encoding="utf-8") as f:
+        primeira = json.loads(f.readline())
+    assert list(primeira) == ["data", "pecas_feitas"] and primeira["pecas_feitas"] == 300
+
+    with pytest.raises(ValueError, match="Colunas desconhecidas: peças"):
+        exportar_historico(armazenamento, arquivo, colunas=["data", "peças"])
+    with pytest.raises(ValueError, match="Formato desconhecido"):
+        exportar_historico(armazenamento, arquivo, formato="xlsx")
+
+
+def test_falha_no_meio_deixa_o_arquivo_anterior(armazenamento, tmp_path, monkeypatch):
+    arquivo = tmp_path / "trocas.csv"
+    arquivo.write_text("exportação de ontem\n", encoding="utf-8")
+    iterar = armazenamento.iterar_historico
+
+    def iterar_e_cair(**filtros):
+        for quantidade, registro in enumerate(iterar(**filtros)):
+            if quantidade == 5:
+                raise OSError("conexão perdida")
+            yield registro
+
+    monkeypatch.setattr(armazenamento, "iterar_historico", iterar_e_cair)
+    with pytest.raises(OSError):
+        exportar_historico(armazenamento, str(arquivo))
+    assert arquivo.read_text("utf-8") == "exportação de ontem\n"
+    assert sorted(os.listdir(tmp_path)) == ["origem", "trocas.csv"]  # sem o .tmp
+
+
+@pytest.mark.parametrize("extensao", ["csv", "jsonl"])
+def test_ida_e_volta_pela_importacao(armazenamento, tmp_path, extensao):
+    arquivo = str(tmp_path / f"trocas.{extensao}")
+    exportar_historico(armazenamento, arquivo)
+    destino = novo_armazenamento(str(tmp_path / "destino"), "json")
+    try:
+        resultado = importar_trocas(destino, arquivo, VIDA_PADRAO)
+        assert (resultado.importadas, resultado.total_rejeitadas) == (10, 0)
+        assert destino.consultar_historico() == armazenamento.consultar_historico()
+        # De novo: os ids exportados evitam duplicar
+        assert importar_trocas(destino, arquivo, VIDA_PADRAO).duplicadas == 10
+    finally:
+        destino.fechar()
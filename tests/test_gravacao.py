@@ -0,0 +1,102 @@
+"""Gravação adiada: uma gravação por janela, nova tentativa e gravação na saída"""
+import os
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+
+from gravacao import GravacaoAdiada
+
+PASTA_PROJETO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Estado:
+    """Estado com lock e um gravador que guarda as cópias recebidas"""
+
+    def __init__(self, falhas=0):
+        self.lock = threading.Lock()
+        self.valor = 0
+        self.gravadas = []
+        self.avisos = 0
+        self.falhas = falhas
+
+    def capturar(self):
+        with self.lock:
+            return self.valor
+
+    def gravar(self, copia):
+        if self.falhas:
+            self.falhas -= 1
+            raise OSError("disco cheio")
+        self.gravadas.append(copia)
+
+    def ao_gravar(self):
+        self.avisos += 1
+
+
+def esperar(condicao, prazo=5):
+    limite = time.monotonic() + prazo
+    while not condicao():
+        assert time.monotonic() < limite, "a gravação não saiu"
+        time.sleep(0.01)
+
+
+def test_edicoes_da_janela_viram_uma_gravacao():
+    estado = Estado()
+    gravacao = GravacaoAdiada(estado.capturar, estado.gravar, 0.3, estado.ao_gravar)
+    try:
+        for _ in range(50):
+            with estado.lock:
+                estado.valor += 1
+            gravacao.marcar()
+        assert gravacao.pendente and estado.gravadas == []  # nada na thread do clique
+        esperar(lambda: not gravacao.pendente)
+        assert estado.gravadas == [50] and estado.avisos == 1
+        assert gravacao.gravacoes == 1
+        assert gravacao.descarregar() and gravacao.gravacoes == 1  # nada pendente
+    finally:
+        gravacao.fechar()
+
+
+def test_falha_fica_pendente_e_tenta_de_novo(capsys):
+    estado = Estado(falhas=2)
+    gravacao = GravacaoAdiada(estado.capturar, estado.gravar, 0.02, estado.ao_gravar)
+    try:
+        estado.valor = 7
+        gravacao.marcar()
+        esperar(lambda: estado.gravadas)
+        assert estado.gravadas == [7] and not gravacao.pendente
+        assert (gravacao.falhas, gravacao.gravacoes, estado.avisos) == (2, 1, 1)
+        assert "Erro ao salvar dados: disco cheio" in capsys.readouterr().out
+    finally:
+        gravacao.fechar()
+
+
+def test_fechar_grava_o_pendente_sem_esperar_a_janela():
+    estado = Estado()
+    gravacao = GravacaoAdiada(estado.capturar, estado.gravar, janela=60)
+    estado.valor = 3
+    gravacao.marcar()
+    inicio = time.monotonic()
+    assert gravacao.fechar()
+    assert time.monotonic() - inicio < 5 and estado.gravadas == [3]
+    assert not gravacao._thread.is_alive()
+
+
+def test_saida_do_processo_grava_o_pendente(tmp_path):
+    arquivo = tmp_path / "catalogo.txt"
+    script = textwrap.dedent(f"""
+        import sys
+        sys.path.insert(0, {PASTA_PROJETO!r})
+        from gravacao import GravacaoAdiada
+
+        def gravar(copia):
+            with open({str(arquivo)!r}, "w", encoding="utf-8") as f:
+                f.write(copia)
+
+        gravacao = GravacaoAdiada(lambda: "maquina 399", gravar, janela=60)
+        gravacao.marcar()
+    """)
+    subprocess.run([sys.executable, "-c", script], check=True, timeout=30)
+    assert arquivo.read_text("utf-8") == "maquina 399"
@@ -0,0 +1,104 @@
+"""HistoricoColunar: ordem por instante, paginação e anexar atômico"""
+import pytest
+
+import historico
+from historico import HistoricoColunar
+
+
+def troca(instante, i=0, **campos):
+    registro = {
+        "instante": instante, "operador": f"Operador {i % 3}", "maquina": str(300 + i % 2),
+        "ferramenta": "Broca 8", "lote": "OP-1", "pecas_feitas": i, "vida_esperada": 1000,
+        "percentual": 0.0, "motivo": "✅ Completou a Vida Útil", "observacoes": "",
+        "id_troca": f"{i:032x}",
+    }
+    registro.update(campos)
+    return registro
+
+
+@pytest.mark.parametrize("registro", [
+    {k: v for k, v in troca(100).items() if k != "maquina"},  # campo faltando
+    troca(100, pecas_feitas=2 ** 70),                          # não cabe no array 'q'
+    troca(100, vida_esperada="mil"),
+    troca(100, id_troca=["não", "hashável"]),
+])
+def test_anexar_invalido_nao_desalinha_as_colunas(registro):
+    historico = HistoricoColunar([troca(50, 1)])
+    with pytest.raises((KeyError, TypeError, OverflowError)):
+        historico.anexar(registro)
+    historico.anexar(troca(200, 2))
+    assert len(historico) == 2
+    assert [dict(r)["pecas_feitas"] for r in historico] == [2, 1]
+    assert {len(c) for c in historico._numeros.values()} == {2}
+    assert {len(c) for c in historico._codigos.values()} == {2}
+    assert len(historico._observacoes) == len(historico._ids) == 2
+
+
+def test_insercoes_fora_de_ordem_ficam_ordenadas_por_instante():
+    instantes = [500, 100, 300, 300, 50, 700, 300, 200]
+    historico = HistoricoColunar(troca(t, i) for i, t in enumerate(instantes))
+
+    crescente = [r["pecas_feitas"] for r in historico.consultar(decrescente=False)]
+    # Empate no instante: ordem de chegada
+    assert crescente == sorted(range(len(instantes)), key=lambda i: (instantes[i], i))
+    assert [r["pecas_feitas"] for r in historico.consultar()] == crescente[::-1]
+    # A sequência continua em ordem de chegada, mais recente primeiro
+    assert [r["pecas_feitas"] for r in historico] == list(range(len(instantes)))[::-1]
+
+
+INSTANTES = [(i * 7919) % 1000 for i in range(300)]  # fora de ordem, com empates
+
+
+@pytest.fixture
+def bloco_pequeno(monkeypatch):
+    monkeypatch.setattr(historico, "BLOCO_ORDEM", 7)
+
+
+def referencia(inicio, fim, decrescente, maquina=None):
+    chaves = sorted((t, i) for i, t in enumerate(INSTANTES)
+                    if inicio <= t < fim and (maquina is None or str(300 + i % 2) == maquina))
+    indices = [i for _, i in chaves]
+    return indices[::-1] if decrescente else indices
+
+
+@pytest.mark.parametrize("decrescente", [True, False])
+@pytest.mark.parametrize("maquina", [None, "301"])
+def test_paginas_fora_de_ordem(bloco_pequeno, decrescente, maquina):
+    colunar = HistoricoColunar(troca(t, i) for i, t in enumerate(INSTANTES))
+    esperado = referencia(100, 900, decrescente, maquina)
+
+    paginas = []
+    for deslocamento in range(0, len(esperado) + 20, 20):
+        paginas += [r["pecas_feitas"] for r in colunar.consultar(
+            100, 900, decrescente, deslocamento, limite=20, maquina=maquina)]
+    assert paginas == esperado
+
+
+def test_insercao_durante_a_consulta(bloco_pequeno):
+    colunar = HistoricoColunar(troca(t, i) for i, t in enumerate(INSTANTES))
+    consulta = colunar.consultar(decrescente=False)
+    lidos = [next(consulta)["pecas_feitas"] for _ in range(10)]
+    # Fora de ordem, antes e depois do ponto já lido: as posições se deslocam
+    colunar.anexar(troca(0, 1000))
+    colunar.anexar(troca(999, 1001))
+    lidos += [r["pecas_feitas"] for r in consulta]
+    assert lidos == referencia(0, 1000, False)
+
+
+def test_fora_de_ordem_intercaladas_de_uma_vez(bloco_pequeno):
+    colunar = HistoricoColunar(troca(t, i) for i, t in enumerate(INSTANTES[:100]))
+    ordem = colunar._ordem
+    for i, t in enumerate(INSTANTES[100:], start=100):
+        colunar.anexar(troca(t, i))
+    # Nenhuma inserção no meio: as fora de ordem esperam a próxima leitura
+    assert colunar._ordem is ordem and colunar._pendentes
+    assert [r["pecas_feitas"] for r in colunar.consultar(decrescente=False)] == \
+        referencia(0, 1000, False)
+    assert not colunar._pendentes
+
+    # Leitura entre as escritas continua certa
+    for i in range(300, 340):
+        colunar.anexar(troca((i * 37) % 1000, i))
+        assert next(colunar.consultar(decrescente=False, limite=1))["instante"] == 0
+    chaves = [(r["instante"], r["pecas_feitas"]) for r in colunar.consultar(decrescente=False)]
+    assert chaves == sorted(chaves) and len(chaves) == 340
@@ -0,0 +1,170 @@
+"""Importação em lote: formatos, rejeitadas, progresso e reimportar sem duplicar"""
+import json
+
+import pytest
+
+import importacao
+from armazenamento import criar_armazenamento
+from historico import CAMPOS
+from importacao import gravar_rejeitadas, importar_trocas, validar_colunas, validar_linha
+
+VIDA_PADRAO = {"Broca 8": 1000}
+
+
+def linha(i, **campos):
+    registro = {"instante": 1_700_000_000 + i * 60, "operador": "Ana", "maquina": "301",
+                "ferramenta": "Broca 8", "pecas_feitas": 500 + i, "motivo": "Desgaste",
+                "id_troca": f"{i:032x}"}
+    registro.update(campos)
+    return registro
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def armazenamento(request, tmp_path):
+    armazenamento = criar_armazenamento(str(tmp_path / "ferramental.json"),
+                                        str(tmp_path / "historico_trocas.json"), request.param)
+    armazenamento.carregar_historico()
+    yield armazenamento
+    armazenamento.fechar()
+
+
+def gravar_jsonl(caminho, linhas):
+    with open(caminho, "w", encoding="utf-8") as f:
+        for registro in linhas:
+            f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+    return str(caminho)
+
+
+def test_reimportar_pula_id_troca_ja_gravado(armazenamento, tmp_path):
+    # O 3 aparece duas vezes, em lotes diferentes (tamanho_lote=4)
+    arquivo = gravar_jsonl(tmp_path / "mes.jsonl", [linha(i) for i in (0, 1, 2, 3, 4, 3, 5)])
+    resultado = importar_trocas(armazenamento, arquivo, VIDA_PADRAO, tamanho_lote=4)
+    assert (resultado.lidas, resultado.importadas, resultado.duplicadas) == (7, 6, 1)
+
+    resultado = importar_trocas(armazenamento, arquivo, VIDA_PADRAO, tamanho_lote=4)
+    assert (resultado.importadas, resultado.duplicadas) == (0, 7)
+    assert len(armazenamento.consultar_historico()) == 6
+
+
+def test_trocas_sem_id_sao_sempre_importadas(armazenamento, tmp_path):
+    arquivo = gravar_jsonl(tmp_path / "mes.jsonl", [linha(i, id_troca="") for i in range(3)])
+    importar_trocas(armazenamento, arquivo, VIDA_PADRAO)
+    resultado = importar_trocas(armazenamento, arquivo, VIDA_PADRAO)
+    assert (resultado.importadas, resultado.duplicadas) == (3, 0)
+    assert len(armazenamento.consultar_historico()) == 6
+
+
+def gravar_csv(caminho, texto):
+    caminho.write_text(texto, encoding="utf-8")
+    return str(caminho)
+
+
+CABECALHO = "data;operador;maquina;ferramenta;lote;pecas_feitas;motivo;id_troca\n"
+
+
+def test_linhas_rejeitadas_com_numero_e_motivo(armazenamento, tmp_path):
+    arquivo = gravar_csv(tmp_path / "mes.csv", CABECALHO +
+                         "01/10/2026 08:00;Ana;301;Broca 8;OP-1;400;Desgaste;a1\n"
+                         "01/10/2026 08:05;Ana;301;Fresa;OP-1;400;Desgaste;a2\n"
+                         "\n"
+                         "01/10/2026 08:10;Ana;;Broca 8;OP-1;400;Desgaste;a3\n"
+                         "32/10/2026 08:15;Ana;301;Broca 8;OP-1;400;Desgaste;a4\n"
+                         "01/10/2026 08:20;Ana;301;Broca 8;OP-1;muitas;Desgaste;a5\n"
+                         "01/10/2026 08:25;Ana;301;Broca 8;OP-1;-3;Desgaste;a6\n"
+                         "01/10/2026 08:30;Bia;302;Broca 8;;1250;Quebrou;a7\n")
+    resultado = importar_trocas(armazenamento, arquivo, VIDA_PADRAO)
+    assert (resultado.lidas, resultado.importadas, resultado.total_rejeitadas) == (7, 2, 5)
+    assert [numero for numero, _ in resultado.rejeitadas] == [3, 5, 6, 7, 8]
+    motivos = [motivo for _, motivo in resultado.rejeitadas]
+    for motivo, esperado in zip(motivos, ["fora do catálogo", "máquina vazia", "data inválida",
+                                          "peças feitas inválidas", "negativas"]):
+        assert esperado in motivo
+
+    # As válidas do mesmo bloco entram, com o percentual já calculado
+    gravadas = armazenamento.consultar_historico()
+    assert [(r["id_troca"], r["lote"], r["percentual"]) for r in gravadas] == [
+        ("a7", "N/A", 125.0), ("a1", "OP-1", 40.0)]
+
+    gravar_rejeitadas(resultado, tmp_path / "rejeitadas.csv")
+    linhas = (tmp_path / "rejeitadas.csv").read_text("utf-8").splitlines()
+    assert linhas[0] == "linha;motivo" and linhas[1].startswith("3;")
+
+
+def test_por_coluna_igual_a_linha_a_linha():
+    campos = ["instante", "operador", "maquina", "ferramenta", "pecas_feitas",
+              "vida_esperada", "lote", "id_troca"]
+    linhas = [[str(1_700_000_000 + i), f" Op {i % 3} ", "301", "Broca 8 ", str(i * 7),
+               str(900 + i % 5 * 50), ["", "OP-1"][i % 2], ["", f"{i:032x}"][i % 2]]
+              for i in range(40)]
+    linhas[5][5] = "0"  # vida zero: percentual 0
+    por_linha = [validar_linha(dict(zip(campos, l)), VIDA_PADRAO) for l in linhas]
+    assert validar_colunas(campos, linhas, VIDA_PADRAO) == por_linha
+    assert [list(r) for r in por_linha] == [list(CAMPOS)] * 40  # chaves na ordem do app
+    assert por_linha[5]["percentual"] == 0.0 and por_linha[7]["percentual"] == 4.9
+
+    # Uma linha ruim (ou de tamanho diferente) devolve o bloco para validar_linha
+    assert validar_colunas(campos, linhas[:3] + [linhas[3][:-1]], VIDA_PADRAO) is None
+    linhas[9][4] = "x"
+    assert validar_colunas(campos, linhas, VIDA_PADRAO) is None
+
+
+def test_progresso_a_cada_bloco(armazenamento, tmp_path):
+    arquivo = gravar_jsonl(tmp_path / "mes.jsonl",
+                           [linha(i) for i in range(5)] + [{"ferramenta": "x"}] * 2)
+    progresso = []
+    importar_trocas(armazenamento, arquivo, VIDA_PADRAO, tamanho_lote=3,
+                    ao_progresso=lambda r: progresso.append(
+                        (r.lidas, r.importadas, r.total_rejeitadas)))
+    # O último bloco só tem rejeitadas e também avisa
+    assert progresso == [(3, 3, 0), (6, 5, 1), (7, 5, 2)]
+
+
+@pytest.mark.parametrize("recuo", [None, 2])
+def test_array_json_lido_em_fluxo(armazenamento, tmp_path, monkeypatch, recuo):
+    monkeypatch.setattr(importacao, "TAMANHO_BLOCO", 64)  # itens cortados entre blocos
+    linhas = [linha(i, observacoes="ação " * i) for i in range(12)]
+    caminho = tmp_path / "mes.json"
+    caminho.write_text(" \n" + json.dumps(linhas, ensure_ascii=False, indent=recuo),
+                       encoding="utf-8")
+    resultado = importar_trocas(armazenamento, str(caminho), VIDA_PADRAO, tamanho_lote=5)
+    assert (resultado.lidas, resultado.importadas, resultado.total_rejeitadas) == (12, 12, 0)
+    gravadas = armazenamento.consultar_historico()
+    assert gravadas[0]["observacoes"] == ("ação " * 11).strip()
+    assert gravadas[0]["percentual"] == round(511 / 1000 * 100, 1)
+
+
+def test_array_json_malformado_para_no_item_ruim(armazenamento, tmp_path):
+    itens = ",".join(json.dumps(linha(i)) for i in range(3))
+    caminho = tmp_path / "mes.json"
+    caminho.write_text(f"[{itens}, {{\"ferramenta\": ]", encoding="utf-8")
+    resultado = importar_trocas(armazenamento, str(caminho), VIDA_PADRAO)
+    assert resultado.importadas == 3
+    assert resultado.rejeitadas == [(4, "linha ilegível")]
+
+
+def test_json_sem_colchete_e_json_lines(armazenamento, tmp_path):
+    arquivo = gravar_jsonl(tmp_path / "mes.json", [linha(i) for i in range(3)])
+    resultado = importar_trocas(armazenamento, arquivo, VIDA_PADRAO)
+    assert (resultado.lidas, resultado.importadas) == (3, 3)
+
+
+def test_sqlite_refaz_os_indices_depois_da_carga(tmp_path):
+    armazenamento = criar_armazenamento(str(tmp_path / "ferramental.json"),
+                                        str(tmp_path / "historico_trocas.json"), "sqlite")
+    indices = "SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL"
+    antes = {l[0] for l in armazenamento.conexao.execute(indices)}
+    arquivo = gravar_jsonl(tmp_path / "mes.jsonl", [linha(i) for i in range(50)])
+    removidos = []
+    anexar_varios = armazenamento.anexar_varios
+
+    def anexar_e_conferir(registros):
+        removidos.append(antes - {l[0] for l in armazenamento.conexao.execute(indices)})
+        return anexar_varios(registros)
+
+    armazenamento.anexar_varios = anexar_e_conferir
+    importar_trocas(armazenamento, arquivo, VIDA_PADRAO)
+    # Carga maior que o histórico vazio: gravada sem os índices de consulta
+    assert removidos == [set(armazenamento.INDICES_CONSULTA)]
+    assert {l[0] for l in armazenamento.conexao.execute(indices)} == antes
+    assert len(armazenamento.consultar_historico(maquina="301")) == 50
+    armazenamento.fechar()
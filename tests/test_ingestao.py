@@ -0,0 +1,85 @@
+"""Central de trocas: idempotência por id_troca, fila do cliente e lotes recusados"""
+import json
+import os
+import time
+
+import pytest
+
+import ingestao
+from armazenamento import ArmazenamentoJSON
+from ingestao import ClienteIngestao, ServidorIngestao
+
+
+def troca(i):
+    return {
+        "id_troca": f"{i:032x}", "instante": 1_700_000_000 + i, "operador": "Ana",
+        "maquina": "301", "ferramenta": "Broca 8", "lote": "OP-1", "pecas_feitas": i,
+        "vida_esperada": 1000, "percentual": 0.0, "motivo": "✅ Completou a Vida Útil",
+        "observacoes": "",
+    }
+
+
+@pytest.fixture
+def central(tmp_path):
+    armazenamento = ArmazenamentoJSON(str(tmp_path / "ferramental.json"),
+                                      str(tmp_path / "historico_trocas.json"))
+    armazenamento.carregar_historico()
+    servidor = ServidorIngestao(armazenamento.anexar_varios, "127.0.0.1").iniciar()
+    yield servidor, armazenamento
+    servidor.parar()
+    armazenamento.fechar()
+
+
+def esperar_fila_vazia(cliente, prazo=10):
+    limite = time.monotonic() + prazo
+    while cliente.pendentes:
+        assert time.monotonic() < limite, "fila do cliente não esvaziou"
+        time.sleep(0.02)
+
+
+def test_reenvio_nao_duplica(central, tmp_path):
+    servidor, armazenamento = central
+    cliente = ClienteIngestao(f"http://127.0.0.1:{servidor.porta}", str(tmp_path / "fila.jsonl"))
+    for i in [1, 2, 1, 3, 2]:
+        cliente.enviar(troca(i))
+    esperar_fila_vazia(cliente)
+    assert servidor.recebidos == 5
+    assert servidor.gravados == 3
+    assert sorted(r["pecas_feitas"] for r in armazenamento.consultar_historico()) == [1, 2, 3]
+
+
+def test_so_a_troca_recusada_fica_de_fora(central, tmp_path):
+    servidor, armazenamento = central
+    arquivo_fila = str(tmp_path / "fila.jsonl")
+    cliente = ClienteIngestao(f"http://127.0.0.1:{servidor.porta}", arquivo_fila,
+                              tamanho_envio=16)
+    invalida = dict(troca(5), operador="")
+    for i in range(12):
+        cliente.enviar(invalida if i == 5 else troca(i))
+    esperar_fila_vazia(cliente)
+
+    assert cliente.recusados == 1
+    assert len(armazenamento.consultar_historico()) == 11
+    with open(arquivo_fila + ".recusadas", encoding="utf-8") as f:
+        assert [json.loads(linha) for linha in f] == [invalida]
+
+
+def test_fila_retomada_pelo_cursor_e_compactada(central, tmp_path, monkeypatch):
+    servidor, armazenamento = central
+    monkeypatch.setattr(ingestao, "LIMITE_COMPACTACAO_FILA", 2000)
+    arquivo_fila = str(tmp_path / "fila.jsonl")
+    url = f"http://127.0.0.1:{servidor.porta}"
+    cliente = ClienteIngestao(url, arquivo_fila)
+    for i in range(5):
+        cliente.enviar(troca(i))
+    esperar_fila_vazia(cliente)
+    # Enviadas, mas abaixo do limite: o arquivo fica, o cursor marca o fim
+    with open(arquivo_fila + ".cursor", encoding="utf-8") as f:
+        assert int(f.read()) == os.path.getsize(arquivo_fila)
+    assert ClienteIngestao(url, arquivo_fila).pendentes == []
+
+    for i in range(5, 30):
+        cliente.enviar(troca(i))
+    esperar_fila_vazia(cliente)
+    assert os.path.getsize(arquivo_fila) < 2000  # regravada sem as enviadas
+    assert len(armazenamento.consultar_historico()) == 30
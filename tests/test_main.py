@@ -0,0 +1,53 @@
+"""Tela do Flet montada sobre a página falsa dos benchmarks (sem janela)"""
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("flet")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                "benchmarks"))
+from pagina_falsa import PaginaFalsa
+
+
+class PaginaQueGuardaOEnvio(PaginaFalsa):
+    """Guarda os filhos de cada controle no ``add``, o que o Flet enviaria ao cliente"""
+
+    def __init__(self):
+        super().__init__()
+        self.enviados = {}
+
+    def add(self, *controles):
+        super().add(*controles)
+        for controle in controles:
+            self.enviados[id(controle)] = list(getattr(controle, "controls", None) or [])
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    import main
+
+    app = main.ToolLifePro(PaginaQueGuardaOEnvio())
+    yield app
+    app.repositorio.cancelar(app.dados_alterados)
+
+
+def test_aba_calc_vai_com_o_primeiro_envio(app):
+    pagina = app.page
+    assert app.area_abas in pagina.controls
+    calc = app.abas["CALC"]
+    assert calc.visible
+    # Sem page.update() depois do add: a aba tem de estar no que o add enviou
+    assert pagina.enviados[id(app.area_abas)] == [calc]
+    assert pagina.atualizacoes == 0
+
+
+def test_navegar_monta_a_aba_na_primeira_visita(app):
+    from pagina_falsa import EventoFalso
+
+    app.navegar(EventoFalso("HISTORICO"))
+    assert set(app.abas) == {"CALC", "HISTORICO"}
+    assert app.abas["HISTORICO"].visible and not app.abas["CALC"].visible
+    assert app.page.atualizacoes == 1
@@ -0,0 +1,81 @@
+"""Histograma HDR: faixas, quantis e texto do Prometheus"""
+import math
+import random
+import re
+
+import pytest
+
+from metricas import LIMITES_EXPORTACAO, HistogramaLatencia, Metricas
+
+VALORES = sorted({*range(0, 300), *(1 << k for k in range(25)),
+                  *((1 << k) - 1 for k in range(1, 25)),
+                  *random.Random(5).sample(range(300, 50_000_000), 3000)})
+
+
+def test_indice_e_faixa_ida_e_volta():
+    for valor in VALORES:
+        menor, maior = HistogramaLatencia.faixa(HistogramaLatencia.indice(valor))
+        assert menor <= valor <= maior
+        assert maior - menor <= menor / 16  # erro relativo de ~6%
+
+
+def test_faixas_contiguas_e_crescentes():
+    ultimo = HistogramaLatencia.indice(VALORES[-1])
+    for indice in range(ultimo):
+        assert HistogramaLatencia.faixa(indice)[1] + 1 == HistogramaLatencia.faixa(indice + 1)[0]
+
+
+def test_quantil_dentro_da_faixa_do_valor_exato():
+    sorteio = random.Random(7)
+    histograma = HistogramaLatencia()
+    valores = [int(sorteio.lognormvariate(8, 2)) for _ in range(5000)]
+    for valor in valores:
+        histograma.registrar(valor)
+    faixas, quantidade, _, maximo = histograma.copia()
+    valores.sort()
+    assert maximo == valores[-1]
+    for q in (0.01, 0.5, 0.9, 0.99, 1.0):
+        exato = valores[max(0, math.ceil(q * quantidade) - 1)]
+        obtido = HistogramaLatencia.quantil(faixas, quantidade, q)
+        assert exato <= obtido <= exato + exato / 16
+    assert HistogramaLatencia.quantil([], 0, 0.5) == 0
+
+
+def amostras(texto, nome):
+    padrao = re.compile(rf'^{re.escape(nome)}\{{nome="x"(?:,le="([^"]+)")?\}} (\S+)$', re.M)
+    return [(le, float(valor)) for le, valor in padrao.findall(texto)]
+
+
+def test_texto_prometheus():
+    metricas = Metricas()
+    valores = [1, 400, 498, 505, 999, 1001, 30_000, 3_000_000, 20_000_000]
+    histograma = metricas.histograma("handler", "x")
+    for valor in valores:
+        histograma.registrar(valor)
+
+    def falha():
+        raise ValueError
+
+    with pytest.raises(ValueError):
+        metricas.cronometrar("handler", "y", falha)()
+    texto = metricas.texto_prometheus()
+    metrica = "toollife_handler_latencia_segundos"
+    assert f"# TYPE {metrica} histogram" in texto
+
+    buckets = amostras(texto, f"{metrica}_bucket")
+    assert [le for le, _ in buckets] == [str(l) for l in LIMITES_EXPORTACAO] + ["+Inf"]
+    contagens = [c for _, c in buckets]
+    assert contagens == sorted(contagens) and contagens[-1] == len(valores)
+    for limite, contagem in zip(LIMITES_EXPORTACAO, contagens):
+        # Nunca conta medições acima do limite; no máximo perde as da faixa que o atravessa
+        reais = sum(v <= limite * 1_000_000 for v in valores)
+        assert reais - 1 <= contagem <= reais
+    assert dict(buckets)["0.0005"] == 2  # 498 µs cai na faixa 496-511, que passa do limite
+
+    assert amostras(texto, f"{metrica}_count") == [("", len(valores))]
+    assert amostras(texto, f"{metrica}_sum")[0][1] == pytest.approx(sum(valores) / 1e6)
+    quantis = dict(re.findall(rf'^{metrica}_quantil\{{nome="x",quantil="([^"]+)"\}} (\S+)$',
+                              texto, re.M))
+    assert float(quantis["1.0"]) == pytest.approx(20.0)
+    assert float(quantis["0.5"]) == pytest.approx(0.001, rel=1 / 16)
+    assert 'toollife_erros_total{tipo="handler",nome="y"} 1' in texto
@@ -0,0 +1,97 @@
+"""PDF da troca: mesmo registro, mesmos bytes"""
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime
+
+import pytest
+
+fpdf = pytest.importorskip("fpdf")
+if not hasattr(fpdf, "FPDF_VERSION") or int(fpdf.FPDF_VERSION.split(".")[0]) < 2:
+    pytest.skip("PDF determinístico requer o fpdf2", allow_module_level=True)
+
+import dominio
+import relatorios
+from cache_relatorios import CacheBytes
+
+REGISTRO = {
+    "instante": 1792230000, "operador": "Ana", "maquina": "301", "ferramenta": "Macho M6",
+    "lote": "OP-1", "pecas_feitas": 700, "vida_esperada": 800, "percentual": 87.5,
+    "motivo": "✅ Completou a Vida Útil", "observacoes": "troca antecipada",
+    "id_troca": "a" * 32,
+}
+
+PASTA_PROJETO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def renderizar_em_outro_processo(fuso):
+    codigo = (
+        "import sys, json; from datetime import datetime; import relatorios; "
+        "r = json.loads(sys.argv[1]); "
+        "sys.stdout.buffer.write(relatorios.gerar_pdf_troca("
+        "r, datetime.fromtimestamp(r['instante'])))")
+    ambiente = dict(os.environ, TZ=fuso, PYTHONPATH=os.pathsep.join(
+        [PASTA_PROJETO] + sys.path))
+    return subprocess.run([sys.executable, "-W", "ignore", "-c", codigo, json.dumps(REGISTRO)],
+                          env=ambiente, capture_output=True, check=True).stdout
+
+
+def test_duas_renderizacoes_sao_iguais():
+    agora = datetime.fromtimestamp(REGISTRO["instante"])
+    primeira = relatorios.gerar_pdf_troca(REGISTRO, agora)
+    segunda = relatorios.gerar_pdf_troca(dict(REGISTRO), agora)
+    assert primeira == segunda
+
+
+def test_renderizacao_nao_depende_do_processo():
+    # Cada processo teria outro /ID aleatório e outra hora de criação
+    assert renderizar_em_outro_processo("UTC") == renderizar_em_outro_processo("UTC")
+
+
+def test_registro_diferente_gera_pdf_diferente():
+    agora = datetime.fromtimestamp(REGISTRO["instante"])
+    outro = dict(REGISTRO, pecas_feitas=701)
+    assert relatorios.gerar_pdf_troca(REGISTRO, agora) != relatorios.gerar_pdf_troca(outro, agora)
+
+
+def test_pdf_da_troca_usa_o_cache():
+    cache = CacheBytes(10 * 1024 * 1024)
+    primeira = relatorios.pdf_da_troca(REGISTRO, cache)
+    segunda = relatorios.pdf_da_troca(dict(REGISTRO), cache)
+    assert primeira == segunda
+    assert (cache.falhas, cache.acertos) == (1, 1)
+
+
+def test_percentual_vem_do_dominio():
+    assert relatorios.percentual_do_registro(REGISTRO) == \
+        dominio.calcular_percentual(700, 800)
+
+
+def test_consolidado_le_o_historico_uma_vez_e_vai_para_o_acervo(tmp_path):
+    from acervo import AcervoRelatorios
+    from armazenamento import criar_armazenamento
+
+    armazenamento = criar_armazenamento(str(tmp_path / "ferramental.json"),
+                                        str(tmp_path / "historico_trocas.json"), "json")
+    armazenamento.anexar_varios([dict(REGISTRO, maquina=str(301 + i % 3),
+                                      instante=REGISTRO["instante"] + i, id_troca=f"{i:032x}")
+                                 for i in range(30)])
+    passadas = []
+    iterar = armazenamento.iterar_historico
+
+    def contar_passadas(**filtros):
+        passadas.append(filtros)
+        return iterar(**filtros)
+
+    armazenamento.iterar_historico = contar_passadas
+    acervo = AcervoRelatorios(str(tmp_path / "acervo_relatorios"))
+    nome_arquivo = dominio.nome_relatorio_consolidado(datetime(2026, 10, 17, 8))
+    chave = relatorios.arquivar_pdf_consolidado(
+        armazenamento, nome_arquivo, {"titulo_periodo": "Todo o historico"}, acervo=acervo)
+    assert len(passadas) == 1
+    conteudo = acervo.ler(chave)
+    assert conteudo.startswith(b"%PDF") and acervo.nome(chave) == nome_arquivo
+    assert not os.path.exists(nome_arquivo)  # nada na pasta atual
+    acervo.fechar()
+    armazenamento.fechar()
@@ -0,0 +1,73 @@
+"""Repositório compartilhado: avisos às sessões fora do lock, na ordem das alterações"""
+import threading
+
+import pytest
+
+from repositorio import Repositorio
+
+
+@pytest.fixture
+def repositorio(tmp_path):
+    repositorio = Repositorio(str(tmp_path / "ferramental.json"),
+                              str(tmp_path / "historico_trocas.json"), "json", janela=0)
+    yield repositorio
+    repositorio.fechar()
+
+
+class Sessao:
+    def __init__(self, repositorio, ao_receber=None):
+        self.repositorio = repositorio
+        self.avisos = []
+        self.ao_receber = ao_receber
+        repositorio.inscrever(self.dados_alterados)
+
+    def dados_alterados(self, evento, nome, posicao, versao):
+        if evento == "catalogo_gravado":
+            return  # vem da thread da gravação, em qualquer momento
+        self.avisos.append((evento, nome, posicao, versao))
+        if self.ao_receber:
+            self.ao_receber(evento, nome)
+
+
+def lock_livre(repositorio):
+    """Outra thread consegue pegar o lock agora?"""
+    livre = []
+
+    def tentar():
+        if repositorio.lock.acquire(timeout=1):
+            livre.append(True)
+            repositorio.lock.release()
+
+    thread = threading.Thread(target=tentar)
+    thread.start()
+    thread.join()
+    return bool(livre)
+
+
+def test_aviso_chega_sem_o_lock(repositorio):
+    livre = []
+    sessao = Sessao(repositorio, lambda evento, nome: livre.append(lock_livre(repositorio)))
+    repositorio.adicionar_maquina("999")
+    repositorio.registrar_troca({"instante": 1_700_000_000, "maquina": "999",
+                                 "id_troca": "a" * 32})
+    assert livre == [True, True] and len(sessao.avisos) == 2
+
+
+def test_alteracao_feita_durante_o_aviso_chega_depois_e_na_ordem(repositorio):
+    def ao_receber(evento, nome):
+        if nome == "998":
+            repositorio.remover_maquina("301")  # outra alteração no meio da entrega
+
+    primeira = Sessao(repositorio, ao_receber)
+    segunda = Sessao(repositorio)
+    repositorio.adicionar_maquina("998")
+    esperado = [("maquina_adicionada", "998", 7, 1), ("maquina_removida", "301", 0, 2)]
+    assert primeira.avisos == esperado and segunda.avisos == esperado
+    assert repositorio.versao == 2
+
+
+def test_sessao_cancelada_nao_recebe(repositorio):
+    sessao = Sessao(repositorio)
+    repositorio.cancelar(sessao.dados_alterados)
+    repositorio.adicionar_ferramenta("Broca Ø12mm", 1000)
+    assert sessao.avisos == []